@@ -1,31 +1,115 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from django.contrib.admin.views.main import ChangeList, PAGE_VAR
 from django.contrib.auth.models import User
-from .models import TravelOption, UserProfile, Booking
+from .models import TravelOption, UserProfile, Booking, Location
+from .exports import export_response
+from .inventory import delete_travel_options
+from .pagination import EstimatedCountPaginator
+
+
+# The sidebar lists at most this many cities; any other city can still be
+# filtered on with ?source_key=<key> or found through the search box.
+LOCATION_FILTER_LIMIT = 50
+
+
+class LocationFilter(admin.SimpleListFilter):
+    # Choices come from the small Location table instead of a DISTINCT scan
+    # over every TravelOption, and filter on the indexed location key.
+    def lookups(self, request, model_admin):
+        choices = list(Location.objects.order_by('name').values_list('key', 'name')[:LOCATION_FILTER_LIMIT])
+        if self.value() and self.value() not in dict(choices):
+            # Keep the active filter visible even when it is past the limit.
+            choices.extend(Location.objects.filter(key=self.value()).values_list('key', 'name'))
+        return choices
+    
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{self.parameter_name: self.value()})
+        return queryset
+
+
+class SourceFilter(LocationFilter):
+    title = 'source'
+    parameter_name = 'source_key'
+
+
+class DestinationFilter(LocationFilter):
+    title = 'destination'
+    parameter_name = 'destination_key'
+
+
+class ProjectedChangeList(ChangeList):
+    # Loads only the columns the changelist renders.
+    def get_queryset(self, request):
+        return super().get_queryset(request).only(*self.model_admin.list_only)
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        # The count starts at the requested page, see EstimatedCountPaginator.
+        try:
+            page = int(request.GET.get(PAGE_VAR, 1))
+        except ValueError:
+            page = 1
+        return self.paginator(queryset, per_page, orphans, allow_empty_first_page, page=page)
 
 
 @admin.register(TravelOption)
-class TravelOptionAdmin(admin.ModelAdmin):
+class TravelOptionAdmin(LargeTableAdmin):
     list_display = ['travel_id', 'travel_type', 'source', 'destination', 'departure_date', 'departure_time', 'price', 'available_seats']
-    list_filter = ['travel_type', 'source', 'destination', 'departure_date']
+    list_filter = ['travel_type', SourceFilter, DestinationFilter, 'departure_date']
     search_fields = ['travel_id', 'source', 'destination']
     ordering = ['departure_date', 'departure_time']
     list_editable = ['price', 'available_seats']
+    actions = ['export_manifest_csv']
+    
+    @admin.action(description='Export passenger manifest (CSV)')
+    def export_manifest_csv(self, request, queryset):
+        return export_response(Booking.objects.filter(travel_option__in=queryset), kind='manifest')
+    
+    def delete_queryset(self, request, queryset):
+        # The bulk delete action; skips the per-row post_delete refresh.
+        delete_travel_options(queryset)
 
 
 @admin.register(UserProfile)
-class UserProfileAdmin(admin.ModelAdmin):
+class UserProfileAdmin(LargeTableAdmin):
     list_display = ['user', 'phone_number', 'date_of_birth']
+    list_select_related = ['user']
+    autocomplete_fields = ['user']
     search_fields = ['user__username', 'user__email', 'phone_number']
 
 
 @admin.register(Booking)
-class BookingAdmin(admin.ModelAdmin):
+class BookingAdmin(LargeTableAdmin):
     list_display = ['booking_id', 'user', 'travel_option', 'number_of_seats', 'total_price', 'status', 'booking_date']
+    list_select_related = ['user', 'travel_option']
+    list_only = [
+        'booking_id', 'number_of_seats', 'total_price', 'status', 'booking_date',
+        'user__username', 'travel_option__travel_id', 'travel_option__travel_type',
+        'travel_option__source', 'travel_option__destination',
+    ]
+    autocomplete_fields = ['user', 'travel_option']
     list_filter = ['status', 'booking_date', 'travel_option__travel_type']
     search_fields = ['booking_id', 'user__username', 'travel_option__travel_id']
     readonly_fields = ['booking_id', 'total_price', 'booking_date']
     ordering = ['-booking_date']
+    actions = ['export_csv', 'export_jsonl']
+    
+    def get_changelist(self, request, **kwargs):
+        return ProjectedChangeList
+    
+    @admin.action(description='Export selected bookings (CSV)')
+    def export_csv(self, request, queryset):
+        return export_response(queryset)
+    
+    @admin.action(description='Export selected bookings (JSONL)')
+    def export_jsonl(self, request, queryset):
+        return export_response(queryset, file_format='jsonl')
 
 
 # Extend User admin to include profile
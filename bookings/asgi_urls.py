@@ -0,0 +1,18 @@
+from django.urls import path
+from . import views
+from .urls import urlpatterns as wsgi_urlpatterns
+
+# The routes of urls.py with the read views swapped for their async versions.
+ASYNC_VIEWS = {
+    'home': views.ahome,
+    'travel_options': views.atravel_options,
+    'api_search': views.aapi_search,
+    'fare_calendar': views.afare_calendar,
+    'booking_detail': views.abooking_detail,
+}
+
+urlpatterns = [
+    path(str(pattern.pattern), ASYNC_VIEWS[pattern.name], name=pattern.name)
+    if pattern.name in ASYNC_VIEWS else pattern
+    for pattern in wsgi_urlpatterns
+]
@@ -0,0 +1,131 @@
+import heapq
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from django.core.cache import cache
+from django.core.signals import request_finished
+from django.db import connections
+from django.db.models import Sum
+from django.utils import timezone
+from .models import Location, RouteDaySummary, normalize_location
+from .search import CATALOG_VERSION_KEY
+
+
+# How often a request may look at the shared catalog version, and the
+# shortest gap between two rebuilds while imports keep bumping it.
+VERSION_CHECK_SECONDS = 1
+MIN_REFRESH_SECONDS = 30
+# A refresh thread still alive after this long is taken to be stuck.
+REFRESH_STALL_SECONDS = 60
+MAX_SUGGESTIONS = 20
+
+
+class CityIndex:
+    # Every city word start ("new york" and "york" for New York) in one
+    # sorted list, so a prefix is a bisect and a slice. Built from Location
+    # and the upcoming departures in RouteDaySummary; requests only read the
+    # current snapshot, and rebuilds replace it in one assignment.
+    def __init__(self):
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._refreshing = None
+        self._dispatch_uid = 'city-index-refresh-%d' % id(self)
+        self._checked_at = 0.0
+        self._built_at = 0.0
+        self._version = None
+
+    def build(self):
+        today = timezone.now().date()
+        upcoming = RouteDaySummary.objects.filter(departure_date__gte=today)
+        departures = Counter()
+        for field in ('source_key', 'destination_key'):
+            departures.update(dict(
+                upcoming.values(field).annotate(total=Sum('departures')).values_list(field, 'total').order_by()
+            ))
+
+        entries = []
+        cities = {}
+        for key, name in Location.objects.values_list('key', 'name').order_by():
+            cities[key] = (name, departures[key])
+            words = key.split(' ')
+            entries.extend((' '.join(words[i:]), key) for i in range(len(words)))
+        entries.sort()
+        return [entry for entry, _ in entries], [key for _, key in entries], cities
+
+    def refresh(self):
+        version = cache.get(CATALOG_VERSION_KEY)
+        self._snapshot = self.build()
+        self._version = version
+        self._built_at = time.monotonic()
+
+    def _rebuild(self, wait=False):
+        # One build at a time. Only the first build in a process makes
+        # requests wait; later ones are skipped while another is running.
+        if not self._lock.acquire(blocking=wait):
+            return
+        try:
+            if not wait or self._snapshot is None:
+                self.refresh()
+        finally:
+            self._lock.release()
+
+    def _refresh_in_background(self):
+        try:
+            self._rebuild()
+        finally:
+            connections.close_all()
+
+    def _refresh_after_response(self, **kwargs):
+        request_finished.disconnect(dispatch_uid=self._dispatch_uid)
+        self._rebuild()
+
+    def _maybe_refresh(self):
+        if self._snapshot is None:
+            self._rebuild(wait=True)
+            return
+
+        # Departure counts and cities only move when trips are added, moved
+        # or removed, which is exactly what bumps the catalog version.
+        now = time.monotonic()
+        if now - self._checked_at < VERSION_CHECK_SECONDS:
+            return
+        self._checked_at = now
+        if cache.get(CATALOG_VERSION_KEY) == self._version or now - self._built_at < MIN_REFRESH_SECONDS:
+            return
+
+        # The request that notices keeps serving the old snapshot and leaves
+        # the rebuild to a thread, which swaps in the finished snapshot.
+        refreshing = self._refreshing
+        if refreshing is not None and refreshing[0].is_alive():
+            if now - refreshing[1] >= REFRESH_STALL_SECONDS:
+                # The thread never got to run (uWSGI without enable-threads
+                # starts no threads): rebuild in this worker once the
+                # current response has gone out instead.
+                request_finished.connect(self._refresh_after_response, weak=False, dispatch_uid=self._dispatch_uid)
+            return
+        thread = threading.Thread(target=self._refresh_in_background, daemon=True)
+        self._refreshing = (thread, now)
+        thread.start()
+
+    def wait(self):
+        # For tests and benchmarks: block until a background refresh is done.
+        refreshing = self._refreshing
+        if refreshing is not None:
+            refreshing[0].join()
+
+    def suggest(self, term, limit=10):
+        self._maybe_refresh()
+
+        prefix = normalize_location(term)
+        if not prefix:
+            return []
+        words, keys, cities = self._snapshot
+        start = bisect_left(words, prefix)
+        end = bisect_left(words, prefix + '\uffff', start)
+        matches = set(keys[start:end])
+        ranked = heapq.nsmallest(limit, matches, key=lambda key: (-cities[key][1], key))
+        return [{'name': cities[key][0], 'key': key, 'departures': cities[key][1]} for key in ranked]
+
+
+city_index = CityIndex()
@@ -0,0 +1,128 @@
+import csv
+import json
+from datetime import datetime, time, timedelta
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from .models import Booking
+
+
+EXPORT_CHUNK_SIZE = 2000
+
+BOOKING_COLUMNS = [
+    ('booking_id', 'booking_id'),
+    ('booking_date', 'booking_date'),
+    ('status', 'status'),
+    ('username', 'user__username'),
+    ('travel_id', 'travel_option__travel_id'),
+    ('travel_type', 'travel_option__travel_type'),
+    ('source', 'travel_option__source'),
+    ('destination', 'travel_option__destination'),
+    ('departure_date', 'travel_option__departure_date'),
+    ('departure_time', 'travel_option__departure_time'),
+    ('number_of_seats', 'number_of_seats'),
+    ('total_price', 'total_price'),
+    ('passenger_names', 'passenger_names'),
+    ('contact_email', 'contact_email'),
+    ('contact_phone', 'contact_phone'),
+]
+
+MANIFEST_COLUMNS = [
+    ('travel_id', 'travel_option__travel_id'),
+    ('departure_date', 'travel_option__departure_date'),
+    ('departure_time', 'travel_option__departure_time'),
+    ('booking_id', 'booking_id'),
+    ('passenger_name', 'passenger_names'),
+    ('contact_email', 'contact_email'),
+    ('contact_phone', 'contact_phone'),
+]
+
+DATE_FIELDS = {
+    'booking': 'booking_date',
+    'departure': 'travel_option__departure_date',
+}
+# Filtered as a half-open range of aware datetimes in the current time zone
+# rather than with __date, so the booking_date index can still be used.
+DATETIME_FIELDS = {'booking'}
+
+
+def _start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def filter_bookings(queryset=None, date_from=None, date_to=None, date_field='booking', status=None, travel_ids=None):
+    if queryset is None:
+        queryset = Booking.objects.all()
+    lookup = DATE_FIELDS[date_field]
+    if date_field in DATETIME_FIELDS:
+        if date_from:
+            queryset = queryset.filter(**{f'{lookup}__gte': _start_of_day(date_from)})
+        if date_to:
+            queryset = queryset.filter(**{f'{lookup}__lt': _start_of_day(date_to + timedelta(days=1))})
+    else:
+        if date_from:
+            queryset = queryset.filter(**{f'{lookup}__gte': date_from})
+        if date_to:
+            queryset = queryset.filter(**{f'{lookup}__lte': date_to})
+    if status:
+        queryset = queryset.filter(status=status)
+    if travel_ids:
+        queryset = queryset.filter(travel_option__travel_id__in=travel_ids)
+    return queryset
+
+
+def export_rows(queryset, kind='bookings', chunk_size=EXPORT_CHUNK_SIZE):
+    # values_list() plus iterator() streams plain tuples through a server-side
+    # cursor (where the backend has one) instead of building model instances
+    # for the whole result set.
+    if kind == 'manifest':
+        rows = (
+            queryset.filter(status='confirmed')
+            .order_by('travel_option_id', 'id')
+            .values_list(*[lookup for _, lookup in MANIFEST_COLUMNS])
+            .iterator(chunk_size=chunk_size)
+        )
+        # One manifest line per passenger on the booking.
+        for row in rows:
+            for name in row[4].split(','):
+                if name.strip():
+                    yield row[:4] + (name.strip(),) + row[5:]
+    else:
+        yield from (
+            queryset.order_by('id')
+            .values_list(*[lookup for _, lookup in BOOKING_COLUMNS])
+            .iterator(chunk_size=chunk_size)
+        )
+
+
+def export_header(kind='bookings'):
+    return [name for name, _ in (MANIFEST_COLUMNS if kind == 'manifest' else BOOKING_COLUMNS)]
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def stream_csv(header, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_jsonl(header, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(header, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+def stream_export(queryset, kind='bookings', file_format='csv'):
+    stream = stream_jsonl if file_format == 'jsonl' else stream_csv
+    return stream(export_header(kind), export_rows(queryset, kind))
+
+
+def export_response(queryset, kind='bookings', file_format='csv'):
+    content_type = 'application/x-ndjson' if file_format == 'jsonl' else 'text/csv'
+    response = StreamingHttpResponse(stream_export(queryset, kind, file_format), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{kind}.{file_format}"'
+    return response
@@ -1,3 +1,4 @@
+from datetime import datetime
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
@@ -19,9 +20,8 @@ class CustomUserCreationForm(UserCreationForm):
         user.first_name = self.cleaned_data['first_name']
         user.last_name = self.cleaned_data['last_name']
         if commit:
+            # The post_save signal creates the user profile.
             user.save()
-            # Create user profile
-            UserProfile.objects.create(user=user)
         return user
 
 
@@ -76,6 +76,16 @@ class TravelSearchForm(forms.Form):
     )
 
 
+class FareCalendarForm(forms.Form):
+    MAX_DAYS = 90
+    
+    source = forms.CharField(max_length=100)
+    destination = forms.CharField(max_length=100)
+    travel_type = forms.ChoiceField(choices=TravelSearchForm.TRAVEL_TYPE_CHOICES, required=False)
+    start = forms.DateField(required=False)
+    days = forms.IntegerField(min_value=1, max_value=MAX_DAYS, required=False)
+
+
 class BookingForm(forms.ModelForm):
     class Meta:
         model = Booking
@@ -120,3 +130,37 @@ class BookingForm(forms.ModelForm):
             )
         
         return ', '.join(names)
+
+
+class ItineraryBookingForm(BookingForm):
+    legs = forms.ModelMultipleChoiceField(
+        queryset=TravelOption.objects.all(),
+        widget=forms.MultipleHiddenInput
+    )
+    
+    field_order = ['legs', 'number_of_seats', 'passenger_names', 'contact_email', 'contact_phone']
+    
+    def clean_legs(self):
+        legs = self.cleaned_data['legs']
+        if len(legs) < 2:
+            raise forms.ValidationError("An itinerary needs at least two travel options.")
+        
+        ordered = sorted(legs, key=lambda leg: (leg.departure_date, leg.departure_time))
+        for leg, next_leg in zip(ordered, ordered[1:]):
+            if leg.destination_key != next_leg.source_key:
+                raise forms.ValidationError(
+                    f"{leg.travel_id} arrives in {leg.destination}, but {next_leg.travel_id} leaves from {next_leg.source}."
+                )
+            arrival = datetime.combine(leg.arrival_date, leg.arrival_time)
+            if arrival >= datetime.combine(next_leg.departure_date, next_leg.departure_time):
+                raise forms.ValidationError(f"{next_leg.travel_id} departs before {leg.travel_id} arrives.")
+        return legs
+    
+    def clean_number_of_seats(self):
+        number_of_seats = self.cleaned_data['number_of_seats']
+        for leg in self.cleaned_data.get('legs', []):
+            if number_of_seats > leg.available_seats:
+                raise forms.ValidationError(
+                    f"Only {leg.available_seats} seats are available on {leg.travel_id}."
+                )
+        return number_of_seats
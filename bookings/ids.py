@@ -0,0 +1,67 @@
+import os
+import threading
+import time
+from django.conf import settings
+
+
+# Crockford base32: no I, L, O or U, so IDs survive being read out or retyped.
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+TIMESTAMP_LENGTH = 10
+NODE_LENGTH = 5
+SEQUENCE_LENGTH = 2
+SEQUENCE_LIMIT = 32 ** SEQUENCE_LENGTH
+PID_BITS = 22
+
+
+def encode_base32(value, length):
+    chars = []
+    for _ in range(length):
+        value, index = divmod(value, 32)
+        chars.append(ALPHABET[index])
+    return ''.join(reversed(chars))
+
+
+def node_id():
+    # The low bits are the process id, unique among live processes on one
+    # host; ID_GENERATOR_NODE (0-7) separates hosts. Forked workers get a new
+    # pid and therefore a new node without any reset.
+    return settings.ID_GENERATOR_NODE << PID_BITS | os.getpid() % (1 << PID_BITS)
+
+
+class IdGenerator:
+    # prefix + 10 chars of millisecond timestamp + 5 chars of node + 2 chars
+    # of per-millisecond sequence. IDs sort by creation time, so inserts land
+    # at the right-hand edge of the unique index instead of scattering.
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._last = 0
+        self._sequence = 0
+
+    def __call__(self):
+        with self._lock:
+            now = time.time_ns() // 1_000_000
+            if now > self._last:
+                self._last = now
+                self._sequence = 0
+            else:
+                # Same millisecond, or the clock stepped back: keep counting
+                # from the last timestamp handed out, borrowing the next
+                # millisecond when the sequence runs out.
+                self._sequence += 1
+                if self._sequence == SEQUENCE_LIMIT:
+                    self._last += 1
+                    self._sequence = 0
+            timestamp, sequence = self._last, self._sequence
+        return (
+            f'{self.prefix}{encode_base32(timestamp, TIMESTAMP_LENGTH)}'
+            f'{encode_base32(node_id(), NODE_LENGTH)}{encode_base32(sequence, SEQUENCE_LENGTH)}'
+        )
+
+
+booking_ids = IdGenerator('TRV')
+travel_ids = {travel_type: IdGenerator(travel_type.upper()[:2]) for travel_type in ('flight', 'train', 'bus')}
+
+
+def generate_travel_id(travel_type):
+    return travel_ids[travel_type]()
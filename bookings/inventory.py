@@ -0,0 +1,277 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Sum, OuterRef, Subquery
+from django.utils import timezone
+from .models import TravelOption, Booking, Location, ROUTE_DAY_FIELDS, generate_booking_id, normalize_location
+from .search import invalidate_search_cache
+from .summaries import refresh_route_days, refresh_travel_options
+
+
+class SeatsUnavailable(Exception):
+    def __init__(self, travel_option):
+        super().__init__(f'Not enough seats available on {travel_option.travel_id}.')
+        self.travel_option = travel_option
+
+
+def _seats_changed(*travel_options):
+    # One refresh for all the trips, so their summary rows are locked in key
+    # order rather than in the order the trips were touched.
+    if not travel_options:
+        return
+    refresh_travel_options(*travel_options)
+    departure_dates = [travel_option.departure_date for travel_option in travel_options]
+    transaction.on_commit(lambda: invalidate_search_cache(*departure_dates))
+
+
+def reserve_seats(travel_option, seats):
+    # Single conditional UPDATE: the seat check and the decrement happen in the
+    # same statement, so concurrent bookings can never oversell the row.
+    updated = TravelOption.objects.filter(
+        pk=travel_option.pk,
+        available_seats__gte=seats,
+    ).update(
+        available_seats=F('available_seats') - seats,
+        updated_at=timezone.now(),
+    )
+    if updated:
+        _seats_changed(travel_option)
+    return updated == 1
+
+
+def _return_seats(travel_option, seats):
+    return TravelOption.objects.filter(pk=travel_option.pk).update(
+        available_seats=F('available_seats') + seats,
+        updated_at=timezone.now(),
+    ) == 1
+
+
+def release_seats(travel_option, seats):
+    released = _return_seats(travel_option, seats)
+    if released:
+        _seats_changed(travel_option)
+    return released
+
+
+def book_itinerary(user, travel_options, seats, **booking_fields):
+    # Lock every leg in primary-key order so concurrent itineraries sharing
+    # legs always queue in the same order and cannot deadlock, then take the
+    # seats on all legs with one conditional UPDATE and insert the bookings
+    # in one bulk INSERT. Any unavailable leg rolls the whole itinerary back.
+    # Like a single booking, the legs start as pending holds; confirm_hold
+    # and release_hold act on all of them together.
+    with transaction.atomic():
+        legs = list(
+            TravelOption.objects.select_for_update()
+            .filter(pk__in={travel_option.pk for travel_option in travel_options})
+            .order_by('pk')
+        )
+        today = timezone.now().date()
+        for leg in legs:
+            if leg.available_seats < seats or leg.departure_date < today:
+                raise SeatsUnavailable(leg)
+        
+        updated = TravelOption.objects.filter(
+            pk__in=[leg.pk for leg in legs],
+            available_seats__gte=seats,
+        ).update(available_seats=F('available_seats') - seats, updated_at=timezone.now())
+        if updated != len(legs):
+            raise SeatsUnavailable(legs[0])
+        
+        ordered = sorted(legs, key=lambda leg: (leg.departure_date, leg.departure_time))
+        booking_ids = [generate_booking_id() for _ in ordered]
+        expires_at = hold_expiry()
+        bookings = Booking.objects.bulk_create([
+            Booking(
+                booking_id=booking_id,
+                itinerary_id=booking_ids[0],
+                user=user,
+                travel_option=leg,
+                number_of_seats=seats,
+                total_price=leg.price * seats,
+                status='pending',
+                hold_expires_at=expires_at,
+                **booking_fields,
+            )
+            for booking_id, leg in zip(booking_ids, ordered)
+        ])
+        
+        _seats_changed(*legs)
+    
+    return bookings
+
+
+def hold_expiry():
+    return timezone.now() + timedelta(seconds=settings.BOOKING_HOLD_SECONDS)
+
+
+def held_together(booking):
+    # The booking itself, or every leg of the itinerary it belongs to.
+    if booking.itinerary_id:
+        return Booking.objects.filter(itinerary_id=booking.itinerary_id)
+    return Booking.objects.filter(pk=booking.pk)
+
+
+def confirm_hold(booking):
+    # Only a hold that is still pending and unexpired can be confirmed; the
+    # sweeper's conditional update on the same row decides any race. An
+    # itinerary is confirmed only if every one of its legs still is.
+    now = timezone.now()
+    holds = held_together(booking)
+    with transaction.atomic():
+        expected = holds.count() if booking.itinerary_id else 1
+        confirmed = holds.filter(
+            status='pending',
+            hold_expires_at__gt=now,
+        ).update(status='confirmed', hold_expires_at=None, updated_at=now)
+        if confirmed != expected:
+            transaction.set_rollback(True)
+            return False
+    
+    booking.status = 'confirmed'
+    booking.hold_expires_at = None
+    return True
+
+
+def release_hold(booking):
+    if not booking.itinerary_id:
+        return _cancel(booking, 'pending')
+    released = [
+        leg.travel_option
+        for leg in held_together(booking).filter(status='pending').select_related('travel_option')
+        if _mark_cancelled(leg, 'pending') and _return_seats(leg.travel_option, leg.number_of_seats)
+    ]
+    _seats_changed(*released)
+    booking.status = 'cancelled'
+    return bool(released)
+
+
+def cancel_booking(booking):
+    return _cancel(booking, 'confirmed')
+
+
+def _mark_cancelled(booking, from_status):
+    # Flip the status conditionally so a double-submitted cancel cannot
+    # release the same seats twice.
+    return Booking.objects.filter(pk=booking.pk, status=from_status).update(
+        status='cancelled',
+        updated_at=timezone.now(),
+    ) == 1
+
+
+def _cancel(booking, from_status):
+    if not _mark_cancelled(booking, from_status):
+        return False
+
+    release_seats(booking.travel_option, booking.number_of_seats)
+    booking.status = 'cancelled'
+    return True
+
+
+def release_expired_holds(batch_size=1000):
+    now = timezone.now()
+    released = 0
+    
+    while True:
+        with transaction.atomic():
+            ids = list(
+                Booking.objects.select_for_update()
+                .filter(status='pending', hold_expires_at__lte=now)
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                return released
+            
+            expired = Booking.objects.filter(id__in=ids)
+            expired.update(status='cancelled', updated_at=now)
+            
+            # Give every affected trip back the seats of all its expired holds
+            # in a single UPDATE ... SET available_seats = available_seats + (SELECT SUM(...)).
+            seats = (
+                expired.filter(travel_option=OuterRef('pk'))
+                .values('travel_option')
+                .annotate(total=Sum('number_of_seats'))
+                .values('total')
+            )
+            travel_options = TravelOption.objects.filter(pk__in=expired.values('travel_option'))
+            route_days = list(travel_options.values_list(*ROUTE_DAY_FIELDS).distinct())
+            travel_options.update(available_seats=F('available_seats') + Subquery(seats), updated_at=now)
+            refresh_route_days(route_days)
+            
+            departure_dates = {departure_date for _, _, departure_date, _ in route_days}
+            transaction.on_commit(lambda dates=departure_dates: invalidate_search_cache(*dates))
+        
+        released += len(ids)
+
+
+UPSERT_FIELDS = [
+    'travel_type', 'source', 'destination', 'source_key', 'destination_key',
+    'departure_date', 'departure_time', 'arrival_date', 'arrival_time',
+    'price', 'available_seats', 'total_seats', 'updated_at',
+]
+
+
+def upsert_travel_options(travel_options):
+    # One INSERT ... ON CONFLICT (travel_id) DO UPDATE for the whole batch
+    # (ON DUPLICATE KEY UPDATE on MySQL, which takes no conflict target).
+    # bulk_create skips TravelOption.save() and the model signals, so the
+    # location keys, Location rows, route/day summaries and search
+    # invalidation are done here.
+    locations = {}
+    for travel_option in travel_options:
+        travel_option.source_key = normalize_location(travel_option.source)
+        travel_option.destination_key = normalize_location(travel_option.destination)
+        locations.setdefault(travel_option.source_key, travel_option.source)
+        locations.setdefault(travel_option.destination_key, travel_option.destination)
+    
+    with transaction.atomic():
+        # Lock the trips being rescheduled so no booking lands between
+        # reading their seat counts and writing the new rows.
+        existing = {
+            row[0]: row[1:]
+            for row in TravelOption.objects.select_for_update()
+            .filter(travel_id__in=[travel_option.travel_id for travel_option in travel_options])
+            .values_list('travel_id', 'total_seats', 'available_seats', *ROUTE_DAY_FIELDS)
+        }
+        for travel_option in travel_options:
+            if travel_option.travel_id in existing:
+                # A schedule import never hands out seats that are already
+                # booked or held: keep them taken out of the new capacity.
+                total_seats, available_seats = existing[travel_option.travel_id][:2]
+                taken = total_seats - available_seats
+                travel_option.available_seats = max(travel_option.total_seats - taken, 0)
+        
+        route_days = {row[2:] for row in existing.values()}
+        route_days.update(
+            tuple(getattr(travel_option, field) for field in ROUTE_DAY_FIELDS) for travel_option in travel_options
+        )
+        departure_dates = {departure_date for _, _, departure_date, _ in route_days}
+        
+        TravelOption.objects.bulk_create(
+            travel_options,
+            update_conflicts=True,
+            unique_fields=['travel_id'] if connection.features.supports_update_conflicts_with_target else None,
+            update_fields=UPSERT_FIELDS,
+        )
+        Location.objects.bulk_create(
+            [Location(name=name, key=key) for key, name in locations.items()],
+            ignore_conflicts=True,
+        )
+        refresh_route_days(route_days)
+        transaction.on_commit(lambda: invalidate_search_cache(*departure_dates, catalog=True))
+
+
+def delete_travel_options(travel_options, refresh_summaries=True):
+    # QuerySet.delete() would load every trip and send post_delete for each
+    # one, refreshing a summary per row. Delete their bookings and the trips
+    # directly instead, then refresh the touched route/days once. Pass
+    # refresh_summaries=False when rebuild_route_day_summaries() follows.
+    with transaction.atomic():
+        route_days = set(travel_options.values_list(*ROUTE_DAY_FIELDS).distinct())
+        Booking.objects.filter(travel_option__in=travel_options).delete()
+        deleted = travel_options._raw_delete(travel_options.db)
+        if refresh_summaries:
+            refresh_route_days(route_days)
+        departure_dates = {departure_date for _, _, departure_date, _ in route_days}
+        transaction.on_commit(lambda: invalidate_search_cache(*departure_dates, catalog=True))
+    return deleted
@@ -0,0 +1,179 @@
+import asyncio
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import time as dt_time, timedelta
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from bookings.inventory import delete_travel_options
+from bookings.models import TravelOption, Booking, Location, normalize_location
+
+
+BENCH_PREFIX = 'BA'
+BENCH_USERNAME = 'bench_asgi'
+CITIES = ['Async Alpha', 'Async Bravo', 'Async Charlie', 'Async Delta']
+
+
+class Command(BaseCommand):
+    help = 'Compare the async read views served through ASGI against the sync views under threaded WSGI'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=64,
+                            help='Concurrent requests (WSGI threads / in-flight ASGI requests)')
+        parser.add_argument('--requests', type=int, default=1000, help='Requests per deployment')
+        parser.add_argument('--db-latency-ms', type=float, default=0,
+                            help='Extra latency added to every SQL query to simulate a slow database')
+        parser.add_argument('--trips', type=int, default=2000)
+        parser.add_argument('--warm-cache', action='store_true',
+                            help='Keep the search cache enabled (by default every search hits the database)')
+
+    def handle(self, *args, **options):
+        booking_id = self._setup(options['trips'])
+        rng = random.Random(7)
+        paths = [self._path(rng, booking_id) for _ in range(options['requests'])]
+
+        latency = options['db_latency_ms'] / 1000
+
+        def slow_query(execute, sql, params, many, context):
+            time.sleep(latency)
+            return execute(sql, params, many, context)
+
+        def install(connection, **kwargs):
+            if slow_query not in connection.execute_wrappers:
+                connection.execute_wrappers.append(slow_query)
+
+        if latency:
+            connection_created.connect(install)
+            for conn in connections.all():
+                install(conn)
+
+        caches = None if options['warm_cache'] else {
+            'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+        }
+        try:
+            with override_settings(**({'CACHES': caches} if caches else {})):
+                results = {'wsgi (threads)': self._run_wsgi(paths, options['concurrency'])}
+                # AsyncClient builds plain ASGIRequests; use the URLconf that
+                # asgi.application routes the async views through.
+                with override_settings(ROOT_URLCONF='travel_booking.asgi_urls'):
+                    results['asgi (asyncio)'] = asyncio.run(self._run_asgi(paths, options['concurrency']))
+        finally:
+            connection_created.disconnect(install)
+            for conn in connections.all():
+                if slow_query in conn.execute_wrappers:
+                    conn.execute_wrappers.remove(slow_query)
+            self._cleanup()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"\n=== ASGI vs WSGI ({options['requests']} requests, concurrency {options['concurrency']}, "
+            f"+{options['db_latency_ms']:g} ms per query) ===\n"
+        ))
+        self.stdout.write(f"{'deployment':<18}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+        for name, (elapsed, latencies, errors) in results.items():
+            quantiles = statistics.quantiles(latencies, n=100, method='inclusive')
+            self.stdout.write(
+                f'{name:<18}{len(latencies) / elapsed:>10.1f}{quantiles[49]:>10.2f}'
+                f'{quantiles[94]:>10.2f}{quantiles[98]:>10.2f}{errors:>8}'
+            )
+
+    def _path(self, rng, booking_id):
+        source, destination = rng.sample(CITIES, 2)
+        day = (timezone.now().date() + timedelta(days=rng.randint(2, 30))).isoformat()
+        return rng.choice([
+            (reverse('home'), {'source': source}),
+            (reverse('travel_options'), {'source': source, 'destination': destination}),
+            (reverse('travel_options'), {'departure_date': day}),
+            (reverse('api_search'), {'source': source, 'departure_date': day}),
+            (reverse('booking_detail', args=[booking_id]), {}),
+        ])
+
+    def _run_wsgi(self, paths, concurrency):
+        # One test client per thread, like a threaded WSGI server's workers.
+        def worker(chunk):
+            client = Client()
+            latencies, errors = [], 0
+            try:
+                for path, params in chunk:
+                    started = time.perf_counter()
+                    response = client.get(path, params)
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    errors += response.status_code != 200
+            finally:
+                connection.close()
+            return latencies, errors
+
+        chunks = [paths[i::concurrency] for i in range(concurrency)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as executor:
+            results = list(executor.map(worker, chunks))
+        elapsed = time.perf_counter() - started
+        return elapsed, [latency for result in results for latency in result[0]], sum(result[1] for result in results)
+
+    async def _run_asgi(self, paths, concurrency):
+        # AsyncClient drives django.core.handlers.asgi.ASGIHandler, which
+        # travel_booking.asgi.application extends.
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies, errors = [], 0
+
+        async def fetch(path, params):
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(path, params)
+                latencies.append((time.perf_counter() - started) * 1000)
+                errors += response.status_code != 200
+
+        started = time.perf_counter()
+        await asyncio.gather(*(fetch(path, params) for path, params in paths))
+        return time.perf_counter() - started, latencies, errors
+
+    def _setup(self, trips):
+        self._cleanup()
+        rng = random.Random(42)
+        today = timezone.now().date()
+        travel_options = []
+        for i in range(trips):
+            source, destination = rng.sample(CITIES, 2)
+            departure_date = today + timedelta(days=rng.randint(2, 30))
+            travel_options.append(TravelOption(
+                travel_id=f'{BENCH_PREFIX}{i:08d}',
+                travel_type=rng.choice(['flight', 'train', 'bus']),
+                source=source,
+                destination=destination,
+                source_key=normalize_location(source),
+                destination_key=normalize_location(destination),
+                departure_date=departure_date,
+                departure_time=dt_time(rng.randint(6, 20), 0),
+                arrival_date=departure_date,
+                arrival_time=dt_time(22, 0),
+                price=rng.randint(25, 800),
+                available_seats=50,
+                total_seats=50,
+            ))
+        TravelOption.objects.bulk_create(travel_options, batch_size=5000)
+        Location.objects.bulk_create(
+            [Location(name=city, key=normalize_location(city)) for city in CITIES],
+            ignore_conflicts=True,
+        )
+        user = User.objects.create_user(username=BENCH_USERNAME, password=None)
+        booking = Booking.objects.create(
+            user=user,
+            travel_option=TravelOption.objects.filter(travel_id__startswith=BENCH_PREFIX).first(),
+            number_of_seats=1,
+            passenger_names='Bench Passenger',
+            contact_email='bench@example.com',
+            contact_phone='000',
+        )
+        return booking.booking_id
+
+    def _cleanup(self):
+        delete_travel_options(TravelOption.objects.filter(travel_id__startswith=BENCH_PREFIX))
+        Location.objects.filter(key__in=[normalize_location(city) for city in CITIES]).delete()
+        User.objects.filter(username=BENCH_USERNAME).delete()
@@ -0,0 +1,92 @@
+import time
+import uuid
+from datetime import time as dt_time, timedelta
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from bookings.ids import IdGenerator
+from bookings.models import TravelOption, Booking
+
+
+BENCH_TRAVEL_ID = 'BENCHIDS'
+BENCH_USERNAME = 'bench_booking_ids'
+
+
+def _legacy_booking_id():
+    # The scheme generate_booking_id used before the time-ordered generator.
+    return f'TRV{str(uuid.uuid4())[:8].upper()}'
+
+
+class Command(BaseCommand):
+    help = 'Compare insert throughput of time-ordered booking IDs against the old random uuid4 scheme'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200000, help='Bookings inserted per scheme')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Bookings per transaction')
+
+    def handle(self, *args, **options):
+        travel_option, user = self._setup()
+        schemes = {
+            'uuid4 prefix': _legacy_booking_id,
+            'time-ordered': IdGenerator('BEN'),
+        }
+        try:
+            results = {name: self._run(generate, travel_option, user, options) for name, generate in schemes.items()}
+        finally:
+            travel_option.delete()
+            user.delete()
+
+        self.stdout.write(self.style.SUCCESS(f"\n=== BOOKING ID BENCHMARK ({options['rows']} rows per scheme) ===\n"))
+        self.stdout.write(f"{'scheme':<16}{'rows/s':>12}{'collisions':>12}")
+        for name, (rate, collisions) in results.items():
+            self.stdout.write(f'{name:<16}{rate:>12.0f}{collisions:>12}')
+
+    def _run(self, generate, travel_option, user, options):
+        Booking.objects.filter(travel_option=travel_option).delete()
+        inserted = 0
+        collisions = 0
+        started = time.perf_counter()
+        while inserted < options['rows']:
+            size = min(options['batch_size'], options['rows'] - inserted)
+            # One transaction per batch of single-row INSERTs, the way
+            # bookings arrive in production.
+            with transaction.atomic():
+                for _ in range(size):
+                    try:
+                        with transaction.atomic():
+                            Booking.objects.create(
+                                booking_id=generate(),
+                                user=user,
+                                travel_option=travel_option,
+                                number_of_seats=1,
+                                total_price=100,
+                                passenger_names='Bench Passenger',
+                                contact_email='bench@example.com',
+                                contact_phone='000',
+                            )
+                    except IntegrityError:
+                        collisions += 1
+            inserted += size
+        return inserted / (time.perf_counter() - started), collisions
+
+    def _setup(self):
+        TravelOption.objects.filter(travel_id=BENCH_TRAVEL_ID).delete()
+        User.objects.filter(username=BENCH_USERNAME).delete()
+
+        departure_date = timezone.now().date() + timedelta(days=30)
+        travel_option = TravelOption.objects.create(
+            travel_id=BENCH_TRAVEL_ID,
+            travel_type='flight',
+            source='Bench City',
+            destination='Bench Town',
+            departure_date=departure_date,
+            departure_time=dt_time(10, 0),
+            arrival_date=departure_date,
+            arrival_time=dt_time(12, 0),
+            price=100,
+            available_seats=0,
+            total_seats=0,
+        )
+        user = User.objects.create_user(username=BENCH_USERNAME, password=None)
+        return travel_option, user
@@ -0,0 +1,98 @@
+import statistics
+import time
+from datetime import time as dt_time, timedelta
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from bookings.inventory import delete_travel_options
+from bookings.models import TravelOption, Booking
+
+
+BENCH_PREFIX = 'BENCHLEG'
+BENCH_USERNAME = 'bench_itinerary'
+
+
+class Command(BaseCommand):
+    help = 'Compare one itinerary booking against sequential book_travel calls for the same legs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--legs', type=int, default=3)
+        parser.add_argument('--iterations', type=int, default=50)
+
+    def handle(self, *args, **options):
+        legs, user = self._setup(options['legs'], options['iterations'])
+        client = Client()
+        client.force_login(user)
+        booking_data = {
+            'number_of_seats': 1,
+            'passenger_names': 'Bench Passenger',
+            'contact_email': 'bench@example.com',
+            'contact_phone': '000',
+        }
+
+        def book_itinerary():
+            response = client.post(reverse('book_itinerary'), {'legs': [leg.pk for leg in legs], **booking_data})
+            client.post(response['Location'])
+
+        def book_sequentially():
+            for leg in legs:
+                response = client.post(reverse('book_travel', args=[leg.pk]), booking_data)
+                client.post(response['Location'])
+
+        try:
+            results = {
+                'itinerary': self._measure(book_itinerary, options['iterations']),
+                'sequential': self._measure(book_sequentially, options['iterations']),
+            }
+            booked = Booking.objects.filter(user=user, status='confirmed').count()
+        finally:
+            delete_travel_options(TravelOption.objects.filter(travel_id__startswith=BENCH_PREFIX))
+            user.delete()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"\n=== ITINERARY BENCHMARK ({options['legs']} legs, {options['iterations']} iterations) ===\n"
+        ))
+        self.stdout.write(f"{'flow':<12}{'p50 ms':>10}{'p95 ms':>10}{'queries':>10}")
+        for name, (latencies, queries) in results.items():
+            self.stdout.write(
+                f'{name:<12}{statistics.median(latencies):>10.2f}'
+                f'{statistics.quantiles(latencies, n=20)[-1]:>10.2f}{queries:>10.1f}'
+            )
+        self.stdout.write(f'Confirmed bookings: {booked}')
+
+    def _measure(self, flow, iterations):
+        latencies = []
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(iterations):
+                started = time.perf_counter()
+                flow()
+                latencies.append((time.perf_counter() - started) * 1000)
+        return latencies, len(queries) / iterations
+
+    def _setup(self, leg_count, iterations):
+        delete_travel_options(TravelOption.objects.filter(travel_id__startswith=BENCH_PREFIX))
+        User.objects.filter(username=BENCH_USERNAME).delete()
+
+        departure_date = timezone.now().date() + timedelta(days=30)
+        legs = [
+            TravelOption.objects.create(
+                travel_id=f'{BENCH_PREFIX}{i}',
+                travel_type='flight',
+                source=f'Bench Stop {i}',
+                destination=f'Bench Stop {i + 1}',
+                departure_date=departure_date,
+                departure_time=dt_time(6 + 2 * i, 0),
+                arrival_date=departure_date,
+                arrival_time=dt_time(7 + 2 * i, 0),
+                price=100,
+                available_seats=iterations * 2,
+                total_seats=iterations * 2,
+            )
+            for i in range(leg_count)
+        ]
+        user = User.objects.create_user(username=BENCH_USERNAME, password=None)
+        return legs, user
@@ -0,0 +1,164 @@
+import random
+import statistics
+import time
+from datetime import datetime, time as dt_time, timedelta
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Min, Max
+from django.utils import timezone
+from bookings.inventory import delete_travel_options
+from bookings.models import TravelOption, Booking, Location, normalize_location
+from bookings.search import resolve_location_keys
+
+
+BENCH_PREFIX = 'BS'
+BENCH_USER_PREFIX = 'bench_search_'
+CITIES = [
+    'New York', 'Los Angeles', 'Chicago', 'Houston', 'Phoenix',
+    'Philadelphia', 'San Antonio', 'San Diego', 'Dallas', 'San Jose',
+    'Austin', 'Jacksonville', 'Fort Worth', 'Columbus', 'Charlotte',
+]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the search and my-bookings queries with and without the search indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000000, help='Travel options to seed')
+        parser.add_argument('--bookings', type=int, default=200000, help='Bookings to seed')
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=20, help='Runs per query')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--explain', action='store_true', help='Print the query plan of each query')
+        parser.add_argument('--cleanup', action='store_true', help='Delete the seeded rows and exit')
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            self._cleanup()
+            return
+
+        self._seed(options)
+
+        results = {}
+        for label, with_indexes in (('with indexes', True), ('without indexes', False)):
+            if not with_indexes:
+                self._toggle_indexes(add=False)
+            try:
+                results[label] = self._run_queries(options)
+            finally:
+                if not with_indexes:
+                    self._toggle_indexes(add=True)
+
+        self.stdout.write(self.style.SUCCESS('\n=== SEARCH QUERY BENCHMARK (median ms) ===\n'))
+        self.stdout.write(f"{'query':<24}{'with indexes':>16}{'without indexes':>18}")
+        for name in results['with indexes']:
+            self.stdout.write(
+                f"{name:<24}{results['with indexes'][name]:>16.2f}{results['without indexes'][name]:>18.2f}"
+            )
+
+    def _queries(self):
+        today = timezone.now().date()
+        upcoming = TravelOption.objects.filter(departure_date__gte=today, available_seats__gt=0)
+        user = User.objects.filter(username__startswith=BENCH_USER_PREFIX).first()
+        return {
+            'upcoming': upcoming,
+            'by type': upcoming.filter(travel_type='train'),
+            'by source': upcoming.filter(source_key__in=resolve_location_keys('San')),
+            'by route': upcoming.filter(source_key='chicago', destination_key='dallas'),
+            'by route and date': upcoming.filter(
+                source_key='chicago', destination_key='dallas', departure_date=today + timedelta(days=7)
+            ),
+            'my bookings': Booking.objects.filter(user=user),
+        }
+
+    def _run_queries(self, options):
+        timings = {}
+        for name, queryset in self._queries().items():
+            if options['explain']:
+                self.stdout.write(f'-- {name}\n{queryset[:12].explain()}')
+            runs = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                list(queryset[:12])
+                runs.append((time.perf_counter() - started) * 1000)
+            timings[name] = statistics.median(runs)
+        return timings
+
+    def _toggle_indexes(self, add):
+        with connection.schema_editor() as schema_editor:
+            for model in (TravelOption, Booking):
+                for index in model._meta.indexes:
+                    if add:
+                        schema_editor.add_index(model, index)
+                    else:
+                        schema_editor.remove_index(model, index)
+
+    def _seed(self, options):
+        rng = random.Random(42)
+        today = timezone.now().date()
+        existing = TravelOption.objects.filter(travel_id__startswith=BENCH_PREFIX).count()
+        batch = []
+        for i in range(existing, options['rows']):
+            source, destination = rng.sample(CITIES, 2)
+            departure_date = today + timedelta(days=rng.randint(-30, 365))
+            departure = datetime.combine(departure_date, dt_time(rng.randint(0, 23), rng.choice([0, 15, 30, 45])))
+            arrival = departure + timedelta(hours=rng.randint(1, 8))
+            total_seats = rng.choice([30, 40, 50, 60, 80, 100])
+            batch.append(TravelOption(
+                travel_id=f'{BENCH_PREFIX}{i:010d}',
+                travel_type=rng.choice(['flight', 'train', 'bus']),
+                source=source,
+                destination=destination,
+                source_key=normalize_location(source),
+                destination_key=normalize_location(destination),
+                departure_date=departure_date,
+                departure_time=departure.time(),
+                arrival_date=arrival.date(),
+                arrival_time=arrival.time(),
+                price=rng.randint(25, 800),
+                available_seats=rng.randint(0, total_seats),
+                total_seats=total_seats,
+            ))
+            if len(batch) >= options['batch_size']:
+                TravelOption.objects.bulk_create(batch)
+                batch = []
+                self.stdout.write(f'Seeded {i + 1} travel options...')
+        TravelOption.objects.bulk_create(batch)
+        Location.objects.bulk_create(
+            [Location(name=city, key=normalize_location(city)) for city in CITIES],
+            ignore_conflicts=True,
+        )
+
+        existing_users = User.objects.filter(username__startswith=BENCH_USER_PREFIX).count()
+        User.objects.bulk_create([
+            User(username=f'{BENCH_USER_PREFIX}{i}') for i in range(existing_users, options['users'])
+        ])
+        user_ids = list(User.objects.filter(username__startswith=BENCH_USER_PREFIX).values_list('id', flat=True))
+        bounds = TravelOption.objects.filter(travel_id__startswith=BENCH_PREFIX).aggregate(Min('id'), Max('id'))
+        min_id, max_id = bounds['id__min'], bounds['id__max']
+
+        existing = Booking.objects.filter(booking_id__startswith=BENCH_PREFIX).count()
+        batch = []
+        for i in range(existing, options['bookings']):
+            batch.append(Booking(
+                booking_id=f'{BENCH_PREFIX}{i:010d}',
+                user_id=rng.choice(user_ids),
+                travel_option_id=rng.randint(min_id, max_id),
+                number_of_seats=1,
+                total_price=100,
+                passenger_names='Bench Passenger',
+                contact_email='bench@example.com',
+                contact_phone='000',
+            ))
+            if len(batch) >= options['batch_size']:
+                Booking.objects.bulk_create(batch)
+                batch = []
+                self.stdout.write(f'Seeded {i + 1} bookings...')
+        Booking.objects.bulk_create(batch)
+
+    def _cleanup(self):
+        Booking.objects.filter(booking_id__startswith=BENCH_PREFIX).delete()
+        delete_travel_options(TravelOption.objects.filter(travel_id__startswith=BENCH_PREFIX))
+        User.objects.filter(username__startswith=BENCH_USER_PREFIX).delete()
+        self.stdout.write(self.style.SUCCESS('Removed benchmark rows.'))
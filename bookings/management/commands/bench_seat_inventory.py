@@ -0,0 +1,152 @@
+import multiprocessing
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from datetime import time as dt_time, timedelta
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User
+from django.db import connection, connections, transaction, DatabaseError
+from django.utils import timezone
+from bookings.models import TravelOption, Booking
+from bookings import inventory
+
+
+BENCH_TRAVEL_ID = 'BENCHSEATS'
+BENCH_USERNAME = 'bench_inventory'
+
+
+def _book_naive(travel_option, user, seats):
+    # The pre-inventory-service flow: read, check in Python, save the whole row.
+    with transaction.atomic():
+        travel_option.refresh_from_db()
+        if seats > travel_option.available_seats:
+            return False
+        Booking.objects.create(
+            user=user,
+            travel_option=travel_option,
+            number_of_seats=seats,
+            total_price=travel_option.price * seats,
+            passenger_names='Bench Passenger',
+            contact_email='bench@example.com',
+            contact_phone='000',
+        )
+        travel_option.available_seats -= seats
+        travel_option.save()
+    return True
+
+
+def _book_atomic(travel_option, user, seats):
+    with transaction.atomic():
+        if not inventory.reserve_seats(travel_option, seats):
+            return False
+        Booking.objects.create(
+            user=user,
+            travel_option=travel_option,
+            number_of_seats=seats,
+            total_price=travel_option.price * seats,
+            passenger_names='Bench Passenger',
+            contact_email='bench@example.com',
+            contact_phone='000',
+        )
+    return True
+
+
+def _run_worker(mode, travel_option_pk, user_pk, attempts, seats):
+    book = _book_atomic if mode == 'atomic' else _book_naive
+    travel_option = TravelOption.objects.get(pk=travel_option_pk)
+    user = User.objects.get(pk=user_pk)
+    latencies = []
+    booked = 0
+    errors = 0
+    try:
+        for _ in range(attempts):
+            started = time.perf_counter()
+            try:
+                if book(travel_option, user, seats):
+                    booked += 1
+            except DatabaseError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+    finally:
+        connection.close()
+    return latencies, booked, errors
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = 'Hammer one TravelOption with concurrent bookings and report throughput, latency and oversell'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=['atomic', 'naive'], default='atomic',
+                            help='atomic uses the inventory service, naive replays the old read-check-save flow')
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--attempts', type=int, default=50, help='Booking attempts per worker')
+        parser.add_argument('--seats', type=int, default=100, help='Seats on the benchmarked travel option')
+        parser.add_argument('--seats-per-booking', type=int, default=1)
+        parser.add_argument('--processes', action='store_true', help='Use processes instead of threads')
+
+    def handle(self, *args, **options):
+        travel_option, user = self._setup(options['seats'])
+        workers = options['workers']
+        job = (options['mode'], travel_option.pk, user.pk, options['attempts'], options['seats_per_booking'])
+
+        if options['processes']:
+            # Children must not inherit the parent's open connection.
+            connections.close_all()
+            executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork'))
+        else:
+            executor = ThreadPoolExecutor(workers)
+
+        started = time.perf_counter()
+        with executor:
+            results = list(executor.map(_run_worker, *zip(*[job] * workers)))
+        elapsed = time.perf_counter() - started
+
+        latencies = [latency for result in results for latency in result[0]]
+        booked = sum(result[1] for result in results)
+        errors = sum(result[2] for result in results)
+
+        travel_option.refresh_from_db()
+        booked_seats = booked * options['seats_per_booking']
+        oversold = max(0, booked_seats - options['seats'])
+        lost_updates = booked_seats - (options['seats'] - travel_option.available_seats)
+
+        self.stdout.write(self.style.SUCCESS(f"\n=== SEAT INVENTORY BENCHMARK ({options['mode']}) ===\n"))
+        self.stdout.write(f"Workers: {workers} {'processes' if options['processes'] else 'threads'}")
+        self.stdout.write(f'Attempts: {len(latencies)} in {elapsed:.2f}s ({len(latencies) / elapsed:.1f} ops/s)')
+        self.stdout.write(f'Successful bookings: {booked} ({booked_seats} seats), errors: {errors}')
+        self.stdout.write(f'Latency p50: {_percentile(latencies, 50) * 1000:.2f} ms, '
+                          f'p99: {_percentile(latencies, 99) * 1000:.2f} ms')
+        self.stdout.write(f'Seats left: {travel_option.available_seats}/{options["seats"]}')
+        style = self.style.ERROR if oversold or lost_updates else self.style.SUCCESS
+        self.stdout.write(style(f'Oversold seats: {oversold}, lost seat updates: {lost_updates}'))
+
+        travel_option.delete()
+        user.delete()
+
+    def _setup(self, seats):
+        TravelOption.objects.filter(travel_id=BENCH_TRAVEL_ID).delete()
+        User.objects.filter(username=BENCH_USERNAME).delete()
+
+        departure_date = timezone.now().date() + timedelta(days=30)
+        travel_option = TravelOption.objects.create(
+            travel_id=BENCH_TRAVEL_ID,
+            travel_type='flight',
+            source='Bench City',
+            destination='Bench Town',
+            departure_date=departure_date,
+            departure_time=dt_time(10, 0),
+            arrival_date=departure_date,
+            arrival_time=dt_time(12, 0),
+            price=100,
+            available_seats=seats,
+            total_seats=seats,
+        )
+        user = User.objects.create_user(username=BENCH_USERNAME, password=None)
+        return travel_option, user
@@ -0,0 +1,111 @@
+import statistics
+import time
+from datetime import time as dt_time, timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import AnonymousUser
+from django.template.backends.django import DjangoTemplates
+from django.test import RequestFactory
+from django.utils import timezone
+from bookings.forms import TravelSearchForm
+from bookings.inventory import delete_travel_options
+from bookings.models import TravelOption
+from bookings.pagination import KeysetPage
+from bookings.search import CARD_FIELDS
+
+
+BENCH_PREFIX = 'BENCHTPL'
+PLAIN_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+
+def _engine(cached_loader):
+    options = dict(settings.TEMPLATES[0]['OPTIONS'])
+    options['loaders'] = [('django.template.loaders.cached.Loader', PLAIN_LOADERS)] if cached_loader else PLAIN_LOADERS
+    return DjangoTemplates({
+        'NAME': 'cached' if cached_loader else 'plain',
+        'DIRS': settings.TEMPLATES[0]['DIRS'],
+        'APP_DIRS': False,
+        'OPTIONS': options,
+    })
+
+
+class Command(BaseCommand):
+    help = 'Measure the per-request render cost of a 12-card search page with and without template caching'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--template', default='bookings/travel_options.html',
+                            choices=['bookings/travel_options.html', 'bookings/home.html'])
+        parser.add_argument('--cards', type=int, default=12)
+        parser.add_argument('--iterations', type=int, default=200)
+
+    def handle(self, *args, **options):
+        travel_options = self._setup(options['cards'])
+        request = RequestFactory().get('/travel-options/')
+        request.user = AnonymousUser()
+        context = {
+            'form': TravelSearchForm(),
+            'page_obj': KeysetPage(travel_options, total=len(travel_options)),
+            'travel_options': KeysetPage(travel_options, total=len(travel_options)),
+        }
+
+        runs = [
+            ('default loaders, no fragment cache', False, False),
+            ('cached loader, no fragment cache', True, False),
+            ('cached loader, warm fragment cache', True, True),
+        ]
+        try:
+            results = [
+                (label, self._measure(_engine(cached_loader), warm, options, context, request))
+                for label, cached_loader, warm in runs
+            ]
+        finally:
+            delete_travel_options(TravelOption.objects.filter(travel_id__startswith=BENCH_PREFIX))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"\n=== TEMPLATE RENDER BENCHMARK ({options['template']}, {options['cards']} cards) ===\n"
+        ))
+        self.stdout.write(f"{'configuration':<38}{'p50 ms':>10}{'p95 ms':>10}")
+        for label, latencies in results:
+            self.stdout.write(
+                f'{label:<38}{statistics.median(latencies):>10.2f}'
+                f'{statistics.quantiles(latencies, n=20)[-1]:>10.2f}'
+            )
+
+    def _measure(self, engine, warm, options, context, request):
+        latencies = []
+        for _ in range(options['iterations']):
+            if not warm:
+                # A new updated_at means a new fragment key, so every card
+                # renders from scratch without clearing the shared cache.
+                for travel_option in context['travel_options']:
+                    travel_option.updated_at += timedelta(microseconds=1)
+            started = time.perf_counter()
+            engine.get_template(options['template']).render(context, request)
+            latencies.append((time.perf_counter() - started) * 1000)
+        return latencies
+
+    def _setup(self, count):
+        delete_travel_options(TravelOption.objects.filter(travel_id__startswith=BENCH_PREFIX))
+        departure_date = timezone.now().date() + timedelta(days=30)
+        TravelOption.objects.bulk_create([
+            TravelOption(
+                travel_id=f'{BENCH_PREFIX}{i:03d}',
+                travel_type=['flight', 'train', 'bus'][i % 3],
+                source='Bench City',
+                destination='Bench Town',
+                source_key='bench city',
+                destination_key='bench town',
+                departure_date=departure_date,
+                departure_time=dt_time(6 + i % 16, 0),
+                arrival_date=departure_date,
+                arrival_time=dt_time(7 + i % 16, 0),
+                price=100 + i,
+                available_seats=3 if i % 4 == 0 else 40,
+                total_seats=40,
+            )
+            for i in range(count)
+        ])
+        return list(TravelOption.objects.only(*CARD_FIELDS).filter(travel_id__startswith=BENCH_PREFIX))
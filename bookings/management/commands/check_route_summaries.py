@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from bookings.search import invalidate_search_cache
+from bookings.summaries import check_route_day_summaries, refresh_route_days
+
+
+class Command(BaseCommand):
+    help = 'Compare the route/day summary table with the travel options it summarises'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Recompute every group that differs')
+        parser.add_argument('--show', type=int, default=20, help='Differences to print')
+
+    def handle(self, *args, **options):
+        mismatches = check_route_day_summaries()
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS('Route/day summaries are consistent.'))
+            return
+
+        for key, stored, expected in mismatches[:options['show']]:
+            self.stdout.write(f"{' / '.join(map(str, key))}: stored {stored}, expected {expected}")
+        if len(mismatches) > options['show']:
+            self.stdout.write(f"... and {len(mismatches) - options['show']} more")
+
+        if not options['fix']:
+            raise CommandError(f'{len(mismatches)} route/day summaries are out of date; rerun with --fix.')
+        refresh_route_days(key for key, _, _ in mismatches)
+        invalidate_search_cache(catalog=True)
+        self.stdout.write(self.style.SUCCESS(f'Fixed {len(mismatches)} route/day summaries.'))
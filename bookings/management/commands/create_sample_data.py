@@ -1,73 +1,240 @@
+import multiprocessing
+import random
+import time as clock
+from datetime import datetime, time, timedelta
 from django.core.management.base import BaseCommand
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connections
+from django.db.models import Min, Max
 from django.utils import timezone
-from datetime import datetime, date, time, timedelta
-from bookings.models import TravelOption
-import uuid
+from bookings.ids import booking_ids, generate_travel_id
+from bookings.inventory import delete_travel_options
+from bookings.models import TravelOption, Booking, UserProfile, Location, normalize_location
+from bookings.search import invalidate_search_cache
+from bookings.summaries import rebuild_route_day_summaries
+
+
+CITIES = [
+    'New York', 'Los Angeles', 'Chicago', 'Houston', 'Phoenix',
+    'Philadelphia', 'San Antonio', 'San Diego', 'Dallas', 'San Jose',
+    'Austin', 'Jacksonville', 'Fort Worth', 'Columbus', 'Charlotte'
+]
+TRAVEL_TYPES = ['flight', 'train', 'bus']
+BASE_PRICES = {
+    'flight': (150, 800),
+    'train': (50, 300),
+    'bus': (25, 150),
+}
+SAMPLE_USER_PREFIX = 'sample_user_'
+# Large per-run inputs (the sample user ids) are shared with forked workers
+# through this module global instead of being pickled into every job.
+_shared = {}
+
+
+def _chunk_rng(seed, kind, chunk_index):
+    # Every chunk gets its own deterministic stream, so the output only
+    # depends on --seed and --batch-size, not on how chunks map to workers.
+    return random.Random(f'{seed}:{kind}:{chunk_index}')
+
+
+def _generate_travel_options(args):
+    seed, chunk_index, start, size, today, time_ordered_ids = args
+    rng = _chunk_rng(seed, 'travel', chunk_index)
+    rows = []
+    for i in range(start, start + size):
+        source, destination = rng.sample(CITIES, 2)
+        travel_type = rng.choice(TRAVEL_TYPES)
+
+        departure_date = today + timedelta(days=rng.randint(1, 90))
+        departure_time = time(rng.randint(6, 22), rng.choice([0, 15, 30, 45]))
+        arrival = datetime.combine(departure_date, departure_time) + timedelta(hours=rng.randint(1, 8))
+
+        total_seats = rng.choice([30, 40, 50, 60, 80, 100])
+        rows.append((
+            generate_travel_id(travel_type) if time_ordered_ids else f'{travel_type.upper()[:2]}{i:010d}',
+            travel_type,
+            source,
+            destination,
+            departure_date,
+            departure_time,
+            arrival.date(),
+            arrival.time(),
+            rng.randint(*BASE_PRICES[travel_type]),
+            rng.randint(int(total_seats * 0.2), total_seats),
+            total_seats,
+        ))
+    return rows
+
+
+def _generate_bookings(args):
+    seed, chunk_index, start, size, travel_id_range, time_ordered_ids = args
+    rng = _chunk_rng(seed, 'booking', chunk_index)
+    user_ids = _shared['user_ids']
+    rows = []
+    for i in range(start, start + size):
+        seats = rng.randint(1, 4)
+        rows.append((
+            booking_ids() if time_ordered_ids else f'SMP{i:012d}',
+            rng.choice(user_ids),
+            rng.randint(*travel_id_range),
+            seats,
+            'cancelled' if rng.random() < 0.1 else 'confirmed',
+            ', '.join(f'Passenger {n}' for n in range(1, seats + 1)),
+        ))
+    return rows
 
 
 class Command(BaseCommand):
-    help = 'Create sample travel options for testing'
+    help = 'Create sample travel options (and optionally users and bookings) for testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=50, help='Travel options to create')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, help='Seed for reproducible data (random if omitted)')
+        parser.add_argument('--workers', type=int, default=1, help='Processes used to generate rows')
+        parser.add_argument('--users', type=int, default=0, help='Sample users to create')
+        parser.add_argument('--with-bookings', type=int, default=0, metavar='N', help='Bookings to create (needs --users)')
+        parser.add_argument('--time-ordered-ids', action='store_true',
+                            help='Use the production ID generator instead of sequential IDs (not reproducible)')
 
     def handle(self, *args, **options):
-        TravelOption.objects.all().delete()
-        
-        cities = [
-            'New York', 'Los Angeles', 'Chicago', 'Houston', 'Phoenix',
-            'Philadelphia', 'San Antonio', 'San Diego', 'Dallas', 'San Jose',
-            'Austin', 'Jacksonville', 'Fort Worth', 'Columbus', 'Charlotte'
+        seed = options['seed'] if options['seed'] is not None else random.randrange(2 ** 32)
+        self.stdout.write(f'Using seed {seed}')
+        started = clock.perf_counter()
+
+        self.departure_dates = set(TravelOption.objects.values_list('departure_date', flat=True).distinct())
+        # The summaries are rebuilt below, so skip refreshing them here.
+        delete_travel_options(TravelOption.objects.all(), refresh_summaries=False)
+
+        Location.objects.bulk_create(
+            [Location(name=city, key=normalize_location(city)) for city in CITIES],
+            ignore_conflicts=True,
+        )
+
+        today = timezone.now().date()
+        created_count = self._write(
+            options, _generate_travel_options,
+            lambda chunk_index, start, size: (seed, chunk_index, start, size, today, options['time_ordered_ids']),
+            options['count'], self._create_travel_options, 'travel options',
+        )
+
+        user_ids = self._create_users(options['users'])
+        booking_count = 0
+        if options['with_bookings'] and user_ids and created_count:
+            bounds = TravelOption.objects.aggregate(Min('id'), Max('id'))
+            travel_id_range = (bounds['id__min'], bounds['id__max'])
+            _shared['user_ids'] = user_ids
+            booking_count = self._write(
+                options, _generate_bookings,
+                lambda chunk_index, start, size: (
+                    seed, chunk_index, start, size, travel_id_range, options['time_ordered_ids']
+                ),
+                options['with_bookings'], self._create_bookings, 'bookings',
+            )
+
+        # bulk_create skips the model signals, so rebuild the route/day
+        # summaries and invalidate cached searches here.
+        rebuild_route_day_summaries()
+        invalidate_search_cache(*self.departure_dates, catalog=True)
+
+        elapsed = clock.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Successfully created {created_count} sample travel options, {len(user_ids)} users '
+                f'and {booking_count} bookings in {elapsed:.1f}s!'
+            )
+        )
+
+    def _write(self, options, generate, make_args, total, create, label):
+        batch_size = options['batch_size']
+        jobs = [
+            make_args(chunk_index, start, min(batch_size, total - start))
+            for chunk_index, start in enumerate(range(0, total, batch_size))
         ]
-        
-        travel_types = ['flight', 'train', 'bus']
-        
-        created_count = 0
-        
-        for i in range(50):
-            import random
-            source = random.choice(cities)
-            destination = random.choice([city for city in cities if city != source])
-            travel_type = random.choice(travel_types)
-            
-            departure_date = timezone.now().date() + timedelta(days=random.randint(1, 90))
-            
-            departure_hour = random.randint(6, 22)
-            departure_minute = random.choice([0, 15, 30, 45])
-            departure_time = time(departure_hour, departure_minute)
-            
-            travel_duration = timedelta(hours=random.randint(1, 8))
-            departure_datetime = datetime.combine(departure_date, departure_time)
-            arrival_datetime = departure_datetime + travel_duration
-            
-            travel_id = f"{travel_type.upper()[:2]}{str(uuid.uuid4())[:6].upper()}"
-            
-            if travel_type == 'flight':
-                base_price = random.randint(150, 800)
-            elif travel_type == 'train':
-                base_price = random.randint(50, 300)
-            else:
-                base_price = random.randint(25, 150)
-            
-            total_seats = random.choice([30, 40, 50, 60, 80, 100])
-            available_seats = random.randint(int(total_seats * 0.2), total_seats)
-            
-            travel_option = TravelOption.objects.create(
+
+        if options['workers'] > 1:
+            # Forked workers only generate rows; this process does every write
+            # so the same code path works on SQLite's single writer.
+            connections.close_all()
+            pool = multiprocessing.get_context('fork').Pool(options['workers'])
+            chunks = pool.imap(generate, jobs)
+        else:
+            pool = None
+            chunks = map(generate, jobs)
+
+        written = 0
+        try:
+            for rows in chunks:
+                # Count what was inserted: bookings whose random trip id has
+                # no row are skipped.
+                written += create(rows)
+                self.stdout.write(f'Created {written} {label}...')
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+        return written
+
+    def _create_travel_options(self, rows):
+        self.departure_dates.update(row[4] for row in rows)
+        return len(TravelOption.objects.bulk_create([
+            TravelOption(
                 travel_id=travel_id,
                 travel_type=travel_type,
                 source=source,
                 destination=destination,
+                source_key=normalize_location(source),
+                destination_key=normalize_location(destination),
                 departure_date=departure_date,
                 departure_time=departure_time,
-                arrival_date=arrival_datetime.date(),
-                arrival_time=arrival_datetime.time(),
-                price=base_price,
+                arrival_date=arrival_date,
+                arrival_time=arrival_time,
+                price=price,
                 available_seats=available_seats,
                 total_seats=total_seats
             )
-            
-            created_count += 1
-            
-            if created_count % 10 == 0:
-                self.stdout.write(f'Created {created_count} travel options...')
-        
-        self.stdout.write(
-            self.style.SUCCESS(f'Successfully created {created_count} sample travel options!')
+            for (travel_id, travel_type, source, destination, departure_date, departure_time,
+                 arrival_date, arrival_time, price, available_seats, total_seats) in rows
+        ]))
+
+    def _create_bookings(self, rows):
+        prices = dict(
+            TravelOption.objects.filter(pk__in={row[2] for row in rows}).values_list('pk', 'price')
+        )
+        return len(Booking.objects.bulk_create([
+            Booking(
+                booking_id=booking_id,
+                user_id=user_id,
+                travel_option_id=travel_option_id,
+                number_of_seats=seats,
+                total_price=prices[travel_option_id] * seats,
+                status=status,
+                passenger_names=passenger_names,
+                contact_email='sample@example.com',
+                contact_phone='555-0100'
+            )
+            for booking_id, user_id, travel_option_id, seats, status, passenger_names in rows
+            if travel_option_id in prices
+        ]))
+
+    def _create_users(self, count):
+        existing = User.objects.filter(username__startswith=SAMPLE_USER_PREFIX).count()
+        if count > existing:
+            # Hash once: every sample user shares the password 'password123'.
+            password = make_password('password123')
+            User.objects.bulk_create([
+                User(username=f'{SAMPLE_USER_PREFIX}{i}', email=f'{SAMPLE_USER_PREFIX}{i}@example.com', password=password)
+                for i in range(existing, count)
+            ], batch_size=5000)
+            UserProfile.objects.bulk_create(
+                [UserProfile(user=user) for user in User.objects.filter(
+                    username__startswith=SAMPLE_USER_PREFIX, userprofile__isnull=True
+                )],
+                batch_size=5000,
+            )
+        return list(
+            User.objects.filter(username__startswith=SAMPLE_USER_PREFIX)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:count]
         )
@@ -1,38 +1,116 @@
+import json
+import time
+from datetime import timedelta
 from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
 from django.contrib.auth.models import User
-from bookings.models import TravelOption, Booking
+from django.db.models import Count, Min, Q, Sum
+from django.utils import timezone
+from bookings.models import TravelOption, Booking, RouteDaySummary
 
 
 class Command(BaseCommand):
     help = 'Display database statistics'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--json', action='store_true', help='Print the statistics as JSON')
+        parser.add_argument('--routes', type=int, default=10, help='Busiest routes to break down')
+        parser.add_argument('--days', type=int, default=14, help='Upcoming departure days to break down')
+
     def handle(self, *args, **options):
-        users_count = User.objects.count()
-        travel_options_count = TravelOption.objects.count()
-        bookings_count = Booking.objects.count()
-        
-        flights_count = TravelOption.objects.filter(travel_type='flight').count()
-        trains_count = TravelOption.objects.filter(travel_type='train').count()
-        buses_count = TravelOption.objects.filter(travel_type='bus').count()
-        
-        confirmed_bookings = Booking.objects.filter(status='confirmed').count()
-        cancelled_bookings = Booking.objects.filter(status='cancelled').count()
-        pending_bookings = Booking.objects.filter(status='pending').count()
-        
+        self.timings = {}
+        today = timezone.now().date()
+
+        users_count = self._timed('users', User.objects.count)
+        travel = self._timed('travel_options', lambda: TravelOption.objects.aggregate(
+            total=Count('id'),
+            flights=Count('id', filter=Q(travel_type='flight')),
+            trains=Count('id', filter=Q(travel_type='train')),
+            buses=Count('id', filter=Q(travel_type='bus')),
+            available_seats=Sum('available_seats', default=0),
+        ))
+        bookings = self._timed('bookings', lambda: Booking.objects.aggregate(
+            total=Count('id'),
+            confirmed=Count('id', filter=Q(status='confirmed')),
+            cancelled=Count('id', filter=Q(status='cancelled')),
+            pending=Count('id', filter=Q(status='pending')),
+        ))
+        # The breakdowns read the maintained route/day summaries rather than
+        # scanning every upcoming travel option.
+        routes = self._timed('routes', lambda: list(
+            RouteDaySummary.objects.filter(departure_date__gte=today)
+            .values('source_key', 'destination_key')
+            .annotate(
+                source=Min('source'),
+                destination=Min('destination'),
+                departures=Sum('departures'),
+                available_seats=Sum('seats_left'),
+                min_price=Min('min_price'),
+            )
+            .order_by('-departures', 'source_key', 'destination_key')[:options['routes']]
+        ))
+        days = self._timed('days', lambda: list(
+            RouteDaySummary.objects.filter(
+                departure_date__gte=today, departure_date__lt=today + timedelta(days=options['days'])
+            )
+            .values('departure_date')
+            .annotate(departures=Sum('departures'), available_seats=Sum('seats_left'), min_price=Min('min_price'))
+            .order_by('departure_date')
+        ))
+
+        stats = {
+            'users': users_count,
+            'travel_options': travel,
+            'bookings': bookings,
+            'routes': [
+                {key: row[key] for key in ('source', 'destination', 'departures', 'available_seats', 'min_price')}
+                for row in routes
+            ],
+            'days': days,
+            'timings_ms': self.timings,
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(stats, cls=DjangoJSONEncoder, indent=2))
+            return
+
         self.stdout.write(self.style.SUCCESS('\n=== TRAVEL LYKK DATABASE STATISTICS ===\n'))
-        
+
         self.stdout.write(f'👥 Total Users: {users_count}')
-        self.stdout.write(f'✈️  Total Travel Options: {travel_options_count}')
-        self.stdout.write(f'   - Flights: {flights_count}')
-        self.stdout.write(f'   - Trains: {trains_count}')
-        self.stdout.write(f'   - Buses: {buses_count}')
-        
-        self.stdout.write(f'\n🎫 Total Bookings: {bookings_count}')
-        self.stdout.write(f'   - Confirmed: {confirmed_bookings}')
-        self.stdout.write(f'   - Cancelled: {cancelled_bookings}')
-        self.stdout.write(f'   - Pending: {pending_bookings}')
-        
-        total_available_seats = sum(opt.available_seats for opt in TravelOption.objects.all())
-        self.stdout.write(f'\n💺 Total Available Seats: {total_available_seats}')
-        
+        self.stdout.write(f"✈️  Total Travel Options: {travel['total']}")
+        self.stdout.write(f"   - Flights: {travel['flights']}")
+        self.stdout.write(f"   - Trains: {travel['trains']}")
+        self.stdout.write(f"   - Buses: {travel['buses']}")
+
+        self.stdout.write(f"\n🎫 Total Bookings: {bookings['total']}")
+        self.stdout.write(f"   - Confirmed: {bookings['confirmed']}")
+        self.stdout.write(f"   - Cancelled: {bookings['cancelled']}")
+        self.stdout.write(f"   - Pending: {bookings['pending']}")
+
+        self.stdout.write(f"\n💺 Total Available Seats: {travel['available_seats']}")
+
+        self.stdout.write(f"\n🗺️  Busiest Upcoming Routes (top {options['routes']}):")
+        for row in stats['routes']:
+            self.stdout.write(
+                f"   - {row['source']} → {row['destination']}: {row['departures']} departures, "
+                f"{row['available_seats']} seats, from ${row['min_price']}"
+            )
+
+        self.stdout.write(f"\n📅 Departures Per Day (next {options['days']} days):")
+        for row in days:
+            self.stdout.write(
+                f"   - {row['departure_date']}: {row['departures']} departures, "
+                f"{row['available_seats']} seats, from ${row['min_price']}"
+            )
+
+        self.stdout.write('\n⏱️  Query Timings:')
+        for name, elapsed in self.timings.items():
+            self.stdout.write(f'   - {name}: {elapsed:.2f} ms')
+
         self.stdout.write(self.style.SUCCESS('\n=== END STATISTICS ===\n'))
+
+    def _timed(self, name, query):
+        started = time.perf_counter()
+        result = query()
+        self.timings[name] = round((time.perf_counter() - started) * 1000, 2)
+        return result
@@ -0,0 +1,73 @@
+import sys
+import time
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from bookings.exports import DATE_FIELDS, EXPORT_CHUNK_SIZE, export_header, export_rows, filter_bookings, stream_csv, stream_jsonl
+from bookings.models import Booking
+
+try:
+    import resource
+except ImportError:
+    # Unix only; elsewhere the peak memory figure is left out.
+    resource = None
+
+
+def _parse_date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'Invalid date: {value} (expected YYYY-MM-DD)')
+
+
+class Command(BaseCommand):
+    help = 'Stream bookings or passenger manifests to CSV or JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=['bookings', 'manifest'], default='bookings')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+        parser.add_argument('--output', help='File to write (defaults to stdout)')
+        parser.add_argument('--from', dest='date_from', type=_parse_date, help='First date, inclusive')
+        parser.add_argument('--to', dest='date_to', type=_parse_date, help='Last date, inclusive')
+        parser.add_argument('--date-field', choices=list(DATE_FIELDS), default='booking',
+                            help='Whether --from/--to apply to the booking or the departure date')
+        parser.add_argument('--status', choices=[choice for choice, _ in Booking.STATUS_CHOICES])
+        parser.add_argument('--travel-id', action='append', dest='travel_ids', help='Repeat for several trips')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        queryset = filter_bookings(
+            date_from=options['date_from'],
+            date_to=options['date_to'],
+            date_field=options['date_field'],
+            status=options['status'],
+            travel_ids=options['travel_ids'],
+        )
+        stream = stream_jsonl if options['format'] == 'jsonl' else stream_csv
+        rows = export_rows(queryset, options['kind'], chunk_size=options['chunk_size'])
+
+        if options['output']:
+            output = open(options['output'], 'w', newline='')
+            write = output.write
+        else:
+            output = None
+            write = lambda line: self.stdout.write(line, ending='')
+
+        written = 0
+        started = time.perf_counter()
+        try:
+            for line in stream(export_header(options['kind']), rows):
+                write(line)
+                written += 1
+        finally:
+            if output:
+                output.close()
+
+        # Progress and timing go to stderr so stdout stays a clean export.
+        elapsed = time.perf_counter() - started
+        summary = f'Exported {written} lines in {elapsed:.1f}s ({written / elapsed if elapsed else 0:.0f} lines/s'
+        if resource is not None:
+            peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            if sys.platform == 'darwin':
+                peak_mb /= 1024
+            summary += f', peak memory {peak_mb:.0f} MB'
+        self.stderr.write(summary + ')')
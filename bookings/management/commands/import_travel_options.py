@@ -0,0 +1,126 @@
+import csv
+import json
+import time
+from itertools import islice
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+from bookings.ids import generate_travel_id, travel_ids
+from bookings.models import TravelOption
+from bookings.inventory import upsert_travel_options
+
+
+IMPORT_FIELDS = [
+    'travel_id', 'travel_type', 'source', 'destination',
+    'departure_date', 'departure_time', 'arrival_date', 'arrival_time',
+    'price', 'available_seats', 'total_seats',
+]
+
+
+def _read_csv(handle):
+    for row in csv.DictReader(handle):
+        yield row, None
+
+
+def _read_jsonl(handle):
+    for line in handle:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield None, f'Invalid JSON: {exc}'
+            continue
+        if not isinstance(row, dict):
+            yield None, 'Expected a JSON object.'
+            continue
+        yield row, None
+
+
+def build_travel_option(row):
+    values = {field: row.get(field) for field in IMPORT_FIELDS}
+    if not values['travel_id'] and values['travel_type'] in travel_ids:
+        # Records without an id are new trips; re-importing them adds them again.
+        values['travel_id'] = generate_travel_id(values['travel_type'])
+    if values['available_seats'] in (None, ''):
+        values['available_seats'] = values['total_seats']
+    travel_option = TravelOption(**values)
+    # Field validation only: the per-row uniqueness check would cost a query,
+    # and duplicates of travel_id are exactly what the upsert handles.
+    travel_option.full_clean(exclude=['source_key', 'destination_key'], validate_unique=False)
+    if travel_option.available_seats > travel_option.total_seats:
+        raise ValidationError({'available_seats': 'Cannot exceed total seats.'})
+    return travel_option
+
+
+class Command(BaseCommand):
+    help = 'Stream TravelOption records from a CSV or JSONL file and upsert them by travel_id'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--offset', type=int, default=0, help='Skip this many records (resume a failed import)')
+        parser.add_argument('--rejects', help='Write rejected records with their errors to this JSONL file')
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or ('jsonl' if options['path'].endswith(('.jsonl', '.ndjson')) else 'csv')
+        read = _read_jsonl if file_format == 'jsonl' else _read_csv
+        batch_size = options['batch_size']
+
+        self.rejects = open(options['rejects'], 'w') if options['rejects'] else None
+        self.rejected = 0
+        imported = 0
+        position = options['offset']
+        started = time.perf_counter()
+
+        try:
+            with open(options['path'], newline='') as handle:
+                records = islice(read(handle), options['offset'], None)
+                while True:
+                    batch = list(islice(records, batch_size))
+                    if not batch:
+                        break
+                    travel_options = self._validate(batch, position)
+                    try:
+                        upsert_travel_options(list(travel_options.values()))
+                    except DatabaseError as exc:
+                        raise CommandError(
+                            f'Batch starting at record {position} failed: {exc}. '
+                            f'Resume with --offset {position}.'
+                        )
+                    imported += len(travel_options)
+                    position += len(batch)
+                    self.stdout.write(f'Imported {imported} travel options (next offset {position})...')
+        finally:
+            if self.rejects:
+                self.rejects.close()
+
+        elapsed = time.perf_counter() - started
+        processed = position - options['offset']
+        rate = processed / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {processed} records in {elapsed:.1f}s ({rate:.0f} rows/s): '
+            f'{imported} upserted, {self.rejected} rejected.'
+        ))
+
+    def _validate(self, batch, position):
+        # Keyed by travel_id so a repeated id within one batch keeps its last
+        # version; a single upsert statement cannot touch the same row twice.
+        travel_options = {}
+        for record_number, (row, error) in enumerate(batch, start=position):
+            if error is None:
+                try:
+                    travel_option = build_travel_option(row)
+                except ValidationError as exc:
+                    error = exc.message_dict if hasattr(exc, 'error_dict') else exc.messages
+                else:
+                    travel_options[travel_option.travel_id] = travel_option
+                    continue
+            self._reject(record_number, row, error)
+        return travel_options
+
+    def _reject(self, record_number, row, error):
+        self.rejected += 1
+        if self.rejects:
+            self.rejects.write(json.dumps({'record': record_number, 'errors': error, 'row': row}) + '\n')
@@ -0,0 +1,290 @@
+import http.cookiejar
+import json
+import os
+import random
+import statistics
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime, time as dt_time, timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from bookings.inventory import delete_travel_options
+from bookings.models import TravelOption, UserProfile, Location, normalize_location
+
+
+LOAD_PREFIX = 'LT'
+LOAD_USER_PREFIX = 'load_test_'
+LOAD_PASSWORD = 'load-test-password'
+FLOWS = ['search', 'book', 'cancel', 'my_bookings']
+CITIES = ['Load Alpha', 'Load Bravo', 'Load Charlie', 'Load Delta', 'Load Echo', 'Load Foxtrot']
+
+
+class _InProcessSession:
+    # Runs requests through the full middleware stack in this process.
+    def __init__(self, user):
+        self.client = Client()
+        self.client.force_login(user)
+
+    def get(self, path, params=None):
+        response = self.client.get(path, params or {})
+        return response.status_code, response.get('Location')
+
+    def post(self, path, data):
+        response = self.client.post(path, data)
+        return response.status_code, response.get('Location')
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class _HttpSession:
+    # Talks to a running server (runserver, gunicorn, uvicorn, ...) that uses
+    # the same database as this command.
+    def __init__(self, base_url, user):
+        self.base_url = base_url.rstrip('/')
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect)
+        self.get(reverse('login'))
+        status, _ = self.post(reverse('login'), {'username': user.username, 'password': LOAD_PASSWORD})
+        if status != 302:
+            raise CommandError(f'Could not log in as {user.username} (HTTP {status}).')
+
+    def _open(self, request):
+        try:
+            with self.opener.open(request) as response:
+                response.read()
+                return response.status, response.headers.get('Location')
+        except urllib.error.HTTPError as exc:
+            return exc.code, exc.headers.get('Location')
+
+    def get(self, path, params=None):
+        query = f'?{urllib.parse.urlencode(params)}' if params else ''
+        return self._open(urllib.request.Request(f'{self.base_url}{path}{query}'))
+
+    def post(self, path, data):
+        token = next((cookie.value for cookie in self.cookies if cookie.name == settings.CSRF_COOKIE_NAME), '')
+        body = urllib.parse.urlencode({**data, 'csrfmiddlewaretoken': token}).encode()
+        return self._open(urllib.request.Request(
+            f'{self.base_url}{path}', data=body, headers={'X-CSRFToken': token, 'Referer': self.base_url + path}
+        ))
+
+
+def _percentile(latencies, pct):
+    if len(latencies) < 2:
+        return latencies[0] if latencies else 0.0
+    return statistics.quantiles(latencies, n=100, method='inclusive')[pct - 1]
+
+
+class Command(BaseCommand):
+    help = 'Drive the search, book, cancel and my-bookings flows concurrently and report throughput and latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--trips', type=int, default=10000, help='Travel options to seed')
+        parser.add_argument('--concurrency', type=int, default=8, help='Concurrent virtual users')
+        parser.add_argument('--iterations', type=int, default=25, help='Rounds of every flow per virtual user')
+        parser.add_argument('--flows', nargs='+', choices=FLOWS, default=FLOWS)
+        parser.add_argument('--url', help='Base URL of a running server; defaults to in-process requests')
+        parser.add_argument('--output', help='Where to write the JSON results (default: load_test_results/)')
+        parser.add_argument('--baseline', help='Earlier results file to compare against')
+        parser.add_argument('--cleanup', action='store_true', help='Delete the seeded rows and exit')
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            self._cleanup()
+            return
+
+        users = self._seed(options['trips'], options['concurrency'])
+        trip_ids = list(
+            TravelOption.objects.filter(travel_id__startswith=LOAD_PREFIX).values_list('pk', flat=True)[:1000]
+        )
+        latencies = {flow: [] for flow in options['flows']}
+        errors = {flow: 0 for flow in options['flows']}
+        lock = threading.Lock()
+
+        def virtual_user(user, seed):
+            rng = random.Random(seed)
+            try:
+                if options['url']:
+                    session = _HttpSession(options['url'], user)
+                else:
+                    session = _InProcessSession(user)
+                for _ in range(options['iterations']):
+                    booked = None
+                    for flow in options['flows']:
+                        started = time.perf_counter()
+                        ok, result = getattr(self, f'_flow_{flow}')(session, rng, trip_ids, booked)
+                        elapsed = (time.perf_counter() - started) * 1000
+                        if flow == 'book':
+                            booked = result
+                        with lock:
+                            if ok:
+                                latencies[flow].append(elapsed)
+                            else:
+                                errors[flow] += 1
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=virtual_user, args=(user, i)) for i, user in enumerate(users)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        results = {
+            'timestamp': timezone.now().isoformat(),
+            'commit': self._commit(),
+            'database': connection.vendor,
+            'target': options['url'] or 'in-process',
+            'concurrency': options['concurrency'],
+            'iterations': options['iterations'],
+            'trips': options['trips'],
+            'elapsed_s': round(elapsed, 3),
+            'flows': {
+                flow: {
+                    'requests': len(latencies[flow]),
+                    'errors': errors[flow],
+                    'rps': round(len(latencies[flow]) / elapsed, 2),
+                    'p50_ms': round(_percentile(latencies[flow], 50), 2),
+                    'p95_ms': round(_percentile(latencies[flow], 95), 2),
+                    'p99_ms': round(_percentile(latencies[flow], 99), 2),
+                }
+                for flow in options['flows']
+            },
+        }
+        self._report(results, options)
+
+    def _flow_search(self, session, rng, trip_ids, booked):
+        source, destination = rng.sample(CITIES, 2)
+        params = {'source': source, 'destination': destination}
+        if rng.random() < 0.5:
+            params['departure_date'] = (timezone.now().date() + timedelta(days=rng.randint(2, 60))).isoformat()
+        status, _ = session.get(reverse('travel_options'), params)
+        return status == 200, None
+
+    def _flow_book(self, session, rng, trip_ids, booked):
+        # Hold the seat, then confirm it: the two requests a customer makes.
+        status, location = session.post(reverse('book_travel', args=[rng.choice(trip_ids)]), {
+            'number_of_seats': 1,
+            'passenger_names': 'Load Passenger',
+            'contact_email': 'load@example.com',
+            'contact_phone': '000',
+        })
+        if status != 302 or '/confirm/' not in (location or ''):
+            return False, None
+        booking_id = location.rstrip('/').split('/')[-2]
+        status, _ = session.post(reverse('confirm_booking', args=[booking_id]), {})
+        return status == 302, booking_id
+
+    def _flow_cancel(self, session, rng, trip_ids, booked):
+        if booked is None:
+            return False, None
+        status, location = session.post(reverse('cancel_booking', args=[booked]), {})
+        return status == 302, None
+
+    def _flow_my_bookings(self, session, rng, trip_ids, booked):
+        status, _ = session.get(reverse('my_bookings'))
+        return status == 200, None
+
+    def _report(self, results, options):
+        output = options['output'] or os.path.join(
+            'load_test_results', f"{datetime.now():%Y%m%d-%H%M%S}-{results['commit'] or 'nocommit'}.json"
+        )
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        with open(output, 'w') as handle:
+            json.dump(results, handle, indent=2)
+
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as handle:
+                baseline = json.load(handle)['flows']
+
+        self.stdout.write(self.style.SUCCESS(
+            f"\n=== LOAD TEST ({results['target']}, {results['database']}, "
+            f"{results['concurrency']} users x {results['iterations']} iterations) ===\n"
+        ))
+        self.stdout.write(f"{'flow':<14}{'requests':>10}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for flow, stats in results['flows'].items():
+            line = (
+                f"{flow:<14}{stats['requests']:>10}{stats['errors']:>8}{stats['rps']:>10.1f}"
+                f"{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}"
+            )
+            if baseline and flow in baseline and baseline[flow]['p95_ms']:
+                change = (stats['p95_ms'] - baseline[flow]['p95_ms']) / baseline[flow]['p95_ms']
+                line += f'   p95 {change:+.0%} vs baseline'
+            self.stdout.write(line)
+        self.stdout.write(f'Results written to {output}')
+
+    def _commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def _seed(self, trips, user_count):
+        rng = random.Random(42)
+        today = timezone.now().date()
+        existing = TravelOption.objects.filter(travel_id__startswith=LOAD_PREFIX).count()
+        batch = []
+        for i in range(existing, trips):
+            source, destination = rng.sample(CITIES, 2)
+            departure_date = today + timedelta(days=rng.randint(2, 60))
+            departure = datetime.combine(departure_date, dt_time(rng.randint(6, 20), rng.choice([0, 15, 30, 45])))
+            arrival = departure + timedelta(hours=rng.randint(1, 3))
+            batch.append(TravelOption(
+                travel_id=f'{LOAD_PREFIX}{i:010d}',
+                travel_type=rng.choice(['flight', 'train', 'bus']),
+                source=source,
+                destination=destination,
+                source_key=normalize_location(source),
+                destination_key=normalize_location(destination),
+                departure_date=departure_date,
+                departure_time=departure.time(),
+                arrival_date=arrival.date(),
+                arrival_time=arrival.time(),
+                price=rng.randint(25, 800),
+                available_seats=100000,
+                total_seats=100000,
+            ))
+        TravelOption.objects.bulk_create(batch, batch_size=5000)
+        Location.objects.bulk_create(
+            [Location(name=city, key=normalize_location(city)) for city in CITIES],
+            ignore_conflicts=True,
+        )
+
+        existing_users = User.objects.filter(username__startswith=LOAD_USER_PREFIX).count()
+        if user_count > existing_users:
+            password = make_password(LOAD_PASSWORD)
+            User.objects.bulk_create([
+                User(username=f'{LOAD_USER_PREFIX}{i}', password=password)
+                for i in range(existing_users, user_count)
+            ])
+            UserProfile.objects.bulk_create([
+                UserProfile(user=user) for user in User.objects.filter(
+                    username__startswith=LOAD_USER_PREFIX, userprofile__isnull=True
+                )
+            ])
+        return list(User.objects.filter(username__startswith=LOAD_USER_PREFIX).order_by('pk')[:user_count])
+
+    def _cleanup(self):
+        delete_travel_options(TravelOption.objects.filter(travel_id__startswith=LOAD_PREFIX))
+        Location.objects.filter(key__in=[normalize_location(city) for city in CITIES]).delete()
+        User.objects.filter(username__startswith=LOAD_USER_PREFIX).delete()
+        self.stdout.write(self.style.SUCCESS('Removed load test rows.'))
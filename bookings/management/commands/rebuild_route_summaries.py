@@ -0,0 +1,17 @@
+import time
+from django.core.management.base import BaseCommand
+from bookings.search import invalidate_search_cache
+from bookings.summaries import rebuild_route_day_summaries
+
+
+class Command(BaseCommand):
+    help = 'Recompute the route/day summary table from every travel option'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = rebuild_route_day_summaries()
+        # The city index counts departures from the old rows.
+        invalidate_search_cache(catalog=True)
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {count} route/day summaries in {time.perf_counter() - started:.2f}s.'
+        ))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from bookings.search import search_cache_stats, reset_search_cache_stats
+
+
+class Command(BaseCommand):
+    help = 'Display search result cache hit/miss counters (estimated from a sample of searches)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Reset the counters after printing them')
+
+    def handle(self, *args, **options):
+        stats = search_cache_stats()
+        
+        self.stdout.write(self.style.SUCCESS('\n=== SEARCH CACHE STATISTICS ===\n'))
+        self.stdout.write(f"Hits: {stats['hits']}")
+        self.stdout.write(f"Misses: {stats['misses']}")
+        self.stdout.write(f"Hit rate: {stats['hit_rate']:.1%}")
+        
+        if options['reset']:
+            reset_search_cache_stats()
+            self.stdout.write('Counters reset.')
@@ -0,0 +1,34 @@
+import sqlite3
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database onto every replica in DATABASE_REPLICAS (local replication stand-in)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep copying every N seconds to simulate replication lag')
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('No replicas configured; set SQLITE_REPLICAS to one or more database files.')
+        primary = connections['default']
+        if primary.vendor != 'sqlite':
+            raise CommandError('Only SQLite primaries can be copied this way; use the database\'s own replication.')
+
+        while True:
+            primary.ensure_connection()
+            for alias in settings.DATABASE_REPLICAS:
+                connections[alias].close()
+                target = sqlite3.connect(connections[alias].settings_dict['NAME'])
+                try:
+                    primary.connection.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write(f'Copied primary to {alias}.')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,155 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction
+from django.template.backends import django as django_backend
+from django.utils.decorators import sync_and_async_middleware
+
+
+_current = ContextVar('request_metrics', default=None)
+_totals = {}
+_totals_lock = threading.Lock()
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_ms = 0.0
+        self.template_ms = 0.0
+        self.total_ms = 0.0
+        self._template_depth = 0
+
+    @contextmanager
+    def template(self):
+        # Only the outermost render counts, so templates rendered from inside
+        # other templates are not timed twice.
+        self._template_depth += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._template_depth -= 1
+            if not self._template_depth:
+                self.template_ms += (time.perf_counter() - started) * 1000
+
+    def server_timing(self):
+        return (
+            f'db;dur={self.db_ms:.2f};desc="{self.queries} queries", '
+            f'template;dur={self.template_ms:.2f}, total;dur={self.total_ms:.2f}'
+        )
+
+
+def record_query(execute, sql, params, many, context):
+    # Installed on every connection as an execute wrapper. Outside a request
+    # (management commands, shells) it just runs the query.
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_ms += (time.perf_counter() - started) * 1000
+
+
+def install_query_recorder(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return super().render(context, request)
+        with metrics.template():
+            return super().render(context, request)
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    # The stock Django backend, with each render timed for RequestMetrics.
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name).template, self)
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else '<unresolved>'
+
+
+def _start(request):
+    request.metrics = RequestMetrics()
+    return _current.set(request.metrics)
+
+
+def _finish(request, response, token):
+    _current.reset(token)
+    metrics = request.metrics
+    metrics.total_ms = (time.perf_counter() - metrics.started) * 1000
+
+    header = metrics.server_timing()
+    if response.has_header('Server-Timing'):
+        header = f"{response['Server-Timing']}, {header}"
+    response['Server-Timing'] = header
+
+    with _totals_lock:
+        totals = _totals.setdefault(_view_name(request), {
+            'requests': 0, 'queries': 0, 'max_queries': 0, 'db_ms': 0.0, 'template_ms': 0.0, 'total_ms': 0.0,
+        })
+        totals['requests'] += 1
+        totals['queries'] += metrics.queries
+        totals['max_queries'] = max(totals['max_queries'], metrics.queries)
+        totals['db_ms'] += metrics.db_ms
+        totals['template_ms'] += metrics.template_ms
+        totals['total_ms'] += metrics.total_ms
+    return response
+
+
+@sync_and_async_middleware
+def request_metrics_middleware(get_response):
+    # The counters live in a context variable, so the DB wrapper and template
+    # backend find them from sync code, async code and sync_to_async threads.
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            token = _start(request)
+            try:
+                response = await get_response(request)
+            except BaseException:
+                _current.reset(token)
+                raise
+            return _finish(request, response, token)
+    else:
+        def middleware(request):
+            token = _start(request)
+            try:
+                response = get_response(request)
+            except BaseException:
+                _current.reset(token)
+                raise
+            return _finish(request, response, token)
+    return middleware
+
+
+def request_metrics():
+    # Totals since this process started; every worker process keeps its own.
+    with _totals_lock:
+        views = {name: dict(totals) for name, totals in _totals.items()}
+    for totals in views.values():
+        requests = totals['requests']
+        for field in ('queries', 'db_ms', 'template_ms', 'total_ms'):
+            totals[f'avg_{field}'] = round(totals[field] / requests, 2)
+        for field in ('db_ms', 'template_ms', 'total_ms'):
+            totals[field] = round(totals[field], 2)
+    return {'pid': os.getpid(), 'views': views}
+
+
+def reset_request_metrics():
+    with _totals_lock:
+        _totals.clear()
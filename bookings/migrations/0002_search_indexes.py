@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['user', '-booking_date'], name='booking_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='traveloption',
+            index=models.Index(fields=['departure_date', 'departure_time'], name='travel_departure_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='traveloption',
+            index=models.Index(fields=['travel_type', 'departure_date', 'departure_time'], name='travel_type_departure_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='traveloption',
+            index=models.Index(fields=['source', 'destination', 'departure_date', 'departure_time'], name='travel_route_idx'),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:17
+
+from django.db import migrations, models
+
+
+def normalize_location(value):
+    return ' '.join(value.split()).casefold()
+
+
+def populate_location_keys(apps, schema_editor):
+    TravelOption = apps.get_model('bookings', 'TravelOption')
+    Location = apps.get_model('bookings', 'Location')
+    
+    batch = []
+    locations = {}
+    for travel_option in TravelOption.objects.only('id', 'source', 'destination').iterator(chunk_size=2000):
+        travel_option.source_key = normalize_location(travel_option.source)
+        travel_option.destination_key = normalize_location(travel_option.destination)
+        locations.setdefault(travel_option.source_key, travel_option.source)
+        locations.setdefault(travel_option.destination_key, travel_option.destination)
+        batch.append(travel_option)
+        if len(batch) >= 2000:
+            TravelOption.objects.bulk_update(batch, ['source_key', 'destination_key'])
+            batch = []
+    TravelOption.objects.bulk_update(batch, ['source_key', 'destination_key'])
+    
+    Location.objects.bulk_create(
+        [Location(name=name, key=key) for key, name in locations.items()],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0002_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Location',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('key', models.CharField(max_length=100, unique=True)),
+            ],
+            options={
+                'ordering': ['key'],
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='traveloption',
+            name='travel_route_idx',
+        ),
+        migrations.AddField(
+            model_name='traveloption',
+            name='destination_key',
+            field=models.CharField(default='', editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='traveloption',
+            name='source_key',
+            field=models.CharField(default='', editable=False, max_length=100),
+        ),
+        migrations.RunPython(populate_location_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='traveloption',
+            index=models.Index(fields=['source_key', 'destination_key', 'departure_date', 'departure_time'], name='travel_route_key_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='traveloption',
+            index=models.Index(fields=['source_key', 'departure_date', 'departure_time'], name='travel_source_key_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='traveloption',
+            index=models.Index(fields=['destination_key', 'departure_date', 'departure_time'], name='travel_destination_key_idx'),
+        ),
+    ]
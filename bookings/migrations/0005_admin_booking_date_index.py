@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0004_booking_holds'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['-booking_date'], name='booking_date_idx'),
+        ),
+    ]
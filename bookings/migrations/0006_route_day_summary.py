@@ -0,0 +1,57 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:54
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Q, Sum
+
+
+def populate_route_day_summaries(apps, schema_editor):
+    TravelOption = apps.get_model('bookings', 'TravelOption')
+    RouteDaySummary = apps.get_model('bookings', 'RouteDaySummary')
+    
+    rows = (
+        TravelOption.objects.values('source_key', 'destination_key', 'departure_date', 'travel_type')
+        .annotate(
+            source=Min('source'),
+            destination=Min('destination'),
+            departures=Count('id'),
+            seats_left=Sum('available_seats'),
+            min_price=Min('price', filter=Q(available_seats__gt=0)),
+        )
+        .order_by()
+    )
+    RouteDaySummary.objects.bulk_create([RouteDaySummary(**row) for row in rows], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0005_admin_booking_date_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RouteDaySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_key', models.CharField(max_length=100)),
+                ('destination_key', models.CharField(max_length=100)),
+                ('departure_date', models.DateField()),
+                ('travel_type', models.CharField(choices=[('flight', 'Flight'), ('train', 'Train'), ('bus', 'Bus')], max_length=10)),
+                ('source', models.CharField(max_length=100)),
+                ('destination', models.CharField(max_length=100)),
+                ('departures', models.PositiveIntegerField()),
+                ('seats_left', models.PositiveIntegerField()),
+                ('min_price', models.DecimalField(decimal_places=2, max_digits=10, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['departure_date', 'source_key', 'destination_key', 'travel_type'],
+                'indexes': [models.Index(fields=['departure_date'], name='route_day_date_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='routedaysummary',
+            constraint=models.UniqueConstraint(fields=('source_key', 'destination_key', 'departure_date', 'travel_type'), name='route_day_unique'),
+        ),
+        migrations.RunPython(populate_route_day_summaries, migrations.RunPython.noop),
+    ]
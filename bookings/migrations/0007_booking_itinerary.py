@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0006_route_day_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='itinerary_id',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=20),
+        ),
+    ]
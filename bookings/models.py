@@ -1,7 +1,25 @@
+from datetime import timedelta
 from django.db import models
+from django.db.models import Case, When, Value, Q
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
 from django.utils import timezone
+from .ids import booking_ids
+
+
+def normalize_location(value):
+    return ' '.join(value.split()).casefold()
+
+
+class Location(models.Model):
+    name = models.CharField(max_length=100)
+    key = models.CharField(max_length=100, unique=True)
+    
+    class Meta:
+        ordering = ['key']
+        
+    def __str__(self):
+        return self.name
 
 
 class TravelOption(models.Model):
@@ -15,6 +33,8 @@ class TravelOption(models.Model):
     travel_type = models.CharField(max_length=10, choices=TRAVEL_TYPES)
     source = models.CharField(max_length=100)
     destination = models.CharField(max_length=100)
+    source_key = models.CharField(max_length=100, editable=False, default='')
+    destination_key = models.CharField(max_length=100, editable=False, default='')
     departure_date = models.DateField()
     departure_time = models.TimeField()
     arrival_date = models.DateField()
@@ -27,15 +47,91 @@ class TravelOption(models.Model):
     
     class Meta:
         ordering = ['departure_date', 'departure_time']
+        indexes = [
+            models.Index(fields=['departure_date', 'departure_time'], name='travel_departure_idx'),
+            models.Index(fields=['travel_type', 'departure_date', 'departure_time'], name='travel_type_departure_idx'),
+            models.Index(fields=['source_key', 'destination_key', 'departure_date', 'departure_time'], name='travel_route_key_idx'),
+            models.Index(fields=['source_key', 'departure_date', 'departure_time'], name='travel_source_key_idx'),
+            models.Index(fields=['destination_key', 'departure_date', 'departure_time'], name='travel_destination_key_idx'),
+        ]
         
     def __str__(self):
         return f"{self.travel_id} - {self.travel_type.title()} from {self.source} to {self.destination}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored date so a rescheduling edit can invalidate
+        # searches cached under the old date as well as the new one, and the
+        # stored route/day so its summary row is refreshed too.
+        instance._loaded_departure_date = instance.__dict__.get('departure_date')
+        instance._loaded_route_day = route_day(instance)
+        instance._loaded_location_keys = _location_keys(instance)
+        return instance
+    
+    def save(self, *args, **kwargs):
+        self.source_key = normalize_location(self.source)
+        self.destination_key = normalize_location(self.destination)
+        # Only a new trip or a changed city can add a Location; a price or
+        # seat edit skips the insert.
+        new_locations = self._state.adding or _location_keys(self) != getattr(self, '_loaded_location_keys', None)
+        super().save(*args, **kwargs)
+        # The saved values are now the stored ones for the next save.
+        self._loaded_departure_date = self.departure_date
+        self._loaded_route_day = route_day(self)
+        self._loaded_location_keys = _location_keys(self)
+        if new_locations:
+            Location.objects.bulk_create([
+                Location(name=self.source, key=self.source_key),
+                Location(name=self.destination, key=self.destination_key),
+            ], ignore_conflicts=True)
+    
     @property
     def is_available(self):
         return self.available_seats > 0 and self.departure_date >= timezone.now().date()
 
 
+ROUTE_DAY_FIELDS = ['source_key', 'destination_key', 'departure_date', 'travel_type']
+
+
+def _location_keys(travel_option):
+    return travel_option.__dict__.get('source_key'), travel_option.__dict__.get('destination_key')
+
+
+def route_day(travel_option):
+    # The RouteDaySummary group a travel option belongs to, or None when the
+    # instance was loaded without those fields.
+    values = tuple(travel_option.__dict__.get(field) for field in ROUTE_DAY_FIELDS)
+    return None if None in values else values
+
+
+class RouteDaySummary(models.Model):
+    # Departures, seats left and cheapest bookable price per route, day and
+    # travel type. Maintained by bookings.summaries; never edit by hand.
+    source_key = models.CharField(max_length=100)
+    destination_key = models.CharField(max_length=100)
+    departure_date = models.DateField()
+    travel_type = models.CharField(max_length=10, choices=TravelOption.TRAVEL_TYPES)
+    source = models.CharField(max_length=100)
+    destination = models.CharField(max_length=100)
+    departures = models.PositiveIntegerField()
+    seats_left = models.PositiveIntegerField()
+    min_price = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['departure_date', 'source_key', 'destination_key', 'travel_type']
+        constraints = [
+            models.UniqueConstraint(fields=ROUTE_DAY_FIELDS, name='route_day_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['departure_date'], name='route_day_date_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.source} to {self.destination} on {self.departure_date} ({self.travel_type})"
+
+
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     phone_number = models.CharField(max_length=15, blank=True)
@@ -48,6 +144,29 @@ class UserProfile(models.Model):
         return f"{self.user.username}'s Profile"
 
 
+CANCELLATION_NOTICE = timedelta(hours=24)
+
+
+def generate_booking_id():
+    return booking_ids()
+
+
+class BookingQuerySet(models.QuerySet):
+    def with_cancellable(self):
+        # Same rule as Booking.can_cancel, evaluated in SQL against the
+        # departure date/time so listing pages need no per-row lookups.
+        cutoff = timezone.localtime(timezone.now() + CANCELLATION_NOTICE)
+        departs_after_cutoff = Q(travel_option__departure_date__gt=cutoff.date()) | Q(
+            travel_option__departure_date=cutoff.date(),
+            travel_option__departure_time__gt=cutoff.time(),
+        )
+        return self.annotate(cancellable=Case(
+            When(Q(status='confirmed') & departs_after_cutoff, then=Value(True)),
+            default=Value(False),
+            output_field=models.BooleanField(),
+        ))
+
+
 class Booking(models.Model):
     STATUS_CHOICES = [
         ('confirmed', 'Confirmed'),
@@ -62,22 +181,32 @@ class Booking(models.Model):
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
     booking_date = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='confirmed')
+    hold_expires_at = models.DateTimeField(null=True, blank=True)
+    # Booking ID of the first leg, shared by every leg booked together as one
+    # itinerary so they are held, confirmed and released as a unit.
+    itinerary_id = models.CharField(max_length=20, blank=True, default='', db_index=True)
     passenger_names = models.TextField(help_text="Enter passenger names separated by commas")
     contact_email = models.EmailField()
     contact_phone = models.CharField(max_length=15)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = BookingQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-booking_date']
+        indexes = [
+            models.Index(fields=['user', '-booking_date'], name='booking_user_date_idx'),
+            models.Index(fields=['status', 'hold_expires_at'], name='booking_hold_expiry_idx'),
+            models.Index(fields=['-booking_date'], name='booking_date_idx'),
+        ]
         
     def __str__(self):
         return f"Booking {self.booking_id} - {self.user.username}"
     
     def save(self, *args, **kwargs):
         if not self.booking_id:
-            import uuid
-            self.booking_id = f"TRV{str(uuid.uuid4())[:8].upper()}"
+            self.booking_id = generate_booking_id()
         
         if not self.total_price:
             self.total_price = self.travel_option.price * self.number_of_seats
@@ -85,13 +214,16 @@ class Booking(models.Model):
         super().save(*args, **kwargs)
     
     def can_cancel(self):
+        if hasattr(self, 'cancellable'):
+            return self.cancellable
+        
         if self.status != 'confirmed':
             return False
         
-        from datetime import datetime, timedelta
+        from datetime import datetime
         departure_datetime = datetime.combine(
             self.travel_option.departure_date, 
             self.travel_option.departure_time
         )
         departure_datetime = timezone.make_aware(departure_datetime, timezone.get_current_timezone())
-        return departure_datetime > timezone.now() + timedelta(hours=24)
+        return departure_datetime > timezone.now() + CANCELLATION_NOTICE
@@ -0,0 +1,161 @@
+import base64
+import binascii
+import json
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+ESTIMATED_COUNT_LIMIT = 10000
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None, total=None, total_is_exact=True):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.total = total
+        self.total_is_exact = total_is_exact
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    # Seeks from the last row of the previous page instead of using OFFSET,
+    # so every page costs the same as the first one. ``ordering`` must end in
+    # a unique field so the cursor position is unambiguous.
+    def __init__(self, queryset, per_page, ordering, count_limit=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = ordering
+        self.count_limit = count_limit
+        self.fields = [queryset.model._meta.get_field(name.lstrip('-')) for name in ordering]
+
+    def get_page(self, cursor=None):
+        position = self.decode_cursor(cursor)
+        rows = list(self._page_query(position))
+        return self._build_page(rows, position, *self._count())
+
+    def _page_query(self, position):
+        if position is None:
+            return self.queryset.order_by(*self.ordering)[:self.per_page + 1]
+        backwards, values = position
+        queryset = self.queryset.filter(self._seek(values, backwards))
+        ordering = [self._reverse(name) for name in self.ordering] if backwards else self.ordering
+        return queryset.order_by(*ordering)[:self.per_page + 1]
+
+    def _build_page(self, rows, position, total, total_is_exact):
+        backwards = position is not None and position[0]
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if backwards:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, position is not None
+
+        return KeysetPage(
+            rows,
+            next_cursor=self.encode_cursor(rows[-1], False) if has_next and rows else None,
+            previous_cursor=self.encode_cursor(rows[0], True) if has_previous and rows else None,
+            total=total,
+            total_is_exact=total_is_exact,
+        )
+
+    def encode_cursor(self, obj, backwards):
+        values = [field.value_to_string(obj) for field in self.fields]
+        payload = json.dumps({'v': values, 'b': backwards}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        # Malformed or tampered cursors fall back to the first page.
+        if not cursor:
+            return None
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if len(payload['v']) != len(self.fields):
+                return None
+            values = [field.to_python(value) for field, value in zip(self.fields, payload['v'])]
+            return bool(payload['b']), values
+        except (binascii.Error, ValueError, KeyError, TypeError, ValidationError):
+            return None
+
+    def _seek(self, values, backwards):
+        # Expand the row-value comparison (a, b, c) > (x, y, z) into
+        # a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z),
+        # honouring the direction of each ordering field.
+        condition = Q()
+        for i, name in enumerate(self.ordering):
+            descending = name.startswith('-') != backwards
+            lookup = 'lt' if descending else 'gt'
+            term = Q(**{f'{self.fields[i].name}__{lookup}': values[i]})
+            for field, value in zip(self.fields[:i], values[:i]):
+                term &= Q(**{field.name: value})
+            condition |= term
+        # The redundant bound on the leading column lets the database turn the
+        # OR chain into an index range scan.
+        leading = 'lte' if self.ordering[0].startswith('-') != backwards else 'gte'
+        return condition & Q(**{f'{self.fields[0].name}__{leading}': values[0]})
+
+    def _reverse(self, name):
+        return name[1:] if name.startswith('-') else f'-{name}'
+
+    def _count(self):
+        # A bounded COUNT over at most ``count_limit`` rows keeps the total
+        # cheap on huge result sets; past the limit it is only a lower bound.
+        if self.count_limit is None:
+            return None, True
+        return self._bound(self.queryset.order_by()[:self.count_limit + 1].count())
+
+    def _bound(self, total):
+        if total > self.count_limit:
+            return self.count_limit, False
+        return total, True
+
+
+class EstimatedCountPaginator(Paginator):
+    # For the admin changelists: never runs an exact COUNT(*) over a large
+    # table. An unfiltered PostgreSQL table uses the planner's row estimate;
+    # otherwise at most ``ESTIMATED_COUNT_LIMIT`` + 1 rows are counted from
+    # the start of the current ``page``. The count then ends one row past
+    # that window when there are more rows, so one page beyond it is always
+    # offered and every page stays reachable.
+    def __init__(self, object_list, per_page, orphans=0, allow_empty_first_page=True, page=1):
+        super().__init__(object_list, per_page, orphans, allow_empty_first_page)
+        self.page_number = max(page, 1)
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where and connections[queryset.db].vendor == 'postgresql':
+            estimate = self._estimate(queryset)
+            if estimate > ESTIMATED_COUNT_LIMIT:
+                return estimate
+        offset = (self.page_number - 1) * self.per_page
+        return offset + queryset.order_by()[offset:offset + ESTIMATED_COUNT_LIMIT + 1].count()
+
+    def _estimate(self, queryset):
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+        return int(row[0]) if row else 0
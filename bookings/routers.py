@@ -0,0 +1,105 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.utils.decorators import sync_and_async_middleware
+
+
+# Models whose reads may be served by a replica. Everything else (bookings,
+# profiles, users, sessions) always reads from the primary.
+REPLICA_MODELS = {'bookings.traveloption', 'bookings.location', 'bookings.routedaysummary'}
+PINNED_UNTIL_SESSION_KEY = '_primary_pinned_until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# False inside a request that may read replicas, True once it is pinned to
+# the primary, and None outside requests (management commands, shells),
+# which read the primary so they always see their own writes.
+_pinned = ContextVar('primary_pinned', default=None)
+
+
+def is_pinned():
+    return bool(_pinned.get())
+
+
+@contextmanager
+def replica_reads():
+    # Explicit opt-in for code outside a request that can live with replica
+    # lag; a write inside the block pins the rest of it to the primary.
+    token = _pinned.set(False)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+class ReplicaRouter:
+    # Sends TravelOption, Location and RouteDaySummary reads to a random
+    # DATABASE_REPLICAS alias unless this request has written (or is about to
+    # write), so searches never compete with booking writes and never read
+    # stale seats right after a booking. Reads inside a transaction on the
+    # primary (select_for_update, read-then-update in inventory.py) stay
+    # there too. Cached search results follow the same rule, see
+    # search.settled().
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas or model._meta.label_lower not in REPLICA_MODELS:
+            return None
+        if _pinned.get() is not False or connections['default'].in_atomic_block:
+            return None
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label == 'bookings' and _pinned.get() is not None:
+            _pinned.set(True)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # A replica holds the same rows as the primary, so a booking may point
+        # at a travel option that was read from either.
+        databases = {'default', *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        return None
+
+
+def _start(request):
+    pinned = request.method not in SAFE_METHODS
+    if not pinned and hasattr(request, 'session'):
+        pinned = request.session.get(PINNED_UNTIL_SESSION_KEY, 0) > time.time()
+    return _pinned.set(pinned)
+
+
+def _finish(request, token):
+    # Keep the session on the primary for a while after a POST (booking,
+    # cancel, admin save), so the redirect that follows (and anything else
+    # the user clicks before the replicas catch up) sees what was just
+    # written.
+    _pinned.reset(token)
+    if request.method not in SAFE_METHODS and settings.DATABASE_REPLICAS and hasattr(request, 'session'):
+        request.session[PINNED_UNTIL_SESSION_KEY] = time.time() + settings.REPLICA_PIN_SECONDS
+
+
+@sync_and_async_middleware
+def primary_pinning_middleware(get_response):
+    # Must come after SessionMiddleware.
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            token = _start(request)
+            try:
+                return await get_response(request)
+            finally:
+                _finish(request, token)
+    else:
+        def middleware(request):
+            token = _start(request)
+            try:
+                return get_response(request)
+            finally:
+                _finish(request, token)
+    return middleware
@@ -0,0 +1,365 @@
+import hashlib
+import random
+import time
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from datetime import timedelta
+from django.db.models import Count, Max, Min, Sum
+from django.utils import timezone
+from .models import TravelOption, Location, RouteDaySummary, normalize_location
+from .forms import FareCalendarForm, TravelSearchForm
+from .pagination import KeysetPage, KeysetPaginator
+from .routers import is_pinned
+
+
+MAX_LOCATION_MATCHES = 20
+SEARCH_CACHE_TIMEOUT = 300
+# Searches without a date span every date, so no single version covers
+# them; they are only cached briefly instead.
+SEARCH_UNDATED_TIMEOUT = 30
+SEARCH_COUNT_LIMIT = 1000
+SEARCH_ORDERING = ['departure_date', 'departure_time', 'id']
+# Columns rendered by the travel cards on home and travel_options.
+CARD_FIELDS = [
+    'id', 'travel_id', 'travel_type', 'source', 'destination', 'departure_date',
+    'departure_time', 'arrival_time', 'price', 'available_seats', 'updated_at',
+]
+# Bumped when trips are added, moved or removed, but not on seat changes.
+CATALOG_VERSION_KEY = 'search:version:catalog'
+FARE_CALENDAR_TIMEOUT = 600
+SEARCH_HITS_KEY = 'search:stats:hits'
+SEARCH_MISSES_KEY = 'search:stats:misses'
+# Share of searches that update the hit/miss counters.
+SEARCH_STATS_SAMPLE_RATE = 0.01
+
+
+def _location_key_query(term):
+    key = normalize_location(term)
+    upper = key[:-1] + chr(ord(key[-1]) + 1)
+    return key, (
+        Location.objects.filter(key__gte=key, key__lt=upper)
+        .order_by('key')
+        .values_list('key', flat=True)[:MAX_LOCATION_MATCHES]
+    )
+
+
+def _pick_location_keys(key, keys):
+    if keys and keys[0] == key:
+        return [key]
+    return keys
+
+
+def resolve_location_keys(term):
+    # Resolve free-text input against the small Location table so the
+    # TravelOption filter becomes an equality (or short IN list) on an indexed
+    # key. An exact match wins; otherwise every city starting with the input.
+    key, query = _location_key_query(term)
+    return _pick_location_keys(key, list(query))
+
+
+def _filter_travel_options(cleaned_data, fields, available_only, source_keys, destination_keys):
+    travel_options = TravelOption.objects.only(*fields).filter(departure_date__gte=timezone.now().date())
+    if available_only:
+        travel_options = travel_options.filter(available_seats__gt=0)
+    
+    travel_type = cleaned_data.get('travel_type')
+    departure_date = cleaned_data.get('departure_date')
+    
+    if travel_type:
+        travel_options = travel_options.filter(travel_type=travel_type)
+    if source_keys is not None:
+        travel_options = travel_options.filter(source_key__in=source_keys)
+    if destination_keys is not None:
+        travel_options = travel_options.filter(destination_key__in=destination_keys)
+    if departure_date:
+        travel_options = travel_options.filter(departure_date=departure_date)
+    
+    return travel_options
+
+
+def filter_travel_options(cleaned_data, fields=CARD_FIELDS, available_only=True):
+    source = cleaned_data.get('source')
+    destination = cleaned_data.get('destination')
+    return _filter_travel_options(
+        cleaned_data, fields, available_only,
+        resolve_location_keys(source) if source else None,
+        resolve_location_keys(destination) if destination else None,
+    )
+
+
+def _date_version_key(departure_date):
+    return f'search:version:date:{departure_date.isoformat()}'
+
+
+def _route_version_key(source_key, destination_key):
+    route = hashlib.md5(f'{source_key}|{destination_key}'.encode()).hexdigest()
+    return f'search:version:route:{route}'
+
+
+def _new_version():
+    return f'{time.time():.3f}-{uuid.uuid4().hex}'
+
+
+def _bump_version(key):
+    # Versions are random tokens written with a plain set rather than
+    # counters: cache.incr is not atomic on every backend (FileBasedCache),
+    # and a culled counter would restart at a number older entries still use.
+    # A lost or evicted token only ever causes a miss.
+    cache.set(key, _new_version(), None)
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def settled(version):
+    # A replica may still be behind the write that set a version, so until
+    # the version is REPLICA_PIN_SECONDS old, results are served but not
+    # cached under it; otherwise a stale replica read would stay cached.
+    if not settings.DATABASE_REPLICAS or version is None:
+        return True
+    return time.time() - float(version.partition('-')[0]) >= settings.REPLICA_PIN_SECONDS
+
+
+def _incr(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def _sampled():
+    return random.random() < SEARCH_STATS_SAMPLE_RATE
+
+
+def invalidate_search_cache(*departure_dates, catalog=False):
+    # Seat changes only touch their dates' versions; undated searches expire
+    # on their own after SEARCH_UNDATED_TIMEOUT.
+    for departure_date in set(departure_dates):
+        if departure_date:
+            _bump_version(_date_version_key(departure_date))
+    if catalog:
+        _bump_version(CATALOG_VERSION_KEY)
+
+
+def invalidate_routes(routes):
+    # Called with the (source_key, destination_key) of every refreshed
+    # route/day summary; one set_many for the lot.
+    cache.set_many({_route_version_key(*route): _new_version() for route in set(routes)}, None)
+
+
+def search_digest(cleaned_data, cursor):
+    departure_date = cleaned_data.get('departure_date')
+    params = '|'.join([
+        timezone.now().date().isoformat(),
+        cleaned_data.get('travel_type') or '',
+        normalize_location(cleaned_data.get('source') or ''),
+        normalize_location(cleaned_data.get('destination') or ''),
+        departure_date.isoformat() if departure_date else '',
+        cursor or '',
+    ])
+    return hashlib.md5(params.encode()).hexdigest()
+
+
+def search_cache_timeout(cleaned_data):
+    return SEARCH_CACHE_TIMEOUT if cleaned_data.get('departure_date') else SEARCH_UNDATED_TIMEOUT
+
+
+def search_version(cleaned_data):
+    departure_date = cleaned_data.get('departure_date')
+    return get_version(_date_version_key(departure_date)) if departure_date else None
+
+
+def search_cache_key(namespace, version, cleaned_data, cursor):
+    return f"search:{namespace}:{version or 'undated'}:{search_digest(cleaned_data, cursor)}"
+
+
+def _search_paginator(travel_options, per_page):
+    return KeysetPaginator(travel_options, per_page, SEARCH_ORDERING, count_limit=SEARCH_COUNT_LIMIT)
+
+
+def get_search_page(namespace, cleaned_data, per_page, cursor):
+    if is_pinned():
+        # The session has just written and reads the primary; a cached page
+        # may predate its write.
+        return _search_paginator(filter_travel_options(cleaned_data), per_page).get_page(cursor)
+    
+    version = search_version(cleaned_data)
+    key = search_cache_key(namespace, version, cleaned_data, cursor)
+    cached = cache.get(key)
+    
+    if _sampled():
+        _incr(SEARCH_MISSES_KEY if cached is None else SEARCH_HITS_KEY)
+    
+    if cached is None:
+        cached = _cacheable_page(_search_paginator(filter_travel_options(cleaned_data), per_page).get_page(cursor))
+        if settled(version):
+            cache.set(key, cached, search_cache_timeout(cleaned_data))
+    
+    return KeysetPage(**cached)
+
+
+def _cacheable_page(page_obj):
+    return {
+        'object_list': page_obj.object_list,
+        'next_cursor': page_obj.next_cursor,
+        'previous_cursor': page_obj.previous_cursor,
+        'total': page_obj.total,
+        'total_is_exact': page_obj.total_is_exact,
+    }
+
+
+def get_search_validators(cleaned_data):
+    # Conditional GET validators for a search: the newest updated_at and the
+    # row count over the date/type/route-filtered rows, including sold-out
+    # ones, so selling out a trip still changes them. Cached like the result
+    # pages.
+    if is_pinned():
+        return _search_validators(filter_travel_options(cleaned_data, available_only=False))
+    
+    version = search_version(cleaned_data)
+    key = search_cache_key('validators', version, cleaned_data, None)
+    validators = cache.get(key)
+    
+    if validators is None:
+        validators = _search_validators(filter_travel_options(cleaned_data, available_only=False))
+        if settled(version):
+            cache.set(key, validators, search_cache_timeout(cleaned_data))
+    
+    return validators
+
+
+def _search_validators(candidates):
+    return candidates.aggregate(last_modified=Max('updated_at'), count=Count('id'))
+
+
+def serialize_travel_option(travel_option):
+    return {
+        'id': travel_option.id,
+        'travel_id': travel_option.travel_id,
+        'type': travel_option.travel_type,
+        'from': travel_option.source,
+        'to': travel_option.destination,
+        'departure': f'{travel_option.departure_date.isoformat()}T{travel_option.departure_time.isoformat("minutes")}',
+        'arrival_time': travel_option.arrival_time.isoformat('minutes'),
+        'price': str(travel_option.price),
+        'seats': travel_option.available_seats,
+    }
+
+
+def run_search(params, namespace, per_page, timer):
+    with timer.stage('form'):
+        form = TravelSearchForm(params or None)
+        filters = form.cleaned_data if form.is_valid() else {}
+    
+    with timer.stage('query'):
+        page_obj = get_search_page(namespace, filters, per_page, params.get('cursor'))
+    
+    return form, page_obj
+
+
+def _fare_calendar_window(cleaned_data):
+    today = timezone.now().date()
+    start = max(cleaned_data.get('start') or today, today)
+    end = start + timedelta(days=(cleaned_data.get('days') or FareCalendarForm.MAX_DAYS) - 1)
+    return start, end
+
+
+def _fare_calendar_route(cleaned_data):
+    return normalize_location(cleaned_data['source']), normalize_location(cleaned_data['destination'])
+
+
+def _fare_calendar_key(cleaned_data, version, start, end):
+    source_key, destination_key = _fare_calendar_route(cleaned_data)
+    route = hashlib.md5(f"{source_key}|{destination_key}|{cleaned_data.get('travel_type') or ''}".encode()).hexdigest()
+    return f'fares:{version}:{route}:{start.isoformat()}:{end.isoformat()}'
+
+
+def _check_fare_calendar_route(cleaned_data, known_keys):
+    # A calendar is for one route, so both cities must name a Location
+    # exactly rather than a prefix of several.
+    errors = {
+        field: ValidationError('Unknown city; use a name from the city suggestions.', code='unknown')
+        for field, key in zip(('source', 'destination'), _fare_calendar_route(cleaned_data))
+        if key not in known_keys
+    }
+    if errors:
+        raise ValidationError(errors)
+
+
+def _known_location_keys(cleaned_data):
+    return Location.objects.filter(key__in=_fare_calendar_route(cleaned_data)).values_list('key', flat=True)
+
+
+def _fare_calendar_rows(cleaned_data, start, end):
+    source_key, destination_key = _fare_calendar_route(cleaned_data)
+    summaries = RouteDaySummary.objects.filter(
+        source_key=source_key,
+        destination_key=destination_key,
+        departure_date__range=(start, end),
+    )
+    if cleaned_data.get('travel_type'):
+        summaries = summaries.filter(travel_type=cleaned_data['travel_type'])
+    return summaries.values('departure_date').annotate(
+        min_price=Min('min_price'),
+        seats=Sum('seats_left'),
+        departures=Sum('departures'),
+    ).order_by()
+
+
+def _build_fare_calendar(start, end, by_date):
+    calendar = {'start': start.isoformat(), 'end': end.isoformat(), 'days': []}
+    for offset in range((end - start).days + 1):
+        day = start + timedelta(days=offset)
+        row = by_date.get(day, {})
+        calendar['days'].append({
+            'date': day.isoformat(),
+            'min_price': f"{row['min_price']:.2f}" if row.get('min_price') is not None else None,
+            'seats': row.get('seats', 0),
+            'departures': row.get('departures', 0),
+        })
+    return calendar
+
+
+def get_fare_calendar(cleaned_data):
+    # Cheapest bookable price, seats left and departures per day for one
+    # route, from a single GROUP BY over the maintained route/day summaries.
+    # Cached per route and window under the route's version, which every
+    # refresh of one of its summaries bumps. Raises ValidationError for a
+    # city that is not a Location.
+    start, end = _fare_calendar_window(cleaned_data)
+    version = get_version(_route_version_key(*_fare_calendar_route(cleaned_data)))
+    key = _fare_calendar_key(cleaned_data, version, start, end)
+    calendar = None if is_pinned() else cache.get(key)
+    
+    if calendar is None:
+        _check_fare_calendar_route(cleaned_data, set(_known_location_keys(cleaned_data)))
+        rows = _fare_calendar_rows(cleaned_data, start, end)
+        calendar = _build_fare_calendar(start, end, {row['departure_date']: row for row in rows})
+        if settled(version) and not is_pinned():
+            cache.set(key, calendar, FARE_CALENDAR_TIMEOUT)
+    
+    return calendar
+
+
+def search_cache_stats():
+    # Scaled up from the sampled counters, so the totals are estimates.
+    hits = round(cache.get(SEARCH_HITS_KEY, 0) / SEARCH_STATS_SAMPLE_RATE)
+    misses = round(cache.get(SEARCH_MISSES_KEY, 0) / SEARCH_STATS_SAMPLE_RATE)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / total if total else 0.0,
+    }
+
+
+def reset_search_cache_stats():
+    cache.delete_many([SEARCH_HITS_KEY, SEARCH_MISSES_KEY])
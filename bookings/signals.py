@@ -1,18 +1,34 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import UserProfile
+from .models import UserProfile, TravelOption
+from .search import invalidate_search_cache
+from .summaries import refresh_travel_options
+from .metrics import install_query_recorder
 
 
 @receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
-    if created:
-        UserProfile.objects.get_or_create(user=instance)
+def create_user_profile(sender, instance, created, raw=False, **kwargs):
+    # The only place a profile is created for a new user. Later User saves,
+    # such as the last_login update on every login, leave the profile alone;
+    # fixtures (raw saves) bring their own profile rows.
+    if created and not raw:
+        UserProfile.objects.create(user=instance)
 
 
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    if hasattr(instance, 'userprofile'):
-        instance.userprofile.save()
-    else:
-        UserProfile.objects.create(user=instance)
+@receiver(post_save, sender=TravelOption)
+@receiver(post_delete, sender=TravelOption)
+def invalidate_travel_option_searches(sender, instance, raw=False, **kwargs):
+    # Admin edits and other single-row saves; fixtures (raw saves) are
+    # summarised by rebuild_route_summaries afterwards.
+    if not raw:
+        refresh_travel_options(instance)
+    dates = [instance.departure_date, getattr(instance, '_loaded_departure_date', None)]
+    transaction.on_commit(lambda: invalidate_search_cache(*dates, catalog=True))
+
+
+@receiver(connection_created)
+def record_request_queries(sender, connection, **kwargs):
+    install_query_recorder(connection)
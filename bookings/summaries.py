@@ -0,0 +1,114 @@
+from functools import reduce
+from itertools import islice
+from operator import or_
+from django.db import connection, transaction
+from django.db.models import Count, Min, Q, Sum
+from django.utils import timezone
+from .models import TravelOption, RouteDaySummary, ROUTE_DAY_FIELDS, route_day
+from .search import invalidate_routes
+
+
+REFRESH_BATCH_SIZE = 100
+REBUILD_BATCH_SIZE = 5000
+SUMMARY_FIELDS = ['source', 'destination', 'departures', 'seats_left', 'min_price']
+
+
+def _match(route_days):
+    return reduce(or_, (Q(**dict(zip(ROUTE_DAY_FIELDS, key))) for key in route_days))
+
+
+def summarize(travel_options):
+    # One row per route/day/type; the minimum price only counts trips that
+    # still have seats, so a sold-out day shows no price.
+    return travel_options.values(*ROUTE_DAY_FIELDS).annotate(
+        source=Min('source'),
+        destination=Min('destination'),
+        departures=Count('id'),
+        seats_left=Sum('available_seats'),
+        min_price=Min('price', filter=Q(available_seats__gt=0)),
+    ).order_by(*ROUTE_DAY_FIELDS)
+
+
+def refresh_route_days(route_days):
+    # Recompute the given groups from their travel options. The summary rows
+    # are locked first (in key order, so concurrent refreshes cannot
+    # deadlock); a concurrent writer to the same group waits here and then
+    # recomputes from data that includes this transaction's changes.
+    # Existing rows are updated by primary key and only new groups are
+    # inserted, so this works on MySQL, whose upsert takes no conflict target.
+    # Cached fare calendars of the affected routes are dropped on commit.
+    route_days = sorted({key for key in route_days if key is not None})
+    now = timezone.now()
+    with transaction.atomic():
+        routes = {key[:2] for key in route_days}
+        transaction.on_commit(lambda: invalidate_routes(routes))
+        for start in range(0, len(route_days), REFRESH_BATCH_SIZE):
+            batch = route_days[start:start + REFRESH_BATCH_SIZE]
+            match = _match(batch)
+            locked = {
+                row[:-1]: row[-1] for row in
+                RouteDaySummary.objects.select_for_update().filter(match)
+                .order_by(*ROUTE_DAY_FIELDS).values_list(*ROUTE_DAY_FIELDS, 'pk')
+            }
+            updated, created = [], []
+            for row in summarize(TravelOption.objects.filter(match)):
+                key = tuple(row[field] for field in ROUTE_DAY_FIELDS)
+                summary = RouteDaySummary(pk=locked.pop(key, None), updated_at=now, **row)
+                (created if summary.pk is None else updated).append(summary)
+            if updated:
+                RouteDaySummary.objects.bulk_update(updated, SUMMARY_FIELDS + ['updated_at'])
+            if created:
+                RouteDaySummary.objects.bulk_create(
+                    created,
+                    update_conflicts=True,
+                    unique_fields=(
+                        ROUTE_DAY_FIELDS if connection.features.supports_update_conflicts_with_target else None
+                    ),
+                    update_fields=SUMMARY_FIELDS + ['updated_at'],
+                )
+            if locked:
+                # Groups left without any travel option.
+                RouteDaySummary.objects.filter(pk__in=locked.values()).delete()
+
+
+def refresh_travel_options(*travel_options):
+    refresh_route_days(
+        key
+        for travel_option in travel_options
+        for key in (route_day(travel_option), getattr(travel_option, '_loaded_route_day', None))
+    )
+
+
+def rebuild_route_day_summaries():
+    # Full recompute for after bulk loads that bypass the maintained paths.
+    with transaction.atomic():
+        routes = set(RouteDaySummary.objects.values_list('source_key', 'destination_key').distinct())
+        transaction.on_commit(lambda: invalidate_routes(routes))
+        RouteDaySummary.objects.all().delete()
+        rows = summarize(TravelOption.objects.all()).iterator(chunk_size=REBUILD_BATCH_SIZE)
+        count = 0
+        while True:
+            batch = list(islice(rows, REBUILD_BATCH_SIZE))
+            if not batch:
+                return count
+            RouteDaySummary.objects.bulk_create([RouteDaySummary(**row) for row in batch])
+            routes.update((row['source_key'], row['destination_key']) for row in batch)
+            count += len(batch)
+
+
+def check_route_day_summaries():
+    # Compare the table with a fresh aggregate; returns (key, stored, expected)
+    # for every group that differs, with None for a missing side.
+    expected = {
+        tuple(row[field] for field in ROUTE_DAY_FIELDS): {field: row[field] for field in SUMMARY_FIELDS}
+        for row in summarize(TravelOption.objects.all()).iterator()
+    }
+    mismatches = []
+    for row in RouteDaySummary.objects.values(*ROUTE_DAY_FIELDS, *SUMMARY_FIELDS).iterator():
+        key = tuple(row[field] for field in ROUTE_DAY_FIELDS)
+        stored = {field: row[field] for field in SUMMARY_FIELDS}
+        wanted = expected.pop(key, None)
+        if stored != wanted:
+            mismatches.append((key, stored, wanted))
+    mismatches.extend((key, None, wanted) for key, wanted in expected.items())
+    return mismatches
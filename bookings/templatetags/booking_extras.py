@@ -5,3 +5,10 @@ register = template.Library()
 @register.filter
 def split(value, arg):
     return value.split(arg)
+
+@register.simple_tag(takes_context=True)
+def cursor_url(context, cursor):
+    params = context['request'].GET.copy()
+    params.pop('page', None)
+    params['cursor'] = cursor
+    return f'?{params.urlencode()}'
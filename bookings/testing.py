@@ -0,0 +1,15 @@
+from django.urls import reverse
+
+
+class QueryBudgetMixin:
+    # For TestCase subclasses: request a view through the test client and fail
+    # if the metrics middleware saw it run more queries than its budget.
+    def assertQueryBudget(self, budget, url_name, *args, method='get', data=None, **kwargs):
+        url = reverse(url_name, args=args, kwargs=kwargs)
+        response = getattr(self.client, method)(url, data)
+        metrics = response.wsgi_request.metrics
+        self.assertLessEqual(
+            metrics.queries, budget,
+            f'{url_name} ran {metrics.queries} queries, over its budget of {budget}.'
+        )
+        return response
@@ -1,10 +1,40 @@
-from django.test import TestCase, Client
+import csv
+import importlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time as clock
+from io import StringIO
+from unittest.mock import patch
+from asgiref.sync import iscoroutinefunction
+from decimal import Decimal
+from django.core.management import call_command, CommandError
+from django.core.signals import request_finished
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, Client, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.core.cache import cache
+from django.contrib import admin
 from django.contrib.auth.models import User
-from django.urls import reverse
+from django.urls import resolve, reverse
 from django.utils import timezone
-from datetime import date, time, timedelta
-from .models import TravelOption, Booking, UserProfile
+from datetime import date, datetime, time, timedelta
+from .models import TravelOption, Booking, UserProfile, Location, RouteDaySummary
+from .exports import filter_bookings
+from .admin import SourceFilter, TravelOptionAdmin
 from .forms import CustomUserCreationForm, BookingForm
+from . import inventory, views
+from .search import resolve_location_keys, search_cache_stats
+from .pagination import KeysetPaginator, EstimatedCountPaginator
+from .ids import IdGenerator, SEQUENCE_LIMIT, generate_travel_id
+from .metrics import reset_request_metrics
+from .autocomplete import CityIndex, city_index
+from .management.commands.create_sample_data import Command as CreateSampleDataCommand
+from .testing import QueryBudgetMixin
+from .routers import ReplicaRouter, PINNED_UNTIL_SESSION_KEY, is_pinned, primary_pinning_middleware, replica_reads
+from travel_booking.asgi import application as asgi_application
 
 
 class TravelOptionModelTest(TestCase):
@@ -52,6 +82,36 @@ class UserProfileModelTest(TestCase):
             self.assertEqual(profile.user, self.user)
         except UserProfile.DoesNotExist:
             self.fail("UserProfile was not created for the user")
+    
+    def test_user_update_does_not_write_profile(self):
+        self.user.first_name = 'Changed'
+        with CaptureQueriesContext(connection) as queries:
+            self.user.save()
+        self.assertFalse([query for query in queries if 'bookings_userprofile' in query['sql']])
+    
+    def test_login_query_count(self):
+        # Fetch the user, create and rotate the session, update last_login;
+        # nothing touches the profile.
+        with self.assertNumQueries(9):
+            response = self.client.post(reverse('login'), {'username': 'testuser', 'password': 'testpass123'})
+        self.assertEqual(response.status_code, 302)
+    
+    def test_register_inserts_one_profile(self):
+        data = {
+            'username': 'newuser',
+            'first_name': 'New',
+            'last_name': 'User',
+            'email': 'new@example.com',
+            'password1': 'complexpass123',
+            'password2': 'complexpass123',
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('register'), data)
+        self.assertEqual(response.status_code, 302)
+        profile_writes = [query for query in queries if query['sql'].startswith(('INSERT INTO "bookings_userprofile"', 'UPDATE "bookings_userprofile"'))]
+        self.assertEqual(len(profile_writes), 1)
+        self.assertEqual(len(queries), 12)
+        self.assertTrue(UserProfile.objects.filter(user__username='newuser').exists())
 
 
 class BookingModelTest(TestCase):
@@ -182,6 +242,7 @@ class BookingFormTest(TestCase):
 
 class ViewsTest(TestCase):
     def setUp(self):
+        cache.clear()
         self.client = Client()
         self.user = User.objects.create_user(
             username='testuser',
@@ -238,3 +299,1530 @@ class ViewsTest(TestCase):
         self.client.login(username='testuser', password='testpass123')
         response = self.client.get(reverse('book_travel', args=[self.travel_option.pk]))
         self.assertEqual(response.status_code, 200)
+
+
+class SeatInventoryTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        
+        self.travel_option = TravelOption.objects.create(
+            travel_id='FL001',
+            travel_type='flight',
+            source='New York',
+            destination='Los Angeles',
+            departure_date=date.today() + timedelta(days=3),
+            departure_time=time(10, 0),
+            arrival_date=date.today() + timedelta(days=3),
+            arrival_time=time(13, 0),
+            price=299.99,
+            available_seats=3,
+            total_seats=100
+        )
+    
+    def test_reserve_seats_never_oversells(self):
+        self.assertTrue(inventory.reserve_seats(self.travel_option, 2))
+        self.assertFalse(inventory.reserve_seats(self.travel_option, 2))
+        self.assertTrue(inventory.reserve_seats(self.travel_option, 1))
+        
+        self.travel_option.refresh_from_db()
+        self.assertEqual(self.travel_option.available_seats, 0)
+    
+    def test_cancel_releases_seats_once(self):
+        booking = Booking.objects.create(
+            user=self.user,
+            travel_option=self.travel_option,
+            number_of_seats=2,
+            passenger_names='John Doe, Jane Doe',
+            contact_email='test@example.com',
+            contact_phone='123-456-7890'
+        )
+        
+        self.assertTrue(inventory.cancel_booking(booking))
+        self.assertFalse(inventory.cancel_booking(booking))
+        
+        self.travel_option.refresh_from_db()
+        self.assertEqual(self.travel_option.available_seats, 5)
+    
+    def test_book_travel_decrements_seats(self):
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.post(reverse('book_travel', args=[self.travel_option.pk]), {
+            'number_of_seats': 2,
+            'passenger_names': 'John Doe, Jane Doe',
+            'contact_email': 'test@example.com',
+            'contact_phone': '123-456-7890'
+        })
+        booking = Booking.objects.get(travel_option=self.travel_option)
+        self.assertRedirects(response, reverse('confirm_booking', args=[booking.booking_id]))
+        self.assertEqual(booking.status, 'pending')
+        
+        self.travel_option.refresh_from_db()
+        self.assertEqual(self.travel_option.available_seats, 1)
+
+
+class LocationSearchTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        for travel_id, source, destination in [
+            ('FL001', 'New York', 'Los Angeles'),
+            ('FL002', 'San Jose', 'San Diego'),
+            ('FL003', 'San Jose Del Monte', 'Chicago'),
+        ]:
+            TravelOption.objects.create(
+                travel_id=travel_id,
+                travel_type='flight',
+                source=source,
+                destination=destination,
+                departure_date=date.today() + timedelta(days=1),
+                departure_time=time(10, 0),
+                arrival_date=date.today() + timedelta(days=1),
+                arrival_time=time(13, 0),
+                price=299.99,
+                available_seats=50,
+                total_seats=100
+            )
+    
+    def test_keys_are_normalized(self):
+        travel_option = TravelOption.objects.get(travel_id='FL001')
+        self.assertEqual(travel_option.source_key, 'new york')
+        self.assertTrue(Location.objects.filter(key='los angeles', name='Los Angeles').exists())
+    
+    def test_only_city_changes_insert_locations(self):
+        travel_option = TravelOption.objects.get(travel_id='FL001')
+        travel_option.price = 199
+        with CaptureQueriesContext(connection) as queries:
+            travel_option.save()
+        self.assertFalse([query for query in queries if 'bookings_location' in query['sql']])
+        
+        travel_option.destination = 'Seattle'
+        travel_option.save()
+        self.assertTrue(Location.objects.filter(key='seattle').exists())
+    
+    def test_exact_match_wins_over_prefix(self):
+        self.assertEqual(resolve_location_keys('  SAN   jose '), ['san jose'])
+    
+    def test_prefix_match(self):
+        self.assertEqual(resolve_location_keys('san'), ['san diego', 'san jose', 'san jose del monte'])
+        self.assertEqual(resolve_location_keys('york'), [])
+    
+    def test_search_projects_card_columns(self):
+        response = self.client.get(reverse('home'), {'source': 'san jose'})
+        travel_option = response.context['travel_options'][0]
+        self.assertIn('created_at', travel_option.get_deferred_fields())
+        self.assertNotIn('price', travel_option.get_deferred_fields())
+    
+    def test_search_reports_stage_timings(self):
+        response = self.client.get(reverse('travel_options'))
+        for stage in ('form', 'query', 'render'):
+            self.assertIn(f'{stage};dur=', response['Server-Timing'])
+    
+    def test_travel_options_filters_by_location(self):
+        response = self.client.get(reverse('travel_options'), {'source': 'new'})
+        self.assertContains(response, 'FL001')
+        self.assertNotContains(response, 'FL002')
+
+
+class SearchCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        
+        self.travel_option = TravelOption.objects.create(
+            travel_id='FL001',
+            travel_type='flight',
+            source='New York',
+            destination='Los Angeles',
+            departure_date=date.today() + timedelta(days=3),
+            departure_time=time(10, 0),
+            arrival_date=date.today() + timedelta(days=3),
+            arrival_time=time(13, 0),
+            price=299.99,
+            available_seats=7,
+            total_seats=100
+        )
+    
+    @patch('bookings.search.SEARCH_STATS_SAMPLE_RATE', 1)
+    def test_repeated_search_is_served_from_cache(self):
+        params = {'source': 'new york', 'departure_date': self.travel_option.departure_date.isoformat()}
+        self.client.get(reverse('travel_options'), params)
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('travel_options'), params)
+        self.assertContains(response, 'FL001')
+        self.assertEqual(search_cache_stats()['hits'], 1)
+        self.assertEqual(search_cache_stats()['misses'], 1)
+    
+    def test_booking_invalidates_cached_search(self):
+        params = {'departure_date': self.travel_option.departure_date.isoformat()}
+        self.client.get(reverse('travel_options'), params)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            inventory.reserve_seats(self.travel_option, 2)
+        
+        response = self.client.get(reverse('travel_options'), params)
+        self.assertEqual(response.context['travel_options'][0].available_seats, 5)
+    
+    def test_seat_changes_leave_undated_searches_to_expire(self):
+        self.client.get(reverse('travel_options'))
+        with self.captureOnCommitCallbacks(execute=True):
+            inventory.reserve_seats(self.travel_option, 2)
+        
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('travel_options'))
+        self.assertEqual(response.context['travel_options'][0].available_seats, 7)
+        with patch('bookings.search.SEARCH_UNDATED_TIMEOUT', 0):
+            self.client.get(reverse('travel_options'), {'source': 'new york'})
+            response = self.client.get(reverse('travel_options'), {'source': 'new york'})
+        self.assertEqual(response.context['travel_options'][0].available_seats, 5)
+    
+    def test_evicted_version_never_serves_old_entries(self):
+        params = {'departure_date': self.travel_option.departure_date.isoformat()}
+        self.client.get(reverse('travel_options'), params)
+        TravelOption.objects.filter(pk=self.travel_option.pk).update(available_seats=4)
+        cache.delete(f'search:version:date:{params["departure_date"]}')
+        
+        response = self.client.get(reverse('travel_options'), params)
+        self.assertEqual(response.context['travel_options'][0].available_seats, 4)
+    
+    def test_admin_edit_invalidates_old_and_new_date(self):
+        old_date = self.travel_option.departure_date.isoformat()
+        self.client.get(reverse('travel_options'), {'departure_date': old_date})
+        
+        travel_option = TravelOption.objects.get(pk=self.travel_option.pk)
+        travel_option.departure_date += timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            travel_option.save()
+        
+        response = self.client.get(reverse('travel_options'), {'departure_date': old_date})
+        self.assertNotContains(response, 'FL001')
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_PIN_SECONDS=15)
+class ReplicaSearchCacheTest(TestCase):
+    # Reads stay on the primary inside the test transaction; these cover what
+    # the search cache does while a replica may still lag.
+    def setUp(self):
+        cache.clear()
+        self.travel_option = TravelOption.objects.create(
+            travel_id='RC001',
+            travel_type='flight',
+            source='New York',
+            destination='Los Angeles',
+            departure_date=date.today() + timedelta(days=3),
+            departure_time=time(10, 0),
+            arrival_date=date.today() + timedelta(days=3),
+            arrival_time=time(13, 0),
+            price=199,
+            available_seats=7,
+            total_seats=100
+        )
+        self.params = {'departure_date': self.travel_option.departure_date.isoformat()}
+    
+    def later(self):
+        return patch('bookings.search.time.time', return_value=timezone.now().timestamp() + 16)
+    
+    def search(self):
+        response = self.client.get(reverse('travel_options'), self.params)
+        return response.context['travel_options'][0].available_seats
+    
+    def test_results_are_not_cached_until_replicas_catch_up(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            inventory.reserve_seats(self.travel_option, 2)
+        self.search()
+        with CaptureQueriesContext(connection) as queries:
+            self.search()
+        self.assertTrue(queries)
+        
+        with self.later():
+            self.search()
+            with self.assertNumQueries(0):
+                self.assertEqual(self.search(), 5)
+    
+    def test_pinned_session_bypasses_cache(self):
+        self.search()
+        with self.later():
+            self.search()
+        TravelOption.objects.filter(pk=self.travel_option.pk).update(available_seats=3)
+        with self.later():
+            self.assertEqual(self.search(), 7)
+        
+        session = self.client.session
+        session[PINNED_UNTIL_SESSION_KEY] = timezone.now().timestamp() + 60
+        session.save()
+        self.assertEqual(self.search(), 3)
+
+
+class KeysetPaginationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        for i in range(13):
+            TravelOption.objects.create(
+                travel_id=f'FL{i:03d}',
+                travel_type='flight',
+                source='New York',
+                destination='Los Angeles',
+                departure_date=date.today() + timedelta(days=1 + i // 3),
+                departure_time=time(10, 0),
+                arrival_date=date.today() + timedelta(days=1 + i // 3),
+                arrival_time=time(13, 0),
+                price=299.99,
+                available_seats=50,
+                total_seats=100
+            )
+        self.ordering = ['departure_date', 'departure_time', 'id']
+    
+    def test_pages_walk_forward_and_back(self):
+        paginator = KeysetPaginator(TravelOption.objects.all(), 5, self.ordering, count_limit=5)
+        expected = list(TravelOption.objects.order_by(*self.ordering))
+        
+        first = paginator.get_page()
+        second = paginator.get_page(first.next_cursor)
+        third = paginator.get_page(second.next_cursor)
+        self.assertEqual(list(first) + list(second) + list(third), expected)
+        self.assertFalse(first.has_previous())
+        self.assertFalse(third.has_next())
+        self.assertEqual((first.total, first.total_is_exact), (5, False))
+        
+        back = paginator.get_page(third.previous_cursor)
+        self.assertEqual(list(back), list(second))
+        self.assertEqual(list(paginator.get_page(back.previous_cursor)), list(first))
+        self.assertFalse(paginator.get_page(back.previous_cursor).has_previous())
+    
+    def test_invalid_cursor_returns_first_page(self):
+        paginator = KeysetPaginator(TravelOption.objects.all(), 3, self.ordering)
+        self.assertEqual(list(paginator.get_page('not-a-cursor')), list(paginator.get_page()))
+    
+    def test_travel_options_next_link(self):
+        response = self.client.get(reverse('travel_options'))
+        page_obj = response.context['page_obj']
+        self.assertTrue(page_obj.has_next())
+        self.assertContains(response, f'cursor={page_obj.next_cursor}')
+
+
+class MyBookingsQueryTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.login(username='testuser', password='testpass123')
+    
+    def _create_bookings(self, count, days_ahead):
+        for i in range(count):
+            travel_option = TravelOption.objects.create(
+                travel_id=f'FL{days_ahead:02d}{i:03d}',
+                travel_type='flight',
+                source='New York',
+                destination='Los Angeles',
+                departure_date=date.today() + timedelta(days=days_ahead),
+                departure_time=time(10, 0),
+                arrival_date=date.today() + timedelta(days=days_ahead),
+                arrival_time=time(13, 0),
+                price=299.99,
+                available_seats=50,
+                total_seats=100
+            )
+            Booking.objects.create(
+                user=self.user,
+                travel_option=travel_option,
+                number_of_seats=1,
+                passenger_names='John Doe',
+                contact_email='test@example.com',
+                contact_phone='123-456-7890'
+            )
+    
+    def test_query_count_is_constant(self):
+        self._create_bookings(1, 5)
+        with self.assertNumQueries(4):
+            self.client.get(reverse('my_bookings'))
+        
+        self._create_bookings(8, 6)
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('my_bookings'))
+        self.assertEqual(len(response.context['bookings']), 9)
+    
+    def test_cancellable_annotation_matches_model(self):
+        self._create_bookings(1, 5)
+        self._create_bookings(1, 0)
+        for booking in Booking.objects.with_cancellable():
+            fresh = Booking.objects.get(pk=booking.pk)
+            self.assertEqual(booking.can_cancel(), fresh.can_cancel())
+        self.assertEqual(
+            sorted(b.can_cancel() for b in Booking.objects.with_cancellable()), [False, True]
+        )
+    
+    def test_booking_detail_single_query(self):
+        self._create_bookings(1, 5)
+        booking = Booking.objects.get()
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('booking_detail', args=[booking.booking_id]))
+        self.assertContains(response, 'Cancel Booking')
+
+
+class SearchApiTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.travel_option = TravelOption.objects.create(
+            travel_id='FL001',
+            travel_type='flight',
+            source='New York',
+            destination='Los Angeles',
+            departure_date=date.today() + timedelta(days=3),
+            departure_time=time(10, 0),
+            arrival_date=date.today() + timedelta(days=3),
+            arrival_time=time(13, 0),
+            price=299.99,
+            available_seats=2,
+            total_seats=100
+        )
+    
+    def test_search_returns_compact_results(self):
+        response = self.client.get(reverse('api_search'), {'source': 'new york'})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]['travel_id'], 'FL001')
+        self.assertEqual(results[0]['seats'], 2)
+        self.assertTrue(response.has_header('ETag'))
+        self.assertTrue(response.has_header('Last-Modified'))
+    
+    def test_invalid_parameters_are_rejected(self):
+        response = self.client.get(reverse('api_search'), {'departure_date': 'not-a-date'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('departure_date', response.json()['errors'])
+    
+    def test_unchanged_results_return_not_modified(self):
+        etag = self.client.get(reverse('api_search'))['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('api_search'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+    
+    def test_selling_out_changes_etag(self):
+        params = {'departure_date': self.travel_option.departure_date.isoformat()}
+        etag = self.client.get(reverse('api_search'), params)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            inventory.reserve_seats(self.travel_option, 2)
+        
+        response = self.client.get(reverse('api_search'), params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [])
+
+
+class SeatHoldTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        
+        self.travel_option = TravelOption.objects.create(
+            travel_id='FL001',
+            travel_type='flight',
+            source='New York',
+            destination='Los Angeles',
+            departure_date=date.today() + timedelta(days=3),
+            departure_time=time(10, 0),
+            arrival_date=date.today() + timedelta(days=3),
+            arrival_time=time(13, 0),
+            price=299.99,
+            available_seats=10,
+            total_seats=100
+        )
+    
+    def _hold(self, seats, expires_in):
+        inventory.reserve_seats(self.travel_option, seats)
+        return Booking.objects.create(
+            user=self.user,
+            travel_option=self.travel_option,
+            number_of_seats=seats,
+            passenger_names=', '.join(['John Doe'] * seats),
+            contact_email='test@example.com',
+            contact_phone='123-456-7890',
+            status='pending',
+            hold_expires_at=timezone.now() + expires_in
+        )
+    
+    def test_confirm_active_hold(self):
+        booking = self._hold(2, timedelta(minutes=5))
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.post(reverse('confirm_booking', args=[booking.booking_id]))
+        self.assertRedirects(response, reverse('my_bookings'))
+        
+        booking.refresh_from_db()
+        self.assertEqual(booking.status, 'confirmed')
+        self.assertIsNone(booking.hold_expires_at)
+    
+    def test_expired_hold_cannot_be_confirmed(self):
+        booking = self._hold(2, timedelta(minutes=-1))
+        self.assertFalse(inventory.confirm_hold(booking))
+    
+    def test_sweeper_releases_expired_holds(self):
+        self._hold(2, timedelta(minutes=-1))
+        self._hold(3, timedelta(minutes=-2))
+        active = self._hold(1, timedelta(minutes=5))
+        
+        self.assertEqual(inventory.release_expired_holds(batch_size=1), 2)
+        
+        self.travel_option.refresh_from_db()
+        self.assertEqual(self.travel_option.available_seats, 9)
+        self.assertEqual(Booking.objects.filter(status='cancelled').count(), 2)
+        active.refresh_from_db()
+        self.assertEqual(active.status, 'pending')
+
+
+class ItineraryBookingTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.login(username='testuser', password='testpass123')
+        
+        self.legs = [
+            TravelOption.objects.create(
+                travel_id=f'FL00{i}',
+                travel_type='flight',
+                source=source,
+                destination=destination,
+                departure_date=date.today() + timedelta(days=3),
+                departure_time=time(8 + i * 4, 0),
+                arrival_date=date.today() + timedelta(days=3),
+                arrival_time=time(10 + i * 4, 0),
+                price=100 + i,
+                available_seats=seats,
+                total_seats=100
+            )
+            for i, (source, destination, seats) in enumerate([
+                ('New York', 'Chicago', 5),
+                ('Chicago', 'Denver', 5),
+                ('Denver', 'Los Angeles', 1),
+            ])
+        ]
+    
+    def _post(self, legs, seats):
+        return self.client.post(reverse('book_itinerary'), {
+            'legs': [leg.pk for leg in legs],
+            'number_of_seats': seats,
+            'passenger_names': ', '.join(['John Doe'] * seats),
+            'contact_email': 'test@example.com',
+            'contact_phone': '123-456-7890'
+        })
+    
+    def test_holds_all_legs_then_confirms_them_together(self):
+        response = self._post(self.legs[:2], 2)
+        bookings = Booking.objects.filter(user=self.user).order_by('travel_option__departure_time')
+        self.assertRedirects(response, reverse('confirm_booking', args=[bookings[0].booking_id]))
+        
+        self.assertEqual(bookings.count(), 2)
+        self.assertEqual(sorted(b.total_price for b in bookings), [200, 202])
+        self.assertEqual({(b.status, b.itinerary_id) for b in bookings}, {('pending', bookings[0].booking_id)})
+        for leg in self.legs[:2]:
+            leg.refresh_from_db()
+            self.assertEqual(leg.available_seats, 3)
+        
+        response = self.client.get(reverse('confirm_booking', args=[bookings[0].booking_id]))
+        self.assertContains(response, bookings[1].booking_id)
+        response = self.client.post(reverse('confirm_booking', args=[bookings[0].booking_id]), {'confirm': ''})
+        self.assertRedirects(response, reverse('my_bookings'))
+        self.assertEqual(set(bookings.values_list('status', flat=True)), {'confirmed'})
+    
+    def test_expired_leg_releases_whole_itinerary(self):
+        self._post(self.legs[:2], 2)
+        first, second = Booking.objects.order_by('travel_option__departure_time')
+        Booking.objects.filter(pk=second.pk).update(hold_expires_at=timezone.now() - timedelta(seconds=1))
+        
+        response = self.client.post(reverse('confirm_booking', args=[first.booking_id]), {'confirm': ''})
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response['Location'].startswith(reverse('book_itinerary')))
+        self.assertEqual(set(Booking.objects.values_list('status', flat=True)), {'cancelled'})
+        for leg in self.legs[:2]:
+            leg.refresh_from_db()
+            self.assertEqual(leg.available_seats, 5)
+    
+    def test_legs_must_connect(self):
+        self.legs[2].source = 'Dallas'
+        self.legs[2].save()
+        response = self._post([self.legs[0], self.legs[2]], 1)
+        self.assertContains(response, 'FL000 arrives in Chicago, but FL002 leaves from Dallas.')
+        
+        self.legs[1].departure_time = time(9, 0)
+        self.legs[1].save()
+        response = self._post(self.legs[:2], 1)
+        self.assertContains(response, 'FL001 departs before FL000 arrives.')
+        self.assertFalse(Booking.objects.exists())
+    
+    def test_unavailable_leg_books_nothing(self):
+        with self.assertRaises(inventory.SeatsUnavailable):
+            inventory.book_itinerary(
+                self.user, self.legs, 2,
+                passenger_names='John Doe, Jane Doe',
+                contact_email='test@example.com',
+                contact_phone='123-456-7890'
+            )
+        
+        self.assertFalse(Booking.objects.exists())
+        self.legs[0].refresh_from_db()
+        self.assertEqual(self.legs[0].available_seats, 5)
+    
+    def test_itinerary_page_lists_legs(self):
+        response = self.client.get(reverse('book_itinerary'), {'leg': [leg.pk for leg in self.legs]})
+        self.assertContains(response, 'FL002')
+
+
+class CreateSampleDataTest(TestCase):
+    def _run(self):
+        call_command(
+            'create_sample_data', count=30, batch_size=7, seed=3, users=4, with_bookings=20, stdout=StringIO()
+        )
+        return (
+            list(TravelOption.objects.order_by('travel_id').values_list('travel_id', 'source_key', 'price')),
+            list(Booking.objects.order_by('booking_id').values_list('booking_id', 'number_of_seats', 'status')),
+        )
+    
+    def test_same_seed_gives_same_data(self):
+        first = self._run()
+        self.assertEqual(len(first[0]), 30)
+        self.assertEqual(len(first[1]), 20)
+        self.assertEqual(self._run(), first)
+        self.assertEqual(UserProfile.objects.filter(user__username__startswith='sample_user_').count(), 4)
+    
+    def test_rerun_deletes_existing_trips_in_bulk(self):
+        def rerun_queries(existing):
+            call_command('create_sample_data', count=existing, seed=1, stdout=StringIO())
+            with CaptureQueriesContext(connection) as queries:
+                call_command('create_sample_data', count=5, seed=1, stdout=StringIO())
+            return len(queries)
+        
+        self.assertEqual(rerun_queries(40), rerun_queries(5))
+    
+    def test_reports_only_inserted_bookings(self):
+        # Trips removed between the two phases leave gaps in the id range;
+        # bookings that draw one are skipped and must not be reported.
+        create_users = CreateSampleDataCommand._create_users
+        
+        def create_users_and_drop_trips(command, count):
+            TravelOption.objects.filter(pk__in=TravelOption.objects.order_by('pk').values('pk')[1:15]).delete()
+            return create_users(command, count)
+        
+        out = StringIO()
+        with patch.object(CreateSampleDataCommand, '_create_users', create_users_and_drop_trips):
+            call_command('create_sample_data', count=20, seed=2, users=2, with_bookings=20, stdout=out)
+        created = Booking.objects.count()
+        self.assertLess(created, 20)
+        self.assertIn(f'and {created} bookings', out.getvalue())
+
+
+class DbStatsCommandTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='statsuser', password='testpass123')
+        departure_date = timezone.now().date() + timedelta(days=3)
+        for i, travel_type in enumerate(['flight', 'flight', 'bus']):
+            option = TravelOption.objects.create(
+                travel_id=f'ST{i}',
+                travel_type=travel_type,
+                source='New York',
+                destination='Boston',
+                departure_date=departure_date,
+                departure_time=time(8 + i, 0),
+                arrival_date=departure_date,
+                arrival_time=time(12, 0),
+                price=100 + i,
+                available_seats=10,
+                total_seats=10
+            )
+        Booking.objects.create(
+            user=self.user,
+            travel_option=option,
+            number_of_seats=1,
+            total_price=102,
+            status='cancelled',
+            passenger_names='Stats Passenger',
+            contact_email='stats@example.com',
+            contact_phone='000'
+        )
+    
+    def test_json_output_uses_few_queries(self):
+        out = StringIO()
+        with self.assertNumQueries(5):
+            call_command('db_stats', json=True, stdout=out)
+        stats = json.loads(out.getvalue())
+        self.assertEqual(stats['travel_options']['flights'], 2)
+        self.assertEqual(stats['travel_options']['available_seats'], 30)
+        self.assertEqual(stats['bookings']['cancelled'], 1)
+        self.assertEqual(stats['routes'][0]['departures'], 3)
+        self.assertEqual(stats['days'][0]['departures'], 3)
+        self.assertEqual(set(stats['timings_ms']), {'users', 'travel_options', 'bookings', 'routes', 'days'})
+
+
+class ImportTravelOptionsTest(TestCase):
+    HEADER = 'travel_id,travel_type,source,destination,departure_date,departure_time,arrival_date,arrival_time,price,available_seats,total_seats\n'
+    
+    def setUp(self):
+        cache.clear()
+        self.departure_date = timezone.now().date() + timedelta(days=5)
+        self.existing = TravelOption.objects.create(
+            travel_id='IM001',
+            travel_type='flight',
+            source='New York',
+            destination='Boston',
+            departure_date=self.departure_date,
+            departure_time=time(8, 0),
+            arrival_date=self.departure_date,
+            arrival_time=time(10, 0),
+            price=100,
+            available_seats=10,
+            total_seats=10
+        )
+    
+    def _write(self, rows):
+        handle = tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False)
+        handle.write(self.HEADER + ''.join(rows))
+        handle.close()
+        self.addCleanup(os.unlink, handle.name)
+        return handle.name
+    
+    def _row(self, travel_id, price='150.00', travel_type='flight'):
+        day = self.departure_date.isoformat()
+        return f'{travel_id},{travel_type},New York,  Chicago ,{day},09:00,{day},11:00,{price},,20\n'
+    
+    def test_upserts_by_travel_id_and_rejects_invalid_rows(self):
+        path = self._write([self._row('IM001'), self._row('IM002'), self._row('IM003', travel_type='boat')])
+        rejects = path + '.rejects'
+        self.addCleanup(os.unlink, rejects)
+        
+        call_command('import_travel_options', path, batch_size=2, rejects=rejects, stdout=StringIO())
+        
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.price, 150)
+        self.assertEqual(self.existing.destination_key, 'chicago')
+        self.assertEqual(self.existing.total_seats, 20)
+        self.assertTrue(TravelOption.objects.filter(travel_id='IM002').exists())
+        self.assertEqual(TravelOption.objects.count(), 2)
+        self.assertTrue(Location.objects.filter(key='chicago').exists())
+        with open(rejects) as handle:
+            rejected = [json.loads(line) for line in handle]
+        self.assertEqual([row['record'] for row in rejected], [2])
+        self.assertIn('travel_type', rejected[0]['errors'])
+    
+    def test_reimport_keeps_booked_and_held_seats(self):
+        user = User.objects.create_user(username='importuser', password='testpass123')
+        for status, seats in [('confirmed', 3), ('pending', 2)]:
+            self.assertTrue(inventory.reserve_seats(self.existing, seats))
+            Booking.objects.create(
+                user=user, travel_option=self.existing, number_of_seats=seats, status=status,
+                passenger_names=', '.join(['Import Passenger'] * seats),
+                contact_email='import@example.com', contact_phone='000'
+            )
+        
+        call_command('import_travel_options', self._write([self._row('IM001')]), stdout=StringIO())
+        self.existing.refresh_from_db()
+        self.assertEqual((self.existing.total_seats, self.existing.available_seats), (20, 15))
+    
+    def test_upsert_without_conflict_target_support(self):
+        # MySQL's ON DUPLICATE KEY UPDATE rejects unique_fields.
+        path = self._write([self._row('IM002')])
+        with patch.object(connection.features, 'supports_update_conflicts_with_target', False):
+            call_command('import_travel_options', path, stdout=StringIO())
+        self.assertTrue(TravelOption.objects.filter(travel_id='IM002').exists())
+    
+    def test_offset_skips_already_imported_records(self):
+        path = self._write([self._row('IM002'), self._row('IM003'), self._row('IM004')])
+        call_command('import_travel_options', path, offset=2, stdout=StringIO())
+        self.assertEqual(
+            list(TravelOption.objects.order_by('travel_id').values_list('travel_id', flat=True)),
+            ['IM001', 'IM004']
+        )
+    
+    def test_import_invalidates_cached_searches(self):
+        search = {'departure_date': self.departure_date.isoformat()}
+        self.client.get(reverse('travel_options'), search)
+        path = self._write([self._row('IM002')])
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('import_travel_options', path, stdout=StringIO())
+        response = self.client.get(reverse('travel_options'), search)
+        self.assertContains(response, 'IM002')
+
+
+class BookingExportTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='exportuser', password='testpass123')
+        departure_date = timezone.now().date() + timedelta(days=4)
+        self.travel_option = TravelOption.objects.create(
+            travel_id='EX001',
+            travel_type='train',
+            source='New York',
+            destination='Boston',
+            departure_date=departure_date,
+            departure_time=time(9, 0),
+            arrival_date=departure_date,
+            arrival_time=time(13, 0),
+            price=50,
+            available_seats=20,
+            total_seats=20
+        )
+        for booking_id, status in [('EXB1', 'confirmed'), ('EXB2', 'cancelled')]:
+            Booking.objects.create(
+                booking_id=booking_id,
+                user=self.user,
+                travel_option=self.travel_option,
+                number_of_seats=2,
+                total_price=100,
+                status=status,
+                passenger_names='Ann Lee, Bo Chen',
+                contact_email='export@example.com',
+                contact_phone='000'
+            )
+    
+    def test_command_filters_by_status(self):
+        out = StringIO()
+        call_command('export_bookings', status='cancelled', stdout=out, stderr=StringIO())
+        rows = list(csv.DictReader(StringIO(out.getvalue())))
+        self.assertEqual([row['booking_id'] for row in rows], ['EXB2'])
+        self.assertEqual(rows[0]['travel_id'], 'EX001')
+    
+    def test_booking_dates_are_days_in_the_current_time_zone(self):
+        with timezone.override('America/New_York'):
+            day = date(2025, 3, 10)
+            Booking.objects.filter(booking_id='EXB1').update(
+                booking_date=timezone.make_aware(datetime(2025, 3, 10, 23, 30)))
+            Booking.objects.filter(booking_id='EXB2').update(
+                booking_date=timezone.make_aware(datetime(2025, 3, 11, 0, 0)))
+            bookings = filter_bookings(date_from=day, date_to=day)
+            self.assertEqual([booking.booking_id for booking in bookings], ['EXB1'])
+            self.assertNotIn('django_datetime_cast_date', str(bookings.query))
+    
+    def test_manifest_lists_one_line_per_confirmed_passenger(self):
+        out = StringIO()
+        call_command('export_bookings', kind='manifest', format='jsonl', travel_ids=['EX001'],
+                     stdout=out, stderr=StringIO())
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([row['passenger_name'] for row in rows], ['Ann Lee', 'Bo Chen'])
+        self.assertEqual({row['booking_id'] for row in rows}, {'EXB1'})
+    
+    def test_admin_action_streams_csv(self):
+        User.objects.create_superuser(username='admin', password='adminpass123', email='admin@example.com')
+        self.client.login(username='admin', password='adminpass123')
+        response = self.client.post(reverse('admin:bookings_booking_changelist'), {
+            'action': 'export_csv',
+            '_selected_action': list(Booking.objects.values_list('pk', flat=True)),
+        })
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode()
+        self.assertEqual(len(content.splitlines()), 3)
+
+
+class AdminChangelistTest(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', password='adminpass123', email='admin@example.com')
+        self.client.force_login(self.admin)
+        departure_date = timezone.now().date() + timedelta(days=6)
+        self.travel_options = [
+            TravelOption.objects.create(
+                travel_id=f'AD{i:03d}',
+                travel_type='bus',
+                source='Chicago' if i % 2 else 'Dallas',
+                destination='Austin',
+                departure_date=departure_date,
+                departure_time=time(6 + i, 0),
+                arrival_date=departure_date,
+                arrival_time=time(20, 0),
+                price=30,
+                available_seats=40,
+                total_seats=40
+            )
+            for i in range(4)
+        ]
+    
+    def _add_bookings(self, count):
+        for i in range(count):
+            user = User.objects.create_user(username=f'admin_list_{Booking.objects.count()}')
+            Booking.objects.create(
+                user=user,
+                travel_option=self.travel_options[i % 4],
+                number_of_seats=1,
+                total_price=30,
+                passenger_names='Admin Passenger',
+                contact_email='admin@example.com',
+                contact_phone='000'
+            )
+    
+    def _count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+    
+    def test_booking_changelist_queries_do_not_grow_with_rows(self):
+        url = reverse('admin:bookings_booking_changelist')
+        self._add_bookings(2)
+        few = self._count_queries(url)
+        self._add_bookings(8)
+        self.assertEqual(self._count_queries(url), few)
+    
+    def test_location_filter_uses_location_keys(self):
+        response = self.client.get(reverse('admin:bookings_traveloption_changelist'), {'source_key': 'chicago'})
+        self.assertEqual(
+            sorted(option.travel_id for option in response.context['cl'].result_list),
+            ['AD001', 'AD003']
+        )
+    
+    def test_estimated_count_is_capped(self):
+        with patch('bookings.pagination.ESTIMATED_COUNT_LIMIT', 2):
+            paginator = EstimatedCountPaginator(TravelOption.objects.order_by('pk'), 1)
+            self.assertEqual(paginator.count, 3)
+            self.assertEqual(paginator.num_pages, 3)
+    
+    def test_pages_past_the_count_limit_stay_reachable(self):
+        url = reverse('admin:bookings_traveloption_changelist')
+        with patch('bookings.pagination.ESTIMATED_COUNT_LIMIT', 1), \
+                patch.object(TravelOptionAdmin, 'list_per_page', 1):
+            response = self.client.get(url, {'p': 3})
+            self.assertEqual(response.context['cl'].paginator.num_pages, 4)
+            self.assertEqual([option.travel_id for option in response.context['cl'].result_list], ['AD002'])
+            response = self.client.get(url, {'p': 4})
+            self.assertEqual(response.context['cl'].paginator.num_pages, 4)
+    
+    def test_location_filter_lists_a_limited_number_of_cities(self):
+        request = RequestFactory().get('/', {'source_key': 'dallas'})
+        model_admin = admin.site._registry[TravelOption]
+        with patch('bookings.admin.LOCATION_FILTER_LIMIT', 1):
+            location_filter = SourceFilter(request, {'source_key': 'dallas'}, TravelOption, model_admin)
+            self.assertEqual([key for key, _ in location_filter.lookup_choices], ['austin', 'dallas'])
+
+
+class IdGeneratorTest(TestCase):
+    def test_ids_are_unique_ordered_and_fit_the_column(self):
+        generate = IdGenerator('TRV')
+        ids = [generate() for _ in range(5000)]
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertEqual(ids, sorted(ids))
+        self.assertLessEqual(len(ids[0]), Booking._meta.get_field('booking_id').max_length)
+    
+    def test_clock_going_backwards_keeps_ids_increasing(self):
+        generate = IdGenerator('TRV')
+        with patch('bookings.ids.time.time_ns', return_value=2_000_000_000_000_000):
+            first = generate()
+        with patch('bookings.ids.time.time_ns', return_value=1_000_000_000_000_000):
+            second = generate()
+        self.assertGreater(second, first)
+    
+    def test_sequence_overflow_moves_to_next_millisecond(self):
+        generate = IdGenerator('TRV')
+        with patch('bookings.ids.time.time_ns', return_value=1_000_000_000_000_000):
+            ids = [generate() for _ in range(SEQUENCE_LIMIT + 1)]
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertEqual(ids, sorted(ids))
+    
+    def test_processes_get_distinct_nodes(self):
+        generate = IdGenerator('TRV')
+        with patch('bookings.ids.time.time_ns', return_value=1_000_000_000_000_000):
+            with patch('bookings.ids.os.getpid', return_value=101):
+                first = generate()
+            generate._last = 0
+            with patch('bookings.ids.os.getpid', return_value=102):
+                second = generate()
+        self.assertNotEqual(first, second)
+    
+    def test_production_settings_reject_node_out_of_range(self):
+        sys.modules.pop('travel_booking.production_settings', None)
+        self.addCleanup(sys.modules.pop, 'travel_booking.production_settings', None)
+        with patch.dict(os.environ, {'ID_GENERATOR_NODE': '8'}):
+            with self.assertRaisesMessage(ValueError, 'ID_GENERATOR_NODE must be between 0 and 7'):
+                importlib.import_module('travel_booking.production_settings')
+    
+    def test_booking_save_uses_generator(self):
+        user = User.objects.create_user(username='iduser')
+        departure_date = timezone.now().date() + timedelta(days=2)
+        travel_option = TravelOption.objects.create(
+            travel_id=generate_travel_id('bus'),
+            travel_type='bus',
+            source='New York',
+            destination='Boston',
+            departure_date=departure_date,
+            departure_time=time(9, 0),
+            arrival_date=departure_date,
+            arrival_time=time(13, 0),
+            price=20,
+            available_seats=5,
+            total_seats=5
+        )
+        booking = Booking.objects.create(
+            user=user,
+            travel_option=travel_option,
+            number_of_seats=1,
+            passenger_names='Id Passenger',
+            contact_email='id@example.com',
+            contact_phone='000'
+        )
+        self.assertTrue(booking.booking_id.startswith('TRV'))
+        self.assertTrue(travel_option.travel_id.startswith('BU'))
+
+
+class TravelCardCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='carduser', password='testpass123')
+        departure_date = timezone.now().date() + timedelta(days=8)
+        self.travel_option = TravelOption.objects.create(
+            travel_id='CC001',
+            travel_type='train',
+            source='New York',
+            destination='Boston',
+            departure_date=departure_date,
+            departure_time=time(9, 0),
+            arrival_date=departure_date,
+            arrival_time=time(13, 0),
+            price=50,
+            available_seats=20,
+            total_seats=20
+        )
+    
+    def test_card_refreshes_when_seats_change(self):
+        params = {'departure_date': self.travel_option.departure_date.isoformat()}
+        self.client.get(reverse('travel_options'), params)
+        with self.captureOnCommitCallbacks(execute=True):
+            inventory.reserve_seats(self.travel_option, 17)
+        response = self.client.get(reverse('travel_options'), params)
+        self.assertContains(response, 'Only 3 seats left!')
+    
+    def test_card_varies_by_login_state(self):
+        response = self.client.get(reverse('travel_options'))
+        self.assertContains(response, 'Login to Book')
+        self.client.login(username='carduser', password='testpass123')
+        response = self.client.get(reverse('travel_options'))
+        self.assertContains(response, 'Book Now')
+        self.assertNotContains(response, 'Login to Book')
+
+
+class RequestMetricsTest(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_request_metrics()
+        self.user = User.objects.create_user(username='metricsuser', password='testpass123')
+        departure_date = timezone.now().date() + timedelta(days=9)
+        self.travel_option = TravelOption.objects.create(
+            travel_id='MT001',
+            travel_type='flight',
+            source='New York',
+            destination='Boston',
+            departure_date=departure_date,
+            departure_time=time(9, 0),
+            arrival_date=departure_date,
+            arrival_time=time(10, 0),
+            price=120,
+            available_seats=30,
+            total_seats=30
+        )
+        self.booking = Booking.objects.create(
+            user=self.user,
+            travel_option=self.travel_option,
+            number_of_seats=1,
+            passenger_names='Metrics Passenger',
+            contact_email='metrics@example.com',
+            contact_phone='000'
+        )
+    
+    def test_view_query_budgets(self):
+        self.assertQueryBudget(2, 'home')
+        self.assertQueryBudget(3, 'travel_options', data={'source': 'new york'})
+        self.assertQueryBudget(3, 'api_search')
+        self.client.force_login(self.user)
+        self.assertQueryBudget(4, 'my_bookings')
+        self.assertQueryBudget(3, 'booking_detail', booking_id=self.booking.booking_id)
+    
+    def test_server_timing_merges_view_stages(self):
+        response = self.client.get(reverse('travel_options'))
+        header = response['Server-Timing']
+        for metric in ('query;dur=', 'db;dur=', 'template;dur=', 'total;dur='):
+            self.assertIn(metric, header)
+        self.assertGreater(response.wsgi_request.metrics.template_ms, 0)
+    
+    def test_metrics_endpoint_aggregates_per_view(self):
+        self.client.get(reverse('home'))
+        self.client.get(reverse('home'))
+        staff = User.objects.create_user(username='metricsstaff', password='testpass123', is_staff=True)
+        self.client.force_login(staff)
+        data = self.client.get(reverse('request_metrics')).json()
+        self.assertEqual(data['views']['home']['requests'], 2)
+        self.assertIn('avg_db_ms', data['views']['home'])
+    
+    def test_metrics_endpoint_requires_staff(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('request_metrics'))
+        self.assertEqual(response.status_code, 302)
+
+
+class LoadTestCommandTest(TransactionTestCase):
+    # The virtual users run in their own threads and connections, so the seed
+    # data has to be committed.
+    def test_runs_every_flow_and_writes_results(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'results.json')
+            call_command('load_test', trips=20, concurrency=1, iterations=2, output=output, stdout=StringIO())
+            with open(output) as handle:
+                results = json.load(handle)
+        for flow in ('search', 'book', 'cancel', 'my_bookings'):
+            self.assertEqual(results['flows'][flow]['requests'], 2)
+            self.assertEqual(results['flows'][flow]['errors'], 0)
+        self.assertEqual(Booking.objects.filter(status='cancelled').count(), 2)
+
+
+# AsyncClient builds plain ASGIRequests, so point it at the URLconf that
+# travel_booking.asgi.application resolves against.
+# The async views run in worker threads with their own connections, so the
+# data has to be committed.
+@override_settings(ROOT_URLCONF='travel_booking.asgi_urls')
+class AsyncViewsTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='asyncuser', password='testpass123')
+        departure_date = timezone.now().date() + timedelta(days=6)
+        self.travel_option = TravelOption.objects.create(
+            travel_id='AS001',
+            travel_type='train',
+            source='New York',
+            destination='Boston',
+            departure_date=departure_date,
+            departure_time=time(8, 0),
+            arrival_date=departure_date,
+            arrival_time=time(12, 0),
+            price=80,
+            available_seats=20,
+            total_seats=20
+        )
+        self.booking = Booking.objects.create(
+            user=self.user,
+            travel_option=self.travel_option,
+            number_of_seats=1,
+            passenger_names='Async Passenger',
+            contact_email='async@example.com',
+            contact_phone='000'
+        )
+    
+    async def test_search_views_through_asgi_handler(self):
+        response = await self.async_client.get(reverse('travel_options'), {'source': 'new york'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'AS001')
+        response = await self.async_client.get(reverse('api_search'), {'destination': 'boston'})
+        self.assertEqual([row['travel_id'] for row in response.json()['results']], ['AS001'])
+        response = await self.async_client.get(reverse('home'))
+        self.assertEqual(response.status_code, 200)
+    
+    async def test_api_search_rejects_post(self):
+        response = await self.async_client.post(reverse('api_search'))
+        self.assertEqual(response.status_code, 405)
+    
+    async def test_methods_match_sync_views(self):
+        for name, sync_view in [('api_search', views.api_search), ('fare_calendar', views.fare_calendar)]:
+            response = await self.async_client.head(reverse(name))
+            self.assertEqual(response.status_code, sync_view(RequestFactory().head(reverse(name))).status_code)
+    
+    async def test_booking_detail(self):
+        response = await self.async_client.get(reverse('booking_detail', args=[self.booking.booking_id]))
+        self.assertContains(response, self.booking.booking_id)
+        response = await self.async_client.get(reverse('booking_detail', args=['TRVMISSING']))
+        self.assertEqual(response.status_code, 404)
+    
+    async def test_fare_calendar(self):
+        response = await self.async_client.get(reverse('fare_calendar'), {'source': 'new york', 'destination': 'boston'})
+        self.assertEqual(response.json()['days'][6]['min_price'], '80.00')
+        response = await self.async_client.get(reverse('fare_calendar'), {'source': 'new', 'destination': 'boston'})
+        self.assertEqual(response.status_code, 400)
+    
+    def test_only_asgi_routes_to_async_views(self):
+        self.assertEqual(asgi_application.request_class.urlconf, 'travel_booking.asgi_urls')
+        for name, args in [('home', []), ('api_search', []), ('booking_detail', ['TRV1'])]:
+            path = reverse(name, args=args)
+            self.assertTrue(iscoroutinefunction(resolve(path).func))
+            self.assertFalse(iscoroutinefunction(resolve(path, urlconf='travel_booking.urls').func))
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTest(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+    
+    def test_search_models_read_from_replica(self):
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(TravelOption), 'replica')
+            self.assertEqual(self.router.db_for_read(Location), 'replica')
+            self.assertIsNone(self.router.db_for_read(Booking))
+            self.assertIsNone(self.router.db_for_read(User))
+    
+    def test_outside_requests_reads_stay_on_primary(self):
+        # Management commands must see the rows they have just written.
+        self.assertIsNone(self.router.db_for_read(TravelOption))
+        with replica_reads():
+            self.router.db_for_write(TravelOption)
+            self.assertIsNone(self.router.db_for_read(TravelOption))
+    
+    def test_no_replicas_configured(self):
+        with override_settings(DATABASE_REPLICAS=[]), replica_reads():
+            self.assertIsNone(self.router.db_for_read(TravelOption))
+    
+    def test_write_pins_rest_of_context_to_primary(self):
+        middleware = primary_pinning_middleware(
+            lambda request: (self.router.db_for_write(Booking), self.router.db_for_read(TravelOption))
+        )
+        request = RequestFactory().get('/')
+        self.assertEqual(middleware(request), ('default', None))
+        self.assertFalse(is_pinned())
+    
+    def test_relations_across_primary_and_replica(self):
+        booking = Booking()
+        travel_option = TravelOption()
+        booking._state.db, travel_option._state.db = 'default', 'replica'
+        self.assertTrue(self.router.allow_relation(booking, travel_option))
+        travel_option._state.db = 'other'
+        self.assertIsNone(self.router.allow_relation(booking, travel_option))
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class PrimaryPinningMiddlewareTest(SimpleTestCase):
+    # A TestCase would wrap every read in a transaction on the primary.
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.middleware = primary_pinning_middleware(lambda request: self.router.db_for_read(TravelOption))
+    
+    def request(self, method, session):
+        request = getattr(RequestFactory(), method)('/')
+        request.session = session
+        return request
+    
+    def test_get_reads_from_replica(self):
+        self.assertEqual(self.middleware(self.request('get', {})), 'replica')
+    
+    def test_post_pins_request_and_following_requests(self):
+        session = {}
+        self.assertIsNone(self.middleware(self.request('post', session)))
+        self.assertIn(PINNED_UNTIL_SESSION_KEY, session)
+        self.assertIsNone(self.middleware(self.request('get', session)))
+        
+        with patch('bookings.routers.time.time', return_value=session[PINNED_UNTIL_SESSION_KEY] + 1):
+            self.assertEqual(self.middleware(self.request('get', session)), 'replica')
+
+
+class FareCalendarTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.today = timezone.now().date()
+        for travel_id, travel_type, days, price, seats in [
+            ('FC001', 'flight', 3, 250, 10),
+            ('FC002', 'train', 3, 90, 4),
+            ('FC003', 'bus', 3, 40, 0),
+            ('FC004', 'flight', 10, 180, 7),
+            ('FC005', 'flight', 120, 99, 7),
+        ]:
+            departure_date = self.today + timedelta(days=days)
+            TravelOption.objects.create(
+                travel_id=travel_id,
+                travel_type=travel_type,
+                source='New York',
+                destination='Boston',
+                departure_date=departure_date,
+                departure_time=time(9, 0),
+                arrival_date=departure_date,
+                arrival_time=time(11, 0),
+                price=price,
+                available_seats=seats,
+                total_seats=20
+            )
+    
+    def get_calendar(self, **params):
+        return self.client.get(reverse('fare_calendar'), {'source': 'new york', 'destination': 'BOSTON', **params})
+    
+    def test_cheapest_bookable_price_per_day(self):
+        with self.assertNumQueries(2):
+            data = self.get_calendar().json()
+        self.assertEqual(len(data['days']), 90)
+        days = {day['date']: day for day in data['days']}
+        self.assertEqual(days[(self.today + timedelta(days=3)).isoformat()], {
+            'date': (self.today + timedelta(days=3)).isoformat(), 'min_price': '90.00', 'seats': 14, 'departures': 3,
+        })
+        self.assertEqual(days[(self.today + timedelta(days=10)).isoformat()]['min_price'], '180.00')
+        self.assertEqual(days[self.today.isoformat()], {
+            'date': self.today.isoformat(), 'min_price': None, 'seats': 0, 'departures': 0,
+        })
+        self.assertNotIn((self.today + timedelta(days=120)).isoformat(), days)
+    
+    def test_travel_type_and_window(self):
+        start = self.today + timedelta(days=2)
+        data = self.get_calendar(travel_type='flight', start=start.isoformat(), days=5).json()
+        self.assertEqual([day['min_price'] for day in data['days']], [None, '250.00', None, None, None])
+    
+    def test_cached_per_route_until_inventory_changes(self):
+        self.get_calendar()
+        with self.assertNumQueries(0):
+            self.get_calendar()
+        
+        travel_option = TravelOption.objects.get(travel_id='FC002')
+        travel_option.price = 60
+        with self.captureOnCommitCallbacks(execute=True):
+            travel_option.save()
+        days = {day['date']: day for day in self.get_calendar().json()['days']}
+        self.assertEqual(days[(self.today + timedelta(days=3)).isoformat()]['min_price'], '60.00')
+    
+    def test_seat_changes_refresh_only_their_route(self):
+        self.get_calendar()
+        other = TravelOption.objects.create(
+            travel_id='FC006', travel_type='bus', source='Boston', destination='New York',
+            departure_date=self.today + timedelta(days=3), departure_time=time(9, 0),
+            arrival_date=self.today + timedelta(days=3), arrival_time=time(11, 0),
+            price=30, available_seats=5, total_seats=5
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            inventory.reserve_seats(other, 2)
+        with self.assertNumQueries(0):
+            self.get_calendar()
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            inventory.reserve_seats(TravelOption.objects.get(travel_id='FC002'), 4)
+        days = {day['date']: day for day in self.get_calendar().json()['days']}
+        self.assertEqual(days[(self.today + timedelta(days=3)).isoformat()]['min_price'], '250.00')
+    
+    def test_cities_must_match_exactly(self):
+        Location.objects.create(name='Newark', key='newark')
+        response = self.client.get(reverse('fare_calendar'), {'source': 'new', 'destination': 'boston'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()['errors']), {'source'})
+        response = self.client.get(reverse('fare_calendar'), {'source': 'New York', 'destination': 'Bostonia'})
+        self.assertEqual(set(response.json()['errors']), {'destination'})
+    
+    def test_requires_route(self):
+        response = self.client.get(reverse('fare_calendar'), {'source': 'new york', 'days': 200})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()['errors']), {'destination', 'days'})
+
+
+class RouteDaySummaryTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='summaryuser', password='testpass123')
+        self.departure_date = timezone.now().date() + timedelta(days=12)
+        self.cheap = self.create_travel_option('RS001', price=80, seats=2)
+        self.dear = self.create_travel_option('RS002', price=150, seats=10)
+    
+    def create_travel_option(self, travel_id, price, seats, **kwargs):
+        return TravelOption.objects.create(**{
+            'travel_id': travel_id,
+            'travel_type': 'train',
+            'source': 'New York',
+            'destination': 'Boston',
+            'departure_date': self.departure_date,
+            'departure_time': time(9, 0),
+            'arrival_date': self.departure_date,
+            'arrival_time': time(13, 0),
+            'price': price,
+            'available_seats': seats,
+            'total_seats': 20,
+            **kwargs,
+        })
+    
+    def summary(self, departure_date=None):
+        return RouteDaySummary.objects.values('departures', 'seats_left', 'min_price').get(
+            source_key='new york', destination_key='boston', travel_type='train',
+            departure_date=departure_date or self.departure_date,
+        )
+    
+    def test_saves_maintain_summary(self):
+        self.assertEqual(self.summary(), {'departures': 2, 'seats_left': 12, 'min_price': Decimal('80')})
+        
+        self.dear.departure_date = self.departure_date + timedelta(days=1)
+        self.dear.save()
+        self.assertEqual(self.summary()['departures'], 1)
+        self.assertEqual(self.summary(self.dear.departure_date)['min_price'], Decimal('150'))
+        
+        TravelOption.objects.get(pk=self.dear.pk).delete()
+        self.assertFalse(RouteDaySummary.objects.filter(departure_date=self.dear.departure_date).exists())
+    
+    def test_booking_and_cancel_update_seats_and_price(self):
+        self.assertTrue(inventory.reserve_seats(self.cheap, 2))
+        self.assertEqual(self.summary(), {'departures': 2, 'seats_left': 10, 'min_price': Decimal('150')})
+        
+        booking = Booking.objects.create(
+            user=self.user, travel_option=self.cheap, number_of_seats=2, passenger_names='A, B',
+            contact_email='summary@example.com', contact_phone='000'
+        )
+        self.assertTrue(inventory.cancel_booking(booking))
+        self.assertEqual(self.summary(), {'departures': 2, 'seats_left': 12, 'min_price': Decimal('80')})
+    
+    def test_import_moves_rows_between_groups(self):
+        self.cheap.travel_type = 'bus'
+        inventory.upsert_travel_options([self.cheap])
+        self.assertEqual(self.summary(), {'departures': 1, 'seats_left': 10, 'min_price': Decimal('150')})
+        self.assertEqual(RouteDaySummary.objects.get(travel_type='bus').departures, 1)
+    
+    def test_refresh_without_conflict_target_support(self):
+        # MySQL's ON DUPLICATE KEY UPDATE rejects unique_fields.
+        with patch.object(connection.features, 'supports_update_conflicts_with_target', False):
+            self.assertTrue(inventory.reserve_seats(self.dear, 4))
+            self.create_travel_option('RS003', price=60, seats=3, travel_type='bus')
+        self.assertEqual(self.summary()['seats_left'], 8)
+        self.assertEqual(RouteDaySummary.objects.get(travel_type='bus').min_price, Decimal('60'))
+    
+    def test_bulk_delete_refreshes_each_group_once(self):
+        Booking.objects.create(
+            user=self.user, travel_option=self.cheap, number_of_seats=1,
+            passenger_names='A', contact_email='summary@example.com', contact_phone='000'
+        )
+        for i in range(3):
+            self.create_travel_option(f'RS1{i}', price=60, seats=5, departure_date=self.departure_date + timedelta(days=1))
+        travel_options = TravelOption.objects.exclude(pk=self.dear.pk)
+        with patch('bookings.signals.refresh_travel_options') as per_row:
+            self.assertEqual(inventory.delete_travel_options(travel_options), 4)
+        per_row.assert_not_called()
+        self.assertEqual(self.summary(), {'departures': 1, 'seats_left': 10, 'min_price': Decimal('150')})
+        self.assertFalse(RouteDaySummary.objects.exclude(departure_date=self.departure_date).exists())
+        self.assertFalse(Booking.objects.exists())
+    
+    def test_itinerary_refreshes_all_groups_at_once(self):
+        onward = self.create_travel_option(
+            'RS003', price=40, seats=5, source='Boston', destination='Portland',
+            departure_time=time(15, 0), arrival_time=time(17, 0)
+        )
+        with patch('bookings.inventory.refresh_travel_options', wraps=inventory.refresh_travel_options) as refresh:
+            inventory.book_itinerary(
+                self.user, [onward, self.dear], 1,
+                passenger_names='A', contact_email='summary@example.com', contact_phone='000'
+            )
+        self.assertEqual(refresh.call_count, 1)
+        self.assertEqual(self.summary()['seats_left'], 11)
+        self.assertEqual(RouteDaySummary.objects.get(source_key='boston').seats_left, 4)
+    
+    def test_rebuild_and_check_commands(self):
+        RouteDaySummary.objects.update(seats_left=999)
+        TravelOption.objects.bulk_create([TravelOption(
+            travel_id='RS003', travel_type='flight', source='New York', destination='Boston',
+            source_key='new york', destination_key='boston', departure_date=self.departure_date,
+            departure_time=time(7, 0), arrival_date=self.departure_date, arrival_time=time(8, 0),
+            price=300, available_seats=5, total_seats=5,
+        )])
+        
+        with self.assertRaises(CommandError):
+            call_command('check_route_summaries', stdout=StringIO())
+        call_command('check_route_summaries', fix=True, stdout=StringIO())
+        self.assertEqual(self.summary()['seats_left'], 12)
+        self.assertEqual(RouteDaySummary.objects.get(travel_type='flight').seats_left, 5)
+        
+        RouteDaySummary.objects.all().delete()
+        call_command('rebuild_route_summaries', stdout=StringIO())
+        self.assertEqual(RouteDaySummary.objects.count(), 2)
+        out = StringIO()
+        call_command('check_route_summaries', stdout=out)
+        self.assertIn('consistent', out.getvalue())
+
+
+def create_route(travel_id, source, destination, days=5):
+    departure_date = timezone.now().date() + timedelta(days=days)
+    return TravelOption.objects.create(
+        travel_id=travel_id,
+        travel_type='bus',
+        source=source,
+        destination=destination,
+        departure_date=departure_date,
+        departure_time=time(9, 0),
+        arrival_date=departure_date,
+        arrival_time=time(12, 0),
+        price=30,
+        available_seats=40,
+        total_seats=40
+    )
+
+
+class CityAutocompleteTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        for i, (source, destination) in enumerate([
+            ('New York', 'Boston'), ('Boston', 'New York'), ('Boston', 'Buffalo'),
+            ('Baltimore', 'New York'), ('Newark', 'Boston'),
+        ]):
+            create_route(f'AC{i:03d}', source, destination)
+        create_route('AC100', 'Bangor', 'Boston', days=-3)
+    
+    def test_ranked_by_upcoming_departures_without_queries(self):
+        index = CityIndex()
+        index.refresh()
+        with self.assertNumQueries(0):
+            suggestions = index.suggest(' B', limit=3)
+        self.assertEqual(
+            [(suggestion['name'], suggestion['departures']) for suggestion in suggestions],
+            [('Boston', 4), ('Baltimore', 1), ('Buffalo', 1)]
+        )
+        self.assertEqual([suggestion['name'] for suggestion in index.suggest('new')], ['New York', 'Newark'])
+        self.assertEqual([suggestion['name'] for suggestion in index.suggest('york')], ['New York'])
+        self.assertEqual(index.suggest('bangor')[0]['departures'], 0)
+        self.assertEqual(index.suggest(''), [])
+    
+    def test_endpoint(self):
+        city_index.refresh()
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('city_autocomplete'), {'q': 'bo', 'limit': 'x'})
+        self.assertEqual(response.json()['results'], [{'name': 'Boston', 'key': 'boston', 'departures': 4}])
+
+
+class CityIndexRefreshTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        create_route('AR001', 'New York', 'Boston')
+    
+    @patch('bookings.autocomplete.VERSION_CHECK_SECONDS', 0)
+    @patch('bookings.autocomplete.MIN_REFRESH_SECONDS', 0)
+    def test_inventory_change_rebuilds_in_background(self):
+        index = CityIndex()
+        self.assertEqual(index.suggest('alb'), [])
+        
+        create_route('AR002', 'Albany', 'Boston')
+        with patch.object(index, 'build', wraps=index.build) as build:
+            # The request that notices answers from the old snapshot.
+            self.assertEqual(index.suggest('alb'), [])
+            index.wait()
+        self.assertEqual(build.call_count, 1)
+        self.assertEqual(index.suggest('alb')[0]['name'], 'Albany')
+        self.assertEqual(index.suggest('bos')[0]['departures'], 2)
+        with self.assertNumQueries(0):
+            index.suggest('bos')
+    
+    @patch('bookings.autocomplete.VERSION_CHECK_SECONDS', 0)
+    @patch('bookings.autocomplete.MIN_REFRESH_SECONDS', 0)
+    @patch('bookings.autocomplete.REFRESH_STALL_SECONDS', 0)
+    def test_stuck_thread_falls_back_to_after_response(self):
+        index = CityIndex()
+        index.suggest('alb')
+        stuck = threading.Event()
+        thread = threading.Thread(target=stuck.wait)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(stuck.set)
+        index._refreshing = (thread, 0.0)
+        
+        create_route('AR002', 'Albany', 'Boston')
+        self.assertEqual(index.suggest('alb'), [])
+        request_finished.send(sender=None)
+        self.assertEqual(index.suggest('alb')[0]['name'], 'Albany')
+        with patch.object(index, 'build') as build:
+            request_finished.send(sender=None)
+        build.assert_not_called()
+    
+    def test_first_build_runs_once(self):
+        index = CityIndex()
+        snapshot = index.build()
+        
+        def slow_build():
+            clock.sleep(0.05)
+            return snapshot
+        
+        with patch.object(index, 'build', side_effect=slow_build) as build:
+            threads = [threading.Thread(target=index.suggest, args=('bos',)) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(build.call_count, 1)
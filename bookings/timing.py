@@ -0,0 +1,30 @@
+import logging
+import time
+from contextlib import contextmanager
+
+
+logger = logging.getLogger(__name__)
+
+
+class StageTimer:
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + (time.perf_counter() - started) * 1000
+
+    def server_timing(self):
+        return ', '.join(f'{name};dur={duration:.2f}' for name, duration in self.stages.items())
+
+    def report(self, request, response):
+        header = self.server_timing()
+        if response.has_header('Server-Timing'):
+            header = f"{response['Server-Timing']}, {header}"
+        response['Server-Timing'] = header
+        logger.debug('%s %s %s', request.method, request.path, self.server_timing())
+        return response
@@ -5,6 +5,9 @@ from . import views
 urlpatterns = [
     path('', views.home, name='home'),
     path('travel-options/', views.travel_options, name='travel_options'),
+    path('api/search/', views.api_search, name='api_search'),
+    path('api/fare-calendar/', views.fare_calendar, name='fare_calendar'),
+    path('api/cities/', views.city_autocomplete, name='city_autocomplete'),
     
     path('register/', views.register, name='register'),
     path('login/', auth_views.LoginView.as_view(), name='login'),
@@ -20,7 +23,11 @@ urlpatterns = [
     path('profile/', views.profile, name='profile'),
     
     path('book/<int:travel_id>/', views.book_travel, name='book_travel'),
+    path('book/itinerary/', views.book_itinerary, name='book_itinerary'),
     path('my-bookings/', views.my_bookings, name='my_bookings'),
     path('booking/<str:booking_id>/', views.booking_detail, name='booking_detail'),
+    path('booking/<str:booking_id>/confirm/', views.confirm_booking, name='confirm_booking'),
     path('cancel-booking/<str:booking_id>/', views.cancel_booking, name='cancel_booking'),
+    
+    path('internal/metrics/', views.request_metrics, name='request_metrics'),
 ]
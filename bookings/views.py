@@ -1,46 +1,45 @@
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.core.paginator import Paginator
-from django.db.models import Q
-from django.utils import timezone
-from django.db import transaction
+from django.core.exceptions import ValidationError
+from django.db import close_old_connections, transaction
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
+from django.urls import reverse
+from django.utils.http import http_date, urlencode
+from django.views.decorators.http import require_GET
 from .models import TravelOption, Booking, UserProfile
-from .forms import CustomUserCreationForm, UserProfileForm, UserUpdateForm, TravelSearchForm, BookingForm
+from . import inventory
+from .pagination import KeysetPaginator
+from .search import (
+    get_fare_calendar, get_search_page, get_search_validators, run_search, search_digest, serialize_travel_option,
+)
+from .timing import StageTimer
+from .metrics import request_metrics as collect_request_metrics
+from .autocomplete import MAX_SUGGESTIONS, city_index
+from .forms import CustomUserCreationForm, UserProfileForm, UserUpdateForm, TravelSearchForm, FareCalendarForm, BookingForm, ItineraryBookingForm
+
+
+MY_BOOKINGS_FIELDS = [
+    'booking_id', 'status', 'number_of_seats', 'total_price', 'booking_date', 'passenger_names',
+    'travel_option__travel_id', 'travel_option__travel_type', 'travel_option__source',
+    'travel_option__destination', 'travel_option__departure_date', 'travel_option__departure_time',
+]
+BOOKING_DETAIL_FIELDS = MY_BOOKINGS_FIELDS + [
+    'contact_email', 'contact_phone', 'travel_option__arrival_date', 'travel_option__arrival_time',
+    'travel_option__price',
+]
+
+API_PAGE_SIZE = 20
 
 
 def home(request):
-    form = TravelSearchForm(request.GET or None)
-    travel_options = TravelOption.objects.filter(
-        departure_date__gte=timezone.now().date(),
-        available_seats__gt=0
-    )
-    
-    if form.is_valid():
-        travel_type = form.cleaned_data.get('travel_type')
-        source = form.cleaned_data.get('source')
-        destination = form.cleaned_data.get('destination')
-        departure_date = form.cleaned_data.get('departure_date')
-        
-        if travel_type:
-            travel_options = travel_options.filter(travel_type=travel_type)
-        if source:
-            travel_options = travel_options.filter(source__icontains=source)
-        if destination:
-            travel_options = travel_options.filter(destination__icontains=destination)
-        if departure_date:
-            travel_options = travel_options.filter(departure_date=departure_date)
-    
-    paginator = Paginator(travel_options, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    
-    return render(request, 'bookings/home.html', {
-        'form': form,
-        'page_obj': page_obj,
-        'travel_options': page_obj,
-    })
+    return _search_view(request, 'bookings/home.html', 'home', 10)
 
 
 def register(request):
@@ -83,35 +82,101 @@ def profile(request):
 
 
 def travel_options(request):
-    form = TravelSearchForm(request.GET or None)
-    travel_options_qs = TravelOption.objects.filter(
-        departure_date__gte=timezone.now().date(),
-        available_seats__gt=0
-    )
+    return _search_view(request, 'bookings/travel_options.html', 'travel_options', 12)
+
+
+def _search_view(request, template_name, namespace, per_page):
+    timer = StageTimer()
+    form, page_obj = run_search(request.GET, namespace, per_page, timer)
     
-    if form.is_valid():
-        travel_type = form.cleaned_data.get('travel_type')
-        source = form.cleaned_data.get('source')
-        destination = form.cleaned_data.get('destination')
-        departure_date = form.cleaned_data.get('departure_date')
-        
-        if travel_type:
-            travel_options_qs = travel_options_qs.filter(travel_type=travel_type)
-        if source:
-            travel_options_qs = travel_options_qs.filter(source__icontains=source)
-        if destination:
-            travel_options_qs = travel_options_qs.filter(destination__icontains=destination)
-        if departure_date:
-            travel_options_qs = travel_options_qs.filter(departure_date=departure_date)
-    
-    paginator = Paginator(travel_options_qs, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    
-    return render(request, 'bookings/travel_options.html', {
+    with timer.stage('render'):
+        response = render(request, template_name, _search_context(form, page_obj))
+    
+    return timer.report(request, response)
+
+
+def _search_context(form, page_obj):
+    return {
         'form': form,
         'page_obj': page_obj,
         'travel_options': page_obj,
+    }
+
+
+@require_GET
+def api_search(request):
+    timer = StageTimer()
+    with timer.stage('form'):
+        form = TravelSearchForm(request.GET)
+        if not form.is_valid():
+            return _form_errors(form)
+        filters = form.cleaned_data
+        cursor = request.GET.get('cursor')
+    
+    with timer.stage('validate'):
+        etag, last_modified = _search_validators(filters, cursor, get_search_validators(filters))
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    
+    if response is None:
+        with timer.stage('query'):
+            page_obj = get_search_page('api', filters, API_PAGE_SIZE, cursor)
+        
+        with timer.stage('serialize'):
+            response = _search_results(page_obj)
+    
+    return timer.report(request, _mark_validators(response, etag, last_modified))
+
+
+def _form_errors(form):
+    return JsonResponse({'errors': form.errors.get_json_data()}, status=400)
+
+
+def _search_validators(filters, cursor, validators):
+    last_modified = validators['last_modified']
+    etag = quote_etag(
+        f"{search_digest(filters, cursor)}-{validators['count']}-"
+        f"{last_modified.timestamp() if last_modified else 0}"
+    )
+    return etag, int(last_modified.timestamp()) if last_modified else None
+
+
+def _search_results(page_obj):
+    return JsonResponse({
+        'results': [serialize_travel_option(travel_option) for travel_option in page_obj],
+        'next_cursor': page_obj.next_cursor,
+        'previous_cursor': page_obj.previous_cursor,
+        'total': page_obj.total,
+        'total_is_exact': page_obj.total_is_exact,
+    })
+
+
+def _mark_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+@require_GET
+def fare_calendar(request):
+    form = FareCalendarForm(request.GET)
+    if not form.is_valid():
+        return _form_errors(form)
+    try:
+        calendar = get_fare_calendar(form.cleaned_data)
+    except ValidationError as error:
+        form.add_error(None, error)
+        return _form_errors(form)
+    return _fare_calendar_response(form, calendar)
+
+
+def _fare_calendar_response(form, calendar):
+    return JsonResponse({
+        'source': form.cleaned_data['source'],
+        'destination': form.cleaned_data['destination'],
+        'travel_type': form.cleaned_data['travel_type'] or None,
+        **calendar,
     })
 
 
@@ -127,8 +192,7 @@ def book_travel(request, travel_id):
         form = BookingForm(request.POST, travel_option=travel_option, user=request.user)
         if form.is_valid():
             with transaction.atomic():
-                travel_option.refresh_from_db()
-                if form.cleaned_data['number_of_seats'] > travel_option.available_seats:
+                if not inventory.reserve_seats(travel_option, form.cleaned_data['number_of_seats']):
                     messages.error(request, 'Not enough seats available.')
                     return redirect('book_travel', travel_id=travel_id)
                 
@@ -136,13 +200,11 @@ def book_travel(request, travel_id):
                 booking.user = request.user
                 booking.travel_option = travel_option
                 booking.total_price = travel_option.price * booking.number_of_seats
+                booking.status = 'pending'
+                booking.hold_expires_at = inventory.hold_expiry()
                 booking.save()
                 
-                travel_option.available_seats -= booking.number_of_seats
-                travel_option.save()
-                
-                messages.success(request, f'Booking confirmed! Your booking ID is {booking.booking_id}')
-                return redirect('my_bookings')
+            return redirect('confirm_booking', booking_id=booking.booking_id)
     else:
         form = BookingForm(travel_option=travel_option, user=request.user)
     
@@ -152,13 +214,86 @@ def book_travel(request, travel_id):
     })
 
 
+@login_required
+def book_itinerary(request):
+    if request.method == 'POST':
+        form = ItineraryBookingForm(request.POST, user=request.user)
+        if form.is_valid():
+            try:
+                bookings = inventory.book_itinerary(
+                    request.user,
+                    form.cleaned_data['legs'],
+                    form.cleaned_data['number_of_seats'],
+                    passenger_names=form.cleaned_data['passenger_names'],
+                    contact_email=form.cleaned_data['contact_email'],
+                    contact_phone=form.cleaned_data['contact_phone'],
+                )
+            except inventory.SeatsUnavailable as e:
+                messages.error(request, str(e))
+            else:
+                messages.info(request, f'{len(bookings)} legs are on hold. Confirm them together to complete the itinerary.')
+                return redirect('confirm_booking', booking_id=bookings[0].booking_id)
+    else:
+        form = ItineraryBookingForm(initial={'legs': request.GET.getlist('leg')}, user=request.user)
+    
+    leg_ids = [value for value in form['legs'].value() or [] if str(value).isdigit()]
+    legs = TravelOption.objects.filter(pk__in=leg_ids).order_by('departure_date', 'departure_time')
+    
+    return render(request, 'bookings/book_itinerary.html', {
+        'form': form,
+        'legs': legs,
+    })
+
+
+@login_required
+def confirm_booking(request, booking_id):
+    booking = get_object_or_404(
+        Booking.objects.select_related('travel_option'), booking_id=booking_id, user=request.user
+    )
+    
+    if booking.status != 'pending':
+        return redirect('booking_detail', booking_id=booking.booking_id)
+    
+    legs = [booking]
+    if booking.itinerary_id:
+        legs = list(inventory.held_together(booking).select_related('travel_option').order_by(
+            'travel_option__departure_date', 'travel_option__departure_time'
+        ))
+    
+    if request.method == 'POST':
+        if 'release' in request.POST:
+            with transaction.atomic():
+                inventory.release_hold(booking)
+            messages.info(request, f'Your hold on booking {booking.booking_id} has been released.')
+            return redirect('travel_options')
+        
+        if inventory.confirm_hold(booking):
+            if booking.itinerary_id:
+                booking_ids = ', '.join(leg.booking_id for leg in legs)
+                messages.success(request, f'Itinerary confirmed! Your booking IDs are {booking_ids}')
+            else:
+                messages.success(request, f'Booking confirmed! Your booking ID is {booking.booking_id}')
+            return redirect('my_bookings')
+        
+        with transaction.atomic():
+            inventory.release_hold(booking)
+        messages.error(request, 'Your seat hold has expired. Please book again.')
+        if booking.itinerary_id:
+            query = urlencode({'leg': [leg.travel_option.pk for leg in legs]}, doseq=True)
+            return redirect(f"{reverse('book_itinerary')}?{query}")
+        return redirect('book_travel', travel_id=booking.travel_option.pk)
+    
+    return render(request, 'bookings/confirm_booking.html', {'booking': booking, 'legs': legs})
+
+
 @login_required
 def my_bookings(request):
-    bookings = Booking.objects.filter(user=request.user)
+    bookings = Booking.objects.filter(user=request.user).select_related('travel_option').only(
+        *MY_BOOKINGS_FIELDS
+    ).with_cancellable()
     
-    paginator = Paginator(bookings, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    paginator = KeysetPaginator(bookings, 10, ['-booking_date', 'id'], count_limit=1000)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
     
     return render(request, 'bookings/my_bookings.html', {
         'page_obj': page_obj,
@@ -168,7 +303,7 @@ def my_bookings(request):
 
 @login_required
 def cancel_booking(request, booking_id):
-    booking = get_object_or_404(Booking, booking_id=booking_id, user=request.user)
+    booking = get_object_or_404(Booking.objects.select_related('travel_option'), booking_id=booking_id, user=request.user)
     
     if not booking.can_cancel():
         messages.error(request, 'This booking cannot be cancelled. Cancellation is only allowed 24 hours before departure.')
@@ -176,23 +311,74 @@ def cancel_booking(request, booking_id):
     
     if request.method == 'POST':
         with transaction.atomic():
-            travel_option = booking.travel_option
-            travel_option.available_seats += booking.number_of_seats
-            travel_option.save()
-            
-            booking.status = 'cancelled'
-            booking.save()
-            
+            cancelled = inventory.cancel_booking(booking)
+        
+        if cancelled:
             messages.success(request, f'Booking {booking.booking_id} has been cancelled successfully.')
+        else:
+            messages.error(request, f'Booking {booking.booking_id} has already been cancelled.')
         return redirect('my_bookings')
     
     return render(request, 'bookings/cancel_booking.html', {'booking': booking})
 
 
 def booking_detail(request, booking_id):
+    bookings = Booking.objects.select_related('travel_option').only(*BOOKING_DETAIL_FIELDS).with_cancellable()
     if request.user.is_authenticated:
-        booking = get_object_or_404(Booking, booking_id=booking_id, user=request.user)
+        booking = get_object_or_404(bookings, booking_id=booking_id, user=request.user)
     else:
-        booking = get_object_or_404(Booking, booking_id=booking_id)
+        booking = get_object_or_404(bookings, booking_id=booking_id)
     
     return render(request, 'bookings/booking_detail.html', {'booking': booking})
+
+
+@require_GET
+def city_autocomplete(request):
+    # Answered from the in-process city index; no database query per request.
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), MAX_SUGGESTIONS)
+    except ValueError:
+        limit = 10
+    response = JsonResponse({'results': city_index.suggest(request.GET.get('q', ''), limit)})
+    patch_cache_control(response, max_age=60)
+    return response
+
+
+@staff_member_required
+@require_GET
+def request_metrics(request):
+    return JsonResponse(collect_request_metrics())
+
+
+# Async versions of the read views, routed by travel_booking.asgi_urls and
+# so only used under asgi.application. On Django 4.2 every async ORM call
+# and render is its own hop onto the one thread-sensitive executor, so under
+# ASGI requests queued behind each other's queries. Each async view instead
+# runs its sync twin, queries and render together, in one worker thread of
+# a pool sized by ASYNC_VIEW_THREADS, and closes the database connections of
+# that thread the way request_started and request_finished do for the sync
+# views.
+_view_threads = ThreadPoolExecutor(settings.ASYNC_VIEW_THREADS, thread_name_prefix='async-view')
+
+
+def _run_in_worker_thread(view, request, *args, **kwargs):
+    close_old_connections()
+    try:
+        return view(request, *args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+def _async_view(view):
+    run = sync_to_async(_run_in_worker_thread, thread_sensitive=False, executor=_view_threads)
+
+    async def async_view(request, *args, **kwargs):
+        return await run(view, request, *args, **kwargs)
+    return async_view
+
+
+ahome = _async_view(home)
+atravel_options = _async_view(travel_options)
+aapi_search = _async_view(api_search)
+afare_calendar = _async_view(fare_calendar)
+abooking_detail = _async_view(booking_detail)
@@ -9,8 +9,22 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler, ASGIRequest
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'travel_booking.settings')
 
-application = get_asgi_application()
+
+class AsyncViewsRequest(ASGIRequest):
+    # Resolved against the URLconf that routes the read views to their async
+    # versions; WSGI keeps ROOT_URLCONF and the sync views.
+    urlconf = 'travel_booking.asgi_urls'
+
+
+class AsyncViewsHandler(ASGIHandler):
+    request_class = AsyncViewsRequest
+
+
+# What get_asgi_application() does, with the handler above.
+django.setup(set_prefix=False)
+application = AsyncViewsHandler()
@@ -0,0 +1,8 @@
+from django.contrib import admin
+from django.urls import path, include
+
+# URLconf for asgi.application; see bookings/asgi_urls.py.
+urlpatterns = [
+    path('admin/', admin.site.urls),
+    path('', include('bookings.asgi_urls')),
+]
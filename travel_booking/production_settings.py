@@ -17,3 +17,41 @@ SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', SECRET_KEY)
 
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Search result versions must be shared by every worker process.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(BASE_DIR, 'django_cache'),
+        }
+    }
+
+# Parse each template once per process. Loaders and APP_DIRS are mutually
+# exclusive, so the app directories loader is listed explicitly.
+TEMPLATES = [{
+    **TEMPLATES[0],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        **TEMPLATES[0]['OPTIONS'],
+        'loaders': [
+            ('django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ]),
+        ],
+    },
+}]
+
+# Only 3 bits of each ID hold the host, so refuse to start with a node that
+# would collide with another host's.
+ID_GENERATOR_NODE = int(os.environ.get('ID_GENERATOR_NODE', ID_GENERATOR_NODE))
+if not 0 <= ID_GENERATOR_NODE <= 7:
+    raise ValueError(f'ID_GENERATOR_NODE must be between 0 and 7, got {ID_GENERATOR_NODE}')
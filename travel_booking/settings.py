@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -19,8 +20,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'bookings.metrics.request_metrics_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'bookings.routers.primary_pinning_middleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -32,7 +35,7 @@ ROOT_URLCONF = 'travel_booking.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'bookings.metrics.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -54,6 +57,29 @@ DATABASES = {
     }
 }
 
+# Read-only copies of the primary that serve search reads. Locally, point
+# SQLITE_REPLICAS at comma-separated files and refresh them with
+# `manage.py sync_sqlite_replicas`.
+for index, name in enumerate(filter(None, os.environ.get('SQLITE_REPLICAS', '').split(','))):
+    DATABASES[f'replica{index + 1}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['bookings.routers.ReplicaRouter']
+
+# After a booking, cancel or admin save, the user's session reads from the
+# primary for this long so replica lag never hides their own writes.
+REPLICA_PIN_SECONDS = 15
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'travel-lykk',
+    }
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -91,3 +117,14 @@ LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# How long a pending booking keeps its seats before release_expired_holds frees them.
+BOOKING_HOLD_SECONDS = 600
+
+# Distinguishes hosts (0-7) in generated booking and travel IDs; the process
+# id already separates workers on one host.
+ID_GENERATOR_NODE = 0
+
+# Worker threads that run the async read views under ASGI; size it like the
+# thread count of a threaded WSGI deployment.
+ASYNC_VIEW_THREADS = 32